@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+
+# Background acquisition for Arroyo TEC Controllers #
+Acquirer polls a controller on its own thread at a fixed rate, independent
+of whatever the plotting or logging code is doing. Sample times follow
+monotonic deadlines so the rate does not drift, each sample is timestamped
+when it is read, and deadlines that could not be met are counted instead of
+silently stretching the sample period.
+
+Example:
+    acquirer = Acquirer(TECpak586, rate = 1.0)
+    samples = acquirer.subscribe()
+    acquirer.start()
+    ...
+    while samples:
+        timestamp, snapshot = samples.popleft()
+"""
+
+import threading
+from collections import deque
+from time import monotonic, time
+from telemetry import TelemetryBuffer
+
+
+
+class Acquirer(object):
+    """ Class polling an arroyo device at a fixed rate on a worker thread """
+
+
+    def __init__(self, device, rate = 1.0, capacity = 18000, buffer = None):
+        """ device is an arroyo (anything with read_snapshot)
+            rate is the number of samples per second
+            Samples are stored in buffer, a TelemetryBuffer created with
+            capacity samples if not given """
+        self.device = device
+        self.period = 1.0 / rate
+        self.buffer = buffer if buffer is not None else \
+            TelemetryBuffer(capacity)
+        self.samples = 0
+        self.missed = 0
+        self.errors = 0
+        self.last_error = None
+        self._consumers = []
+        self._started = None
+        self._stop = threading.Event()
+        self._thread = None
+
+
+    def subscribe(self, maxlen = None):
+        """ Returns a deque receiving every new (timestamp, Snapshot)
+            The acquisition thread only appends and the consumer only pops
+            from the left, both atomic on a deque, so no lock is needed.
+            With maxlen the oldest unread samples are dropped when full. """
+        samples = deque(maxlen = maxlen)
+        self._consumers.append(samples)
+        return(samples)
+
+
+    def unsubscribe(self, samples):
+        """ Stops delivering samples to a deque from subscribe """
+        self._consumers = [c for c in self._consumers if c is not samples]
+        return
+
+
+    @property
+    def running(self):
+        return(self._thread is not None and self._thread.is_alive())
+
+
+    def start(self):
+        """ Starts polling on a daemon thread """
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target = self._run,
+                                        name = "arroyo-acquirer",
+                                        daemon = True)
+        self._thread.start()
+        return
+
+
+    def stop(self, timeout = None):
+        """ Stops polling and waits for the thread to finish """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return
+
+
+    def _run(self):
+        """ Polls the device on monotonic deadlines until stopped """
+        self._started = monotonic()
+        deadline = self._started
+        while not self._stop.is_set():
+            before = time()
+            try:
+                snapshot = self.device.read_snapshot()
+            except Exception as error:
+                self.errors += 1
+                self.last_error = error
+            else:
+                # Timestamps the middle of the exchange
+                timestamp = (before + time()) / 2
+                self.buffer.append_snapshot(timestamp, snapshot)
+                self.samples += 1
+                for consumer in self._consumers:
+                    consumer.append((timestamp, snapshot))
+            deadline += self.period
+            now = monotonic()
+            if now > deadline:
+                # Skips to the next deadline still ahead, counting the misses
+                late = int((now - deadline) // self.period) + 1
+                self.missed += late
+                deadline += late * self.period
+            self._stop.wait(deadline - now)
+        return
+
+
+    def stats(self):
+        """ Returns a dictionary with the number of samples, missed
+            deadlines and errors, and the achieved sample rate """
+        elapsed = monotonic() - self._started if self._started else 0
+        return({"samples":  self.samples,
+                "missed":   self.missed,
+                "errors":   self.errors,
+                "last_error": repr(self.last_error) if self.last_error
+                              else None,
+                "rate":     self.samples / elapsed if elapsed else 0.0})
@@ -0,0 +1,483 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+
+# Asyncio interface for Arroyo TEC Controllers #
+AsyncArroyo offers the read/set methods of serial_interface.arroyo as
+coroutines so that many controllers can be driven from one event loop.
+Replies are collected from a non-blocking serial port, so a controller waiting
+for its reply never holds up the others. Where the event loop can watch the
+port's file descriptor (loop.add_reader, on POSIX) a reply is read as soon
+as it arrives; elsewhere the port is polled every poll_interval.
+
+Example:
+    devices = await open_fleet(["COM3", "COM4", "COM5"])
+    temps = await gather_fleet(devices, "read_temp")
+"""
+
+import asyncio
+from serial_interface import (COND_OUT_OF_TOLERANCE, MAX_POLL_INTERVAL,
+                              MIN_POLL_INTERVAL, TERMINATOR, Snapshot,
+                              WaitResult, chain_commands, parse_replies)
+from transports import open_transport
+
+
+# Seconds between checks of the receive buffer where the port cannot be
+#   watched, about the time a short reply takes at 38400 baud
+POLL_INTERVAL = 0.005
+
+
+
+class AsyncArroyo(object):
+    """ Asyncio class to control Arroyo Instrument's TEC Sources """
+
+
+    def __init__(self, port, timeout = 1.0, poll_interval = POLL_INTERVAL,
+                 transport = None):
+        """ Stores the connection settings, await open() to connect
+            timeout is the default time in seconds to wait for a full reply
+            poll_interval is the time in seconds between checks of the
+            receive buffer while waiting for a reply, used only where the
+            event loop cannot watch the port
+            transport opens the port as in serial_interface.arroyo """
+        self.port = port
+        self.transport = transport if transport is not None else \
+            open_transport
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.ser = None
+        # One exchange at a time per port so replies are not interleaved
+        self._lock = asyncio.Lock()
+
+
+    async def open(self):
+        """ Opens the serial port without blocking the event loop """
+        loop = asyncio.get_running_loop()
+        self.ser = await loop.run_in_executor(None, self._open)
+        return(self)
+
+
+    def _open(self):
+        """ Opens the port in non-blocking mode through the transport """
+        return(self.transport(self.port, 0))
+
+
+    async def close(self):
+        """ Closes serial connection with controller """
+        async with self._lock:
+            self.ser.close()
+        return
+
+
+    async def write_command(self, command, timeout = None):
+        """ Takes in string type AT command and returns string type response
+            Awaits the reply terminator for queries (commands containing "?")
+            and raises TimeoutError if the full reply does not arrive within
+            timeout seconds. Commands without a reply return an empty
+            string. """
+        if timeout is None:
+            timeout = self.timeout
+        async with self._lock:
+            self.ser.reset_input_buffer()
+            self.ser.write(str.encode(command) + TERMINATOR)
+            if "?" not in command:
+                return("")
+            response = await self._read_reply(command, timeout)
+        return(response)
+
+
+    async def _read_reply(self, command, timeout):
+        """ Collects bytes until the terminator arrives or timeout passes """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        response = bytearray()
+        fileno, readable = self._watch(loop)
+        try:
+            while not response.endswith(TERMINATOR):
+                waiting = self.ser.in_waiting
+                if waiting:
+                    response += self.ser.read(waiting)
+                    continue
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    raise TimeoutError("No complete reply to " +
+                                       command.strip() + " within " +
+                                       str(timeout) + " s, received " +
+                                       repr(bytes(response)))
+                if readable is None:
+                    await asyncio.sleep(min(self.poll_interval, remaining))
+                    continue
+                # The reader is level triggered, so bytes arriving before
+                #   the clear set the event again
+                readable.clear()
+                try:
+                    await asyncio.wait_for(readable.wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            if readable is not None:
+                loop.remove_reader(fileno)
+        return(bytes.decode(bytes(response[:-len(TERMINATOR)])))
+
+
+    def _watch(self, loop):
+        """ Has loop set an asyncio.Event whenever the port is readable
+            Returns the file descriptor and the event, or (None, None) if
+            the port or the loop does not support it """
+        try:
+            fileno = self.ser.fileno()
+            readable = asyncio.Event()
+            loop.add_reader(fileno, readable.set)
+        except (AttributeError, NotImplementedError, OSError, ValueError):
+            return(None, None)
+        return(fileno, readable)
+
+
+    async def query_many(self, commands, timeout = None):
+        """ Sends a list of commands chained with ";" and returns a list with
+            the parsed reply to each query, see arroyo.query_many """
+        results = []
+        for line, queries in chain_commands(commands):
+            response = await self.write_command(line, timeout)
+            results += parse_replies(queries, response)
+        return(results)
+
+
+    async def _query(self, query):
+        """ Sends a single query and returns its parsed reply """
+        response, = await self.query_many([query])
+        return(response)
+
+
+    async def _set(self, command, query, value):
+        """ Writes a setting and reads it back in the same exchange
+            Returns True if the read back value matches value """
+        new, = await self.query_many([command, query])
+        return(new == value)
+
+
+    async def read_snapshot(self):
+        """ Queries temperature, set point, current and voltage in a single
+            exchange and returns them with the output power as a Snapshot """
+        temp, set_temp, current, voltage = await self.query_many(["TEC:T?",
+                                                                  "TEC:SET:T?",
+                                                                  "TEC:ITE?",
+                                                                  "TEC:V?"])
+        return(Snapshot(temp, set_temp, current, voltage, current * voltage))
+
+
+    async def beep(self):
+        """ Makes a single beep from the controller """
+        await self.write_command("BEEP 1")
+        return
+
+
+    async def run_time(self):
+        """ Returns time that unit has been running """
+        return(await self._query("TIME?"))
+
+
+    async def sensor_constants(self):
+        """ Queries device for sensor constants and returns tuple of floats """
+        return(await self._query("TEC:CONST?"))
+
+
+    async def set_sensor_constants(self, A, B, C):
+        """ Writes values for sensor constants A, B, and C
+            Returns True if the controller reports the new values """
+        return(await self._set("TEC:CONST " + str(A) + ", " + str(B) + ", " +
+                               str(C), "TEC:CONST?",
+                               (float(A), float(B), float(C))))
+
+
+    async def read_temp(self):
+        """ Queries temperature read by device and returns float in
+            Celsius """
+        return(await self._query("TEC:T?"))
+
+
+    async def read_set_temp(self):
+        """ Queries temperature set point from device and returns a float
+            value in Celsius """
+        return(await self._query("TEC:SET:T?"))
+
+
+    async def set_temp(self, set_point):
+        """ Writes new temperature set point for controller, switching to
+            temperature mode first if needed """
+        if await self.read_mode() != "T":
+            await self.set_mode("T")
+        return(await self._set("TEC:T " + str(set_point), "TEC:SET:T?",
+                               float(set_point)))
+
+
+    async def read_tolerance(self):
+        """ Query the source tolerance criteria
+            Returns tolerance in Celsius and time window in seconds """
+        return(await self._query("TEC:TOL?"))
+
+
+    async def set_tolerance(self, tolerance, time):
+        """ Takes float types
+            tolerance = 0.01 to 10 C
+            time = 0.1 to 50 seconds """
+        return(await self._set("TEC:TOL " + str(tolerance) + ", " + str(time),
+                               "TEC:TOL?", (float(tolerance), float(time))))
+
+
+    async def read_gain(self):
+        """ Query the control loop gain or PID control
+            Returns str type value 1, 3, 5, 10, 30, 50, 100 ,300, PID """
+        return(await self._query("TEC:GAIN?"))
+
+
+    async def set_gain(self, gain):
+        """ Sets control loop gain of controller or switches to PID mode
+            Takes str type value 1, 3, 5, 10, 30, 50, 100 ,300, PID """
+        return(await self._set("TEC:GAIN " + str(gain), "TEC:GAIN?",
+                               str(gain)))
+
+
+    async def read_PID(self):
+        """ Reads the PID values of the controller and returns them as
+            float type values in order P I D"""
+        return(await self._query("TEC:PID?"))
+
+
+    async def set_PID(self, P, I, D):
+        """ Writes controller PID values
+            takes in P I D in order as float type values """
+        return(await self._set("TEC:PID " + str(P) + ", " + str(I) + ", " +
+                               str(D), "TEC:PID?",
+                               (float(P), float(I), float(D))))
+
+
+    async def read_output(self):
+        """ Checks if the output is enabled (1) or disabled (0) """
+        return(await self._query("TEC:OUT?"))
+
+
+    async def set_output(self, value):
+        """ Sets the output of the TEC controller to on (1) or off (0) """
+        return(await self._set("TEC:OUT " + str(value), "TEC:OUT?",
+                               int(value)))
+
+
+    async def read_THI_limit(self):
+        """ Queries the high temperature limit of the controller """
+        return(await self._query("TEC:LIM:THI?"))
+
+
+    async def set_THI_limit(self, THIlim):
+        """ Sets the maximum temperature at which the output remains on """
+        return(await self._set("TEC:LIM:THI " + str(THIlim), "TEC:LIM:THI?",
+                               float(THIlim)))
+
+
+    async def read_TLO_limit(self):
+        """ Queries the low temperature limit of the controller """
+        return(await self._query("TEC:LIM:TLO?"))
+
+
+    async def set_TLO_limit(self, TLOlim):
+        """ Sets the minimum temperature at which the output remains on """
+        return(await self._set("TEC:LIM:TLO " + str(TLOlim), "TEC:LIM:TLO?",
+                               float(TLOlim)))
+
+
+    async def read_fan(self):
+        """ Queries the controller for the fan speed, mode and delay """
+        return(await self._query("TEC:FAN?"))
+
+
+    async def set_fan(self, speed, mode, delay = None):
+        """ Sets controller fan speed, mode and optionally delay
+            Returns True if the controller reports the new settings """
+        command = "TEC:FAN " + str(speed) + "," + str(mode)
+        if delay:
+            command += "," + str(delay)
+        (speed_new, mode_new, delay_new), = await self.query_many([command,
+                                                                  "TEC:FAN?"])
+        return(str(speed) == str(speed_new) and int(mode) == mode_new and
+               (not delay or int(delay) == delay_new))
+
+
+    async def read_mode(self):
+        """ Queries the operation mode of the controller, T, R or ITE """
+        return(await self._query("TEC:MODE?"))
+
+
+    async def set_mode(self, mode):
+        """ Sets the operation mode of the controller, T, R or ITE """
+        return(await self._set("TEC:MODE:" + mode, "TEC:MODE?", mode))
+
+
+    async def read_current(self):
+        """ Queries the measured output value of the current """
+        return(await self._query("TEC:ITE?"))
+
+
+    async def read_set_current(self):
+        """ Queries the set point value of the current """
+        return(await self._query("TEC:SET:ITE?"))
+
+
+    async def set_current(self, set_point):
+        """ Writes new current set point, switching to current mode first if
+            needed """
+        if await self.read_mode() != "ITE":
+            await self.set_mode("ITE")
+        return(await self._set("TEC:ITE " + str(set_point), "TEC:SET:ITE?",
+                               float(set_point)))
+
+
+    async def read_current_limit(self):
+        """ Queries the maximum current output of the controller """
+        return(await self._query("TEC:LIM:ITE?"))
+
+
+    async def set_current_limit(self, limit):
+        """ Sets the maximum current output of the controller """
+        return(await self._set("TEC:LIM:ITE " + str(limit), "TEC:LIM:ITE?",
+                               float(limit)))
+
+
+    async def vbulk(self):
+        """ Queries the unit's supply voltage """
+        return(await self._query("TEC:VBULK?"))
+
+
+    async def read_voltage(self):
+        """ Queries the measured output value of the voltage """
+        return(await self._query("TEC:V?"))
+
+
+    async def read_voltage_limit(self):
+        """ Queries the voltage limit of the controller
+            Only available for v3.X firmware """
+        return(await self._query("TEC:LIM:V?"))
+
+
+    async def set_voltage_limit(self, vlim):
+        """ Sets the maximum voltage over the peltier modules
+            Only available for v3.X firmware """
+        return(await self._set("TEC:LIM:V " + str(vlim), "TEC:LIM:V?",
+                               float(vlim)))
+
+
+    async def read_heatcool(self):
+        """ Queries the unit heat/cool mode, BOTH, HEAT or COOL """
+        return(await self._query("TEC:HEATCOOL?"))
+
+
+    async def set_heatcool(self, mode):
+        """ Sets the heat/cool mode of the unit, BOTH, HEAT or COOL """
+        return(await self._set("TEC:HEATCOOL " + str(mode), "TEC:HEATCOOL?",
+                               str(mode)))
+
+
+    async def read_autotune(self):
+        """ Queries autotune result since boot-up
+            0 none, 1 in process, 2 failed, 3 successful """
+        return(await self._query("TEC:AUTOTUNE?"))
+
+
+    async def autotune(self, test_point, wait = False, timeout = 600.0):
+        """ Starts the AutoTune process at the test_point temperature and
+            returns the autotune state read right after
+            With wait, waits for it to be reported in process and then to
+            finish instead, and returns a WaitResult as arroyo.autotune """
+        before = await self.read_autotune()
+        await self.write_command("TEC:AUTOTUNE " + str(test_point))
+        if not wait:
+            return(await self.read_autotune())
+        async def started():
+            # The result from before the command may show for a moment
+            response = await self.read_autotune()
+            return(response if response == 1 or response != before
+                   else None)
+        async def finished():
+            response = await self.read_autotune()
+            return(None if response == 1 else response)
+        result = await self._wait_for(started, timeout, "AutoTune start")
+        if result.value == 1:
+            finish = await self._wait_for(finished,
+                                          max(timeout - result.elapsed, 0),
+                                          "AutoTune finished")
+            result = WaitResult(finish.value, result.elapsed + finish.elapsed,
+                                result.polls + finish.polls)
+        return(result)
+
+
+    async def read_autotunestate(self):
+        """ Queries the step of the AutoTune in progress, 0 when none is """
+        return(await self._query("TEC:AUTOTUNESTATE?"))
+
+
+    async def wait_until_stable(self, timeout = 300.0):
+        """ Waits until the controller reports the temperature within its
+            tolerance window, returning a WaitResult, see
+            arroyo.wait_until_stable """
+        tolerance, hold = await self.read_tolerance()
+        loop = asyncio.get_running_loop()
+        previous = [None, None]
+        async def stable():
+            condition, temp, set_temp = await self.query_many(["TEC:COND?",
+                                                               "TEC:T?",
+                                                               "TEC:SET:T?"])
+            now = loop.time()
+            error = abs(temp - set_temp)
+            # The condition register can lag a set point change just made
+            if not condition & COND_OUT_OF_TOLERANCE and error <= tolerance:
+                return(temp)
+            last, previous[:] = list(previous), [now, error]
+            if error <= tolerance:
+                return(None, hold / 4.0)
+            if last[0] is not None and last[1] > error:
+                rate = (last[1] - error) / (now - last[0])
+                return(None, (error - tolerance) / rate / 2.0)
+            return(None)
+        return(await self._wait_for(stable, timeout, "Temperature stable"))
+
+
+    async def _wait_for(self, check, timeout, description):
+        """ Awaits check() until it returns a value other than None, backing
+            off as arroyo._wait_for """
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        interval = MIN_POLL_INTERVAL
+        polls = 0
+        while True:
+            value = await check()
+            polls += 1
+            hint = None
+            if isinstance(value, tuple):
+                value, hint = value
+            elapsed = loop.time() - start
+            if value is not None:
+                return(WaitResult(value, elapsed, polls))
+            if elapsed >= timeout:
+                raise TimeoutError(description + " not reached within " +
+                                   str(timeout) + " s")
+            delay = interval if hint is None else \
+                min(interval, max(hint, MIN_POLL_INTERVAL))
+            await asyncio.sleep(min(delay, timeout - elapsed))
+            interval = min(interval * 2, MAX_POLL_INTERVAL)
+
+
+
+async def open_fleet(ports, **kwargs):
+    """ Opens an AsyncArroyo for every port concurrently
+        Keyword arguments are passed on to AsyncArroyo """
+    devices = [AsyncArroyo(port, **kwargs) for port in ports]
+    await asyncio.gather(*(device.open() for device in devices))
+    return(devices)
+
+
+async def gather_fleet(devices, method, *args, return_exceptions = False):
+    """ Calls the named method with args on every device concurrently
+        Returns a list of results in the order of devices """
+    results = await asyncio.gather(*(getattr(device, method)(*args)
+                                     for device in devices),
+                                   return_exceptions = return_exceptions)
+    return(results)
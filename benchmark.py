@@ -0,0 +1,272 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+
+# Benchmarks of the Arroyo TEC Controller interfaces #
+Times every read and set method of serial_interface.arroyo, and typical poll
+loops, against simulator.PtySimulator stand-in controllers:
+* poll_unbatched    read_temp, read_set_temp, read_current, read_voltage
+* poll_snapshot     read_snapshot, one chained exchange
+* poll_shadow       read_snapshot and read_PID with the shadow cache on
+* poll_fleet        fleet.ArroyoFleet.poll over several controllers
+* poll_async        async_interface.gather_fleet of read_snapshot
+Each result holds the p50, p95 and p99 latency in milliseconds, the calls
+per second and the bytes written and read per call. Results are saved as
+JSON, and compared with an earlier run to show regressions between versions.
+
+Command line use:
+    python benchmark.py [--count 200] [--devices 4] [--latency 0.0]
+                        [--jitter 0.0] [--baudrate 38400]
+                        [--output benchmark.json] [--compare old.json]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import platform
+import sys
+import numpy as np
+from time import perf_counter, sleep, time
+from async_interface import gather_fleet, open_fleet
+from fleet import ArroyoFleet
+from serial_interface import arroyo
+from simulator import Faults, PtySimulator
+
+
+# Read methods with their arguments
+READS = [("read_temp", ()), ("read_set_temp", ()), ("read_current", ()),
+         ("read_set_current", ()), ("read_voltage", ()), ("vbulk", ()),
+         ("read_tolerance", ()), ("read_gain", ()), ("read_PID", ()),
+         ("read_output", ()), ("read_THI_limit", ()), ("read_TLO_limit", ()),
+         ("read_fan", ()), ("read_mode", ()), ("read_current_limit", ()),
+         ("read_voltage_limit", ()), ("read_heatcool", ()),
+         ("read_autotune", ()), ("sensor_constants", ()), ("run_time", ()),
+         ("read_snapshot", ())]
+
+# Set methods with arguments matching the simulator's settings after
+#   SETUP, so repeated calls leave the controller unchanged
+SETS = [("set_mode", ("T",)), ("set_heatcool", ("BOTH",)),
+        ("set_current_limit", (4.7,)), ("set_voltage_limit", (23.0,)),
+        ("set_fan", ("OFF", 1)), ("set_TLO_limit", (-1.0,)),
+        ("set_THI_limit", (35.0,)), ("set_tolerance", (0.01, 5)),
+        ("set_gain", ("PID",)), ("set_PID", (32, 0.031, 0)),
+        ("set_sensor_constants", (1.125, 2.347, 0.855)),
+        ("set_temp", (23.0,)), ("set_current", (0.0,)),
+        ("set_output", (1,)), ("beep", ())]
+
+# Settings applied before timing, as in example_script.py
+SETUP = {"mode": "T", "heatcool": "BOTH", "current_limit": 4.7,
+         "voltage_limit": 23.0, "fan": ("OFF", 1), "TLO_limit": -1.0,
+         "THI_limit": 35.0, "tolerance": (0.01, 5), "gain": "PID",
+         "PID": (32, 0.031, 0), "temp": 23.0, "output": 1}
+
+
+def summarize(durations, calls = None, wire = (0, 0)):
+    """ Returns a dictionary of latency percentiles in ms, calls per second
+        and bytes per call from a list of call durations in seconds
+        calls is the number of calls the durations cover, one each by
+        default, and wire the bytes written to and read from the devices """
+    durations = np.asarray(durations, dtype = float)
+    calls = len(durations) if calls is None else calls
+    total = durations.sum()
+    p50, p95, p99 = np.percentile(durations, [50, 95, 99]) * 1e3
+    return({"count":            int(calls),
+            "p50_ms":           float(p50),
+            "p95_ms":           float(p95),
+            "p99_ms":           float(p99),
+            "mean_ms":          float(durations.mean() * 1e3),
+            "max_ms":           float(durations.max() * 1e3),
+            "calls_per_s":      float(calls / total) if total else 0.0,
+            "bytes_out_per_call": wire[0] / calls,
+            "bytes_in_per_call":  wire[1] / calls})
+
+
+def _settle(simulators):
+    """ Waits until the simulators have answered every line sent, and
+        returns the total bytes they received and sent """
+    previous = None
+    while True:
+        counts = [(s.lines, s.bytes_in, s.bytes_out) for s in simulators]
+        if counts == previous:
+            return((sum(c[1] for c in counts), sum(c[2] for c in counts)))
+        previous = counts
+        sleep(0.05)
+
+
+def time_calls(function, count, simulators, warmup = 5):
+    """ Calls function count times after warmup calls, with its printing
+        silenced, and returns the summary of the timed calls """
+    durations = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(warmup):
+            function()
+        before = _settle(simulators)
+        for i in range(count):
+            start = perf_counter()
+            function()
+            durations.append(perf_counter() - start)
+    after = _settle(simulators)
+    return(summarize(durations, count, (after[0] - before[0],
+                                        after[1] - before[1])))
+
+
+def _poll_unbatched(device):
+    device.read_temp()
+    device.read_set_temp()
+    device.read_current()
+    device.read_voltage()
+
+
+def run(count = 200, devices = 4, faults = None, report = print):
+    """ Runs every benchmark on fresh simulators and returns the results
+        faults is the simulator.Faults of each simulator, wire time at
+        38400 baud only by default. report is called with each result line """
+    if faults is None:
+        faults = Faults()
+    results = {}
+    simulators = [PtySimulator(faults = faults, seed = i)
+                  for i in range(max(devices, 1))]
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            device = arroyo(simulators[0].port, cache = None)
+            device.apply_config(SETUP)
+        for group, methods in (("read", READS), ("set", SETS)):
+            for name, args in methods:
+                method = getattr(device, name)
+                results[group + "." + name] = time_calls(
+                    lambda: method(*args), count, simulators[:1])
+                report(_line(group + "." + name, results[group + "." +
+                                                         name]))
+        for name, function in (("poll_unbatched",
+                                lambda: _poll_unbatched(device)),
+                               ("poll_snapshot", device.read_snapshot)):
+            results[name] = time_calls(function, count, simulators[:1])
+            report(_line(name, results[name]))
+        with contextlib.redirect_stdout(io.StringIO()):
+            device.close()
+            shadowed = arroyo(simulators[0].port, cache = None,
+                              shadow = True)
+        def poll_shadow():
+            shadowed.read_snapshot()
+            shadowed.read_PID()
+        results["poll_shadow"] = time_calls(poll_shadow, count,
+                                            simulators[:1])
+        report(_line("poll_shadow", results["poll_shadow"]))
+        with contextlib.redirect_stdout(io.StringIO()):
+            shadowed.close()
+            fleet = ArroyoFleet([s.port for s in simulators], cache = None)
+        results["poll_fleet"] = time_calls(fleet.poll, count, simulators)
+        results["poll_fleet"]["devices"] = len(simulators)
+        report(_line("poll_fleet", results["poll_fleet"]))
+        with contextlib.redirect_stdout(io.StringIO()):
+            fleet.close()
+        results["poll_async"] = asyncio.run(_time_async(simulators, count))
+        report(_line("poll_async", results["poll_async"]))
+    finally:
+        for simulator in simulators:
+            simulator.close()
+    return(results)
+
+
+async def _time_async(simulators, count, warmup = 5):
+    """ Times gather_fleet read_snapshot over every simulator """
+    devices = await open_fleet([s.port for s in simulators])
+    try:
+        for i in range(warmup):
+            await gather_fleet(devices, "read_snapshot")
+        before = _settle(simulators)
+        durations = []
+        for i in range(count):
+            start = perf_counter()
+            await gather_fleet(devices, "read_snapshot")
+            durations.append(perf_counter() - start)
+        after = _settle(simulators)
+    finally:
+        for device in devices:
+            await device.close()
+    result = summarize(durations, count, (after[0] - before[0],
+                                          after[1] - before[1]))
+    result["devices"] = len(simulators)
+    return(result)
+
+
+def _line(name, result):
+    """ One line of the results table """
+    return("{:<32}{:>9.2f}{:>9.2f}{:>9.2f}{:>10.1f}{:>8.0f}{:>8.0f}".format(
+        name, result["p50_ms"], result["p95_ms"], result["p99_ms"],
+        result["calls_per_s"], result["bytes_out_per_call"],
+        result["bytes_in_per_call"]))
+
+
+def save(results, path, settings):
+    """ Writes results with the run settings and platform to a JSON file """
+    with open(path, "w") as results_file:
+        json.dump({"created":   time(),
+                   "python":    sys.version,
+                   "platform":  platform.platform(),
+                   "settings":  settings,
+                   "results":   results}, results_file, indent = 2)
+    return
+
+
+def compare(results, path, threshold = 0.1):
+    """ Lists (name, old p50, new p50, ratio) for every benchmark of the
+        JSON file at path whose p50 latency changed by more than threshold
+        as a fraction """
+    with open(path) as results_file:
+        old = json.load(results_file)["results"]
+    changes = []
+    for name, result in results.items():
+        if name in old and old[name]["p50_ms"]:
+            ratio = result["p50_ms"] / old[name]["p50_ms"]
+            if abs(ratio - 1) > threshold:
+                changes.append((name, old[name]["p50_ms"], result["p50_ms"],
+                                ratio))
+    return(changes)
+
+
+def main(argv = None):
+    """ Command line entry point, see the module description """
+    parser = argparse.ArgumentParser(description = "Benchmark the Arroyo " +
+                                     "TEC interfaces against simulated " +
+                                     "controllers")
+    parser.add_argument("--count", type = int, default = 200,
+                        help = "timed calls per benchmark")
+    parser.add_argument("--devices", type = int, default = 4,
+                        help = "simulated controllers for the fleet loops")
+    parser.add_argument("--latency", type = float, default = 0.0,
+                        help = "simulated processing time per line, s")
+    parser.add_argument("--jitter", type = float, default = 0.0,
+                        help = "simulated random extra delay, s")
+    parser.add_argument("--baudrate", type = int, default = 38400,
+                        help = "simulated line speed, 0 for none")
+    parser.add_argument("--output", default = "benchmark.json",
+                        help = "JSON file for the results")
+    parser.add_argument("--compare", help = "JSON results of an earlier " +
+                        "run to compare with")
+    args = parser.parse_args(argv)
+    settings = {"count": args.count, "devices": args.devices,
+                "latency": args.latency, "jitter": args.jitter,
+                "baudrate": args.baudrate}
+    faults = Faults(args.latency, args.jitter, baudrate = args.baudrate or
+                    None)
+    print("{:<32}{:>9}{:>9}{:>9}{:>10}{:>8}{:>8}".format(
+        "Benchmark", "p50 ms", "p95 ms", "p99 ms", "calls/s", "B out",
+        "B in"))
+    results = run(args.count, args.devices, faults)
+    save(results, args.output, settings)
+    print("Saved results to " + args.output)
+    if args.compare:
+        changes = compare(results, args.compare)
+        if not changes:
+            print("No p50 latency changed by more than 10%")
+        for name, old, new, ratio in changes:
+            print("{:<32}{:>9.2f} ms -> {:>9.2f} ms ({:+.0%})".format(
+                name, old, new, ratio - 1))
+    return(0)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+
+# Shared fixtures of the tests #
+simulator serves a simulator.SimulatedArroyo on a pseudo-terminal, device
+is a serial_interface.arroyo connected to it.
+"""
+
+import sys
+import pytest
+from serial_interface import arroyo
+
+
+@pytest.fixture
+def simulator():
+    if sys.platform.startswith("win"):
+        pytest.skip("PtySimulator needs a pseudo-terminal")
+    from simulator import PtySimulator
+    with PtySimulator(seed = 1, autotune_time = 0.5) as simulator:
+        yield simulator
+
+
+@pytest.fixture
+def device(simulator):
+    device = arroyo(simulator.port, cache = None)
+    yield device
+    device.close()
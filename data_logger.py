@@ -0,0 +1,310 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+
+# Binary telemetry logger for Arroyo TEC Controllers #
+ChunkLogger streams samples to disk as columnar binary chunks in place of one
+CSV row per sample. Samples are buffered in memory and written as one chunk
+when enough have accumulated or enough time has passed, and files are
+rotated by size or age. A timer thread writes the buffered samples once the
+time has passed even if no further sample arrives.
+
+## File format ##
+Every file starts with a header:
+    MAGIC, a 4 byte little endian header length, then a UTF-8 JSON header
+    holding the column names and NumPy dtypes
+followed by any number of chunks:
+    CHUNK_MAGIC, 4 byte row count, 4 byte CRC32 of the payload, then the
+    payload: every column's values in turn, row count values each
+A chunk is flushed and synced before the next one starts, so after a crash
+everything up to the last complete chunk is readable. read_log skips a
+truncated or corrupt final chunk.
+"""
+
+import csv
+import json
+import os
+import struct
+import threading
+import zlib
+import numpy as np
+from datetime import datetime
+from time import monotonic, time
+from telemetry import SAMPLE_DTYPE
+
+
+MAGIC = b"ARROYOLOG1\n"
+CHUNK_MAGIC = b"CHNK"
+CHUNK_HEADER = struct.Struct("<4sII")
+EXTENSION = ".alog"
+
+
+def _column_dtypes(dtype):
+    """ Lists (name, dtype string) for each field of a structured dtype """
+    return([(name, dtype.fields[name][0].str) for name in dtype.names])
+
+
+def write_header(log_file, dtype):
+    """ Writes the file header describing the columns of dtype """
+    header = json.dumps({"columns": _column_dtypes(dtype),
+                         "created": time()}).encode("utf-8")
+    log_file.write(MAGIC + struct.pack("<I", len(header)) + header)
+    return
+
+
+def read_header(log_file):
+    """ Reads a file header and returns it with the structured dtype """
+    if log_file.read(len(MAGIC)) != MAGIC:
+        raise ValueError("Not an Arroyo telemetry log: " +
+                         str(getattr(log_file, "name", log_file)))
+    length, = struct.unpack("<I", log_file.read(4))
+    header = json.loads(log_file.read(length).decode("utf-8"))
+    dtype = np.dtype([(str(name), kind) for name, kind in header["columns"]])
+    return(header, dtype)
+
+
+def encode_chunk(data):
+    """ Packs a structured array into a columnar chunk """
+    payload = b"".join(np.ascontiguousarray(data[name]).tobytes()
+                       for name in data.dtype.names)
+    return(CHUNK_HEADER.pack(CHUNK_MAGIC, len(data), zlib.crc32(payload)) +
+           payload)
+
+
+def decode_chunk(payload, rows, dtype):
+    """ Unpacks a columnar chunk payload into a structured array """
+    data = np.empty(rows, dtype = dtype)
+    offset = 0
+    for name in dtype.names:
+        column = dtype.fields[name][0]
+        size = rows * column.itemsize
+        data[name] = np.frombuffer(payload, dtype = column, count = rows,
+                                   offset = offset)
+        offset += size
+    return(data)
+
+
+def iter_chunks(path):
+    """ Yields each complete chunk of a log file as a structured array
+        Stops quietly at a truncated or corrupt chunk """
+    with open(path, "rb") as log_file:
+        header, dtype = read_header(log_file)
+        while True:
+            head = log_file.read(CHUNK_HEADER.size)
+            if len(head) < CHUNK_HEADER.size:
+                return
+            magic, rows, crc = CHUNK_HEADER.unpack(head)
+            payload = log_file.read(rows * dtype.itemsize)
+            if magic != CHUNK_MAGIC or len(payload) < rows * dtype.itemsize \
+                    or zlib.crc32(payload) != crc:
+                return
+            yield(decode_chunk(payload, rows, dtype))
+
+
+def read_log(paths):
+    """ Reads one log file, or a list of them in order, into one structured
+        array """
+    if isinstance(paths, str):
+        paths = [paths]
+    chunks = [chunk for path in paths for chunk in iter_chunks(path)]
+    if not chunks:
+        return(np.empty(0, dtype = SAMPLE_DTYPE))
+    return(np.concatenate(chunks))
+
+
+def export_csv(paths, csv_path):
+    """ Writes log files as a CSV file in the format of example_script.py
+        Returns the number of rows written """
+    rows = 0
+    if isinstance(paths, str):
+        paths = [paths]
+    with open(csv_path, mode = "w", newline = "") as csv_file:
+        writer = csv.writer(csv_file, delimiter = ",")
+        writer.writerow(["Timestamp", "Target", "Temperature", "Current",
+                         "Voltage", "Power"])
+        for path in paths:
+            for chunk in iter_chunks(path):
+                for row in chunk:
+                    writer.writerow([datetime.fromtimestamp(row["time"]),
+                                     row["target"], row["temperature"],
+                                     row["current"], row["voltage"],
+                                     row["power"]])
+                rows += len(chunk)
+    return(rows)
+
+
+
+class ChunkLogger(object):
+    """ Class writing telemetry samples to rotating binary chunk files """
+
+
+    def __init__(self, directory = ".", prefix = "telemetry",
+                 chunk_rows = 600, flush_interval = 60.0,
+                 max_bytes = 64 * 2**20, max_age = 24 * 3600.0,
+                 dtype = SAMPLE_DTYPE):
+        """ Files are named prefix_YYYY-MM-DD_HHMMSS.alog in directory
+            A chunk is written once chunk_rows samples are buffered or
+            flush_interval seconds have passed since the last write, on a
+            timer thread if no sample arrives, None to write only full
+            chunks. A new file is started when the current one exceeds
+            max_bytes or is older than max_age seconds. """
+        self.directory = directory
+        self.prefix = prefix
+        self.chunk_rows = chunk_rows
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.dtype = np.dtype(dtype)
+        self.paths = []
+        self._buffer = np.empty(chunk_rows, dtype = self.dtype)
+        self._rows = 0
+        self._file = None
+        self._opened = None
+        self._flushed = monotonic()
+        # Guards the buffer and the file against the timer thread
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        self._timer = None
+        os.makedirs(directory, exist_ok = True)
+        if flush_interval is not None:
+            self._timer = threading.Thread(target = self._run,
+                                           name = "arroyo-logger",
+                                           daemon = True)
+            self._timer.start()
+
+
+    def __enter__(self):
+        return(self)
+
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+    @property
+    def path(self):
+        """ Path of the file being written, None before the first chunk """
+        return(self.paths[-1] if self._file is not None else None)
+
+
+    def append(self, *row):
+        """ Buffers one sample given as one value per column """
+        with self._lock:
+            self._buffer[self._rows] = row
+            self._rows += 1
+            if self._rows == self.chunk_rows or self._flush_due():
+                self.flush()
+        return
+
+
+    def _flush_due(self):
+        return(self.flush_interval is not None and
+               monotonic() - self._flushed >= self.flush_interval)
+
+
+    def _run(self):
+        """ Flushes buffered samples flush_interval seconds after the last
+            write, until closed """
+        while not self._stop.wait(max(self.flush_interval -
+                                      (monotonic() - self._flushed), 0.01)):
+            with self._lock:
+                if self._flush_due():
+                    self.flush()
+        return
+
+
+    def append_snapshot(self, timestamp, snapshot):
+        """ Buffers a serial_interface.Snapshot taken at timestamp """
+        self.append(timestamp, snapshot.set_temp, snapshot.temp,
+                    snapshot.current, snapshot.voltage, snapshot.power)
+        return
+
+
+    def extend(self, data):
+        """ Buffers a structured array of samples, written in chunks as
+            append does """
+        data = np.asarray(data, dtype = self.dtype)
+        with self._lock:
+            start = 0
+            while start < len(data):
+                rows = min(self.chunk_rows - self._rows, len(data) - start)
+                self._buffer[self._rows:self._rows + rows] = \
+                    data[start:start + rows]
+                self._rows += rows
+                start += rows
+                if self._rows == self.chunk_rows:
+                    self.flush()
+            if self._flush_due():
+                self.flush()
+        return
+
+
+    def append_array(self, data):
+        """ Writes a structured array of samples as one chunk at once,
+            flushing buffered rows first so the order is kept """
+        with self._lock:
+            self.flush()
+            if len(data):
+                self._write(np.asarray(data, dtype = self.dtype))
+        return
+
+
+    def flush(self):
+        """ Writes buffered samples as one chunk and syncs it to disk """
+        with self._lock:
+            self._flushed = monotonic()
+            if not self._rows:
+                return
+            rows = self._buffer[:self._rows]
+            self._write(rows)
+            self._rows = 0
+        return
+
+
+    def _write(self, data):
+        """ Writes one chunk, rotating the file first when due """
+        if self._file is None or self._rotation_due():
+            self._rotate()
+        self._file.write(encode_chunk(data))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        return
+
+
+    def _rotation_due(self):
+        """ Checks the size and age of the current file """
+        return(self._file.tell() >= self.max_bytes or
+               monotonic() - self._opened >= self.max_age)
+
+
+    def _rotate(self):
+        """ Closes the current file and starts a new one """
+        if self._file is not None:
+            self._file.close()
+        name = self.prefix + "_" + \
+            datetime.now().strftime("%Y-%m-%d_%H%M%S")
+        path = os.path.join(self.directory, name + EXTENSION)
+        serial = 1
+        while os.path.exists(path):
+            path = os.path.join(self.directory, name + "_" + str(serial) +
+                                EXTENSION)
+            serial += 1
+        self._file = open(path, "wb")
+        write_header(self._file, self.dtype)
+        self._opened = monotonic()
+        self.paths.append(path)
+        return
+
+
+    def close(self):
+        """ Writes any buffered samples, stops the timer thread and closes
+            the file """
+        self._stop.set()
+        if self._timer is not None:
+            self._timer.join()
+        with self._lock:
+            self.flush()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+        return
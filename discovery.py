@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+
+# Discovery cache for Arroyo TEC Controllers #
+Keeps a JSON file mapping each serial port to the identity of the controller
+found on it: model, serial number, firmware version and the optional
+commands its firmware does not support. serial_interface.arroyo uses it to
+connect straight to a controller picked by serial number or model without
+probing every port, and to reject unsupported commands before they are sent.
+"""
+
+import contextlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+
+# Default location of the discovery cache
+DEFAULT_CACHE = os.path.join(os.path.expanduser("~"), ".arroyo_tec",
+                             "devices.json")
+
+# Commands missing from older firmware, with the first major firmware version
+#   that supports them
+OPTIONAL_COMMANDS = {"TEC:LIM:V": 3}
+
+# Serializes the cache updates of every DeviceCache in this process, other
+#   processes are kept out by a lock on the file path + ".lock"
+_LOCK = threading.Lock()
+
+
+
+class UnsupportedCommand(ValueError):
+    """ Raised for a command the device's firmware does not support """
+
+
+def parse_identity(idn):
+    """ Splits an *IDN? reply into a dictionary with manufacturer, model,
+        serial_number and firmware (None when not found)
+        Accepts both "Arroyo 585-05-12 TECPak v3.1 SN 12345" and comma
+        separated "Arroyo,5310,12345,3.1" styles """
+    tokens = [t for t in re.split(r"[,\s]+", idn.strip()) if t]
+    identity = {"idn":           idn.strip(),
+                "manufacturer":  tokens[0] if tokens else None,
+                "model":         tokens[1] if len(tokens) > 1 else None,
+                "serial_number": None,
+                "firmware":      None}
+    firmware = re.search(r"\bv(\d+(?:\.\d+)*)\b", idn, re.IGNORECASE)
+    if not firmware:
+        firmware = re.search(r"\b(\d+\.\d+(?:\.\d+)*)\b", idn)
+    if firmware:
+        identity["firmware"] = firmware.group(1)
+    serial_number = re.search(r"\b(?:SN|S/N)[\s:#]*(\w+)", idn, re.IGNORECASE)
+    if serial_number:
+        identity["serial_number"] = serial_number.group(1)
+    else:
+        for token in tokens[2:]:
+            if token.isdigit():
+                identity["serial_number"] = token
+                break
+    return(identity)
+
+
+def firmware_major(firmware):
+    """ Returns the major version number of a firmware string or None """
+    try:
+        return(int(str(firmware).split(".")[0]))
+    except ValueError:
+        return(None)
+
+
+def matches(identity, serial_number = None, model = None):
+    """ Checks an identity against an optional serial number and model """
+    if serial_number is not None and \
+            str(identity.get("serial_number")) != str(serial_number):
+        return(False)
+    if model is not None and model not in identity.get("idn", ""):
+        return(False)
+    return(True)
+
+
+
+class DeviceCache(object):
+    """ Class holding the port to identity map saved on disk """
+
+
+    def __init__(self, path = DEFAULT_CACHE):
+        """ Loads the cache file at path, an empty cache if it is missing """
+        self.path = path
+        self.records = self._load()
+
+
+    def _load(self):
+        """ Reads the records from disk, ignoring a missing or broken file """
+        try:
+            with open(self.path) as cache_file:
+                return(json.load(cache_file))
+        except (OSError, ValueError):
+            return({})
+
+
+    @contextlib.contextmanager
+    def _locked(self):
+        """ Holds the cache file for one read, modify and write, against
+            other threads and processes """
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok = True)
+        with _LOCK, open(self.path + ".lock", "a+b") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            else:
+                lock_file.seek(0)
+                # Retries for about 10 s before raising OSError
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+                else:
+                    lock_file.seek(0)
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+    def _save(self):
+        """ Writes the records to disk atomically, through a temporary file
+            of its own in the same directory """
+        descriptor, temporary = tempfile.mkstemp(
+            prefix = os.path.basename(self.path) + ".",
+            suffix = ".tmp", dir = os.path.dirname(self.path) or ".")
+        try:
+            with os.fdopen(descriptor, "w") as cache_file:
+                json.dump(self.records, cache_file, indent = 1,
+                          sort_keys = True)
+            os.replace(temporary, self.path)
+        except BaseException:
+            os.remove(temporary)
+            raise
+
+
+    def get(self, port):
+        """ Returns the record of port or None """
+        return(self.records.get(port))
+
+
+    def find(self, serial_number = None, model = None):
+        """ Returns the most recently updated record matching serial_number
+            and model, or None """
+        found = [r for r in self.records.values()
+                 if matches(r, serial_number, model)]
+        if not found:
+            return(None)
+        return(max(found, key = lambda r: r.get("updated", 0)))
+
+
+    def update(self, record):
+        """ Stores the record of record["port"] and saves the cache
+            Records written by other processes since loading are kept """
+        record = dict(record, updated = time.time())
+        with self._locked():
+            self.records = self._load()
+            # A device is on one port only, drop stale entries for it
+            if record.get("serial_number"):
+                for port, other in list(self.records.items()):
+                    if other.get("serial_number") == record["serial_number"] \
+                            and other.get("model") == record.get("model"):
+                        del self.records[port]
+            self.records[record["port"]] = record
+            self._save()
+        return(record)
+
+
+    def remove(self, port):
+        """ Forgets the record of port """
+        with self._locked():
+            self.records = self._load()
+            if self.records.pop(port, None) is not None:
+                self._save()
+        return
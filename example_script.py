@@ -10,7 +10,9 @@ Instruments, Inc.
 
 Sets up TEC controller
 
-Logs data to file in CSV format
+Logs data to binary chunk files (.alog, see data_logger.py), with min/mean/
+max rollups in the rollups directory (see rollup.py). data_logger.export_csv
+converts a log to CSV, and log_reader.py summarizes and plots it
 Plots the last 5 hours of live data continously
 Keyboard Interrupt (^C) ends plotting, saves data, and turns off TEC source
 """
@@ -19,142 +21,101 @@ Keyboard Interrupt (^C) ends plotting, saves data, and turns off TEC source
 import os
 print(os.getcwd())
 
-import csv
 from serial_interface import arroyo
-from time import sleep
+from acquisition import Acquirer
+from data_logger import ChunkLogger
+from rollup import Rollup
+from stability import Stability
+from live_plot import LivePlot
 from matplotlib import pyplot as plt
 from datetime import datetime, timedelta
 
 # Create an object for the TEC controller which opens up serial com w/ instr.
 # The command line interface will print all available arroyo devices in a 
 #   number list. Type the number of the instrument you wish to use and hit
-#   "enter".
+#   "enter". For unattended runs pass port=, serial_number= or model= instead,
+#   e.g. arroyo(model="586-08-26"), to connect without the prompt.
 TECpak586 = arroyo()
 set_point = 23.0
-TECpak586.set_mode("T")
-TECpak586.set_heatcool("BOTH")
-TECpak586.set_current_limit(4.7)
-TECpak586.set_voltage_limit(23.0)
 
-# Set some restrictions on outputs and setpoints
-TECpak586.set_fan("OFF",1)
-TECpak586.set_TLO_limit(-1.0)
-TECpak586.set_THI_limit(35.0)
-
-# Sets tolerance spec for controller
-TECpak586.set_tolerance(0.01, 5)
-
-# Sets control type to PID and sets values, tune to your application
-TECpak586.set_gain("PID")
-TECpak586.set_PID(32, 0.031, 0)
-
-# Turns on output and sets temperature control point 
-TECpak586.set_output(1)
-TECpak586.set_temp(set_point)
+# Only settings that differ from the controller's are written. The settings
+#   could also be kept in a JSON file and applied with apply_config(path)
+config = {"mode":           "T",
+          "heatcool":       "BOTH",
+          "current_limit":  4.7,
+          "voltage_limit":  23.0,
+          # Set some restrictions on outputs and setpoints
+          "fan":            ("OFF", 1),
+          "TLO_limit":      -1.0,
+          "THI_limit":      35.0,
+          # Sets tolerance spec for controller
+          "tolerance":      (0.01, 5),
+          # Sets control type to PID and sets values, tune to your application
+          "gain":           "PID",
+          "PID":            (32, 0.031, 0),
+          # Sets temperature control point and turns on output
+          "temp":           set_point,
+          "output":         1}
+result = TECpak586.apply_config(config)
+print("Changed settings:   " + str(result.changed))
+if result.failed:
+    print("Failed to apply:    " + str(result.failed))
 
 # Creating active graph to continously plot the most recent 5 hours of data
+# 5 hours length for plotting and storage within python, the oldest samples
+#   are overwritten after 18000 seconds (5 hours)
+# Samples are taken once per second on a background thread, unaffected by 
+#   the time spent drawing the plot
 run_start = datetime.now()
 run_length = timedelta(0)
-t = []
-target = []
-temperature = []
-V_out = []
-I_out = []
-P_out = []
-t.append(datetime.now())
-target.append(set_point)
-temperature.append(TECpak586.read_temp())
-V_out.append(TECpak586.read_voltage())
-I_out.append(TECpak586.read_current())
-P_out.append(I_out[-1] * V_out[-1])
-sleep(0.9)
-t.append(datetime.now())
-target.append(set_point)
-temperature.append(TECpak586.read_temp())
-V_out.append(TECpak586.read_voltage())
-I_out.append(TECpak586.read_current())
-P_out.append(I_out[-1] * V_out[-1])
-sleep(0.9)
+acquirer = Acquirer(TECpak586, rate = 1.0, capacity = 18000)
+new_samples = acquirer.subscribe()
+acquirer.start()
 
-fig1 = plt.figure(figsize=(4,3),dpi=150)
-ax1 = fig1.add_subplot(2,2,1)
-ax1.set_xlim( t[0] - timedelta(seconds=30), t[-1] + timedelta(seconds=30))
-ax1.set_ylim(22.9, 23.1)
-temp_line, = ax1.plot(t, temperature, 'r.')
-target_line, = ax1.plot(t, target, 'b--')
-ax1.set_title("WETCAT Thermistor")
-ax1.set_xlabel("Time (Date then hour)")
-ax1.set_ylabel("Temperature [\u00b0C]")
+# Only the data is redrawn each tick and every line is reduced to the min/max
+#   of 1000 time bins, so drawing 5 hours costs the same as drawing 5 minutes
+plot = LivePlot(window = 18000, bins = 1000, title = "WETCAT Thermistor")
+plt.show(block = False)
 
-ax2 = fig1.add_subplot(2,2,4)
-ax2.set_xlim( t[0] - timedelta(seconds=30), t[-1] + timedelta(seconds=30))
-ax2.set_ylim(-5.0, 5.0)
-I_line, = ax2.plot(t, I_out, 'b.')
-#ax2.set_title("Controller Current")
-ax2.set_xlabel("Time (Date then hour)")
-ax2.set_ylabel("Output Current [Amps]")
+# 1 second, 1 minute and 1 hour summaries for reports over long runs
+rollup = Rollup(directory = "rollups")
 
-ax3 = fig1.add_subplot(2,2,3)
-ax3.set_xlim( t[0] - timedelta(seconds=30), t[-1] + timedelta(seconds=30))
-ax3.set_ylim(-21.0, 21.0)
-V_line, = ax3.plot(t, V_out, 'g.')
-#ax3.set_title("Controller Voltage")
-ax3.set_xlabel("Time (Date then hour)")
-ax3.set_ylabel("Output Voltage [Volts]")
-
-ax4 = fig1.add_subplot(2,2,2)
-ax4.set_xlim( t[0] - timedelta(seconds=30), t[-1] + timedelta(seconds=30))
-ax4.set_ylim(0, 50)
-P_line, = ax4.plot(t, P_out, 'g.')
-#ax4.set_title("Bulk Power Supply")
-ax4.set_xlabel("Time (Date then hour)")
-ax4.set_ylabel("Output Electrical Power [Watts]")
+# Rolling std, Allan deviation and PSD of the temperature over the 5 hours
+stability = Stability(rate = 1.0, window = 18000)
 
 # Logs and plots data user enters keyboard interrupt (^C) into terminal
-with open(str(t[0])[0:10] + '_data_log', mode='w') as data_log:
-    data_writer = csv.writer(data_log, delimiter=',')
-    data_writer.writerow(["Timestamp","Target","Temperature","Current","Voltage","Power"])
+# Data is logged in binary chunks written every 10 minutes, files are rotated
+#   daily. export_csv converts them to the CSV format when needed.
+with ChunkLogger(".", prefix = str(run_start)[0:10] + '_data_log', 
+                 chunk_rows = 600, flush_interval = 600.0) as data_log:
     try:    # a keyboard interup is used to stop data collection and initiate the turning off of the controller.
         while True:
-            t.append(datetime.now())
-            target.append(set_point)
-            temperature.append(TECpak586.read_temp())
-            V_out.append(TECpak586.read_voltage())
-            I_out.append(TECpak586.read_current())
-            P_out.append(I_out[-1] * V_out[-1])
-            temp_line.set_xdata(t)
-            temp_line.set_ydata(temperature)
-            target_line.set_xdata(t)
-            target_line.set_ydata(target)
-            I_line.set_xdata(t)
-            I_line.set_ydata(I_out)
-            V_line.set_xdata(t)
-            V_line.set_ydata(V_out)
-            P_line.set_xdata(t)
-            P_line.set_ydata(P_out)
-            ax1.set_xlim( t[0] - timedelta(seconds=30), t[-1] + timedelta(seconds=30) )
-            ax2.set_xlim( t[0] - timedelta(seconds=30), t[-1] + timedelta(seconds=30) )
-            ax3.set_xlim( t[0] - timedelta(seconds=30), t[-1] + timedelta(seconds=30) )
-            ax4.set_xlim( t[0] - timedelta(seconds=30), t[-1] + timedelta(seconds=30) )
-            plt.pause(0.9)
+            plot.pause(0.9)
             run_length = datetime.now() - run_start
-            # 5 hours length for plotting and storage within python
-            # Data is trimmed continuously after 18000 seconds (5 hours)
-            if len(t) > 18000:
-                t = t[1:]
-                target = target[1:]
-                temperature = temperature[1:]
-                V_out = V_out[1:]
-                I_out = I_out[1:]
-                P_out = P_out[1:]
             # Store more recently aquired data from each measurement
-            data_writer.writerow([t[-1],target[-1],temperature[-1],
-                                  I_out[-1],V_out[-1],P_out[-1]])
+            while new_samples:
+                timestamp, snapshot = new_samples.popleft()
+                plot.add(timestamp, snapshot)
+                data_log.append_snapshot(timestamp, snapshot)
+                rollup.add(timestamp, snapshot)
+                stability.add(timestamp, snapshot)
+            plot.update()
     except KeyboardInterrupt:
         pass
 
+acquirer.stop()
+rollup.close()
+print("Acquisition: " + str(acquirer.stats()))
+print("Logged to:   " + str(data_log.paths))
+report = stability.report()
+print("Temperature std: " + str(report["std"]) + " C, peak to peak: " +
+      str(report["peak_to_peak"]) + " C")
+print("Allan deviation: " + str(dict(zip(report["taus"], report["adev"]))))
+# For a CSV copy of the log use data_logger.export_csv, e.g.
+#   export_csv(data_log.paths, str(run_start)[0:10] + '_data_log.csv')
+
 # Saves png of figure
-plt.savefig(str(t[-1])[0:10] + 'figure.png')
+plot.savefig(str(datetime.now())[0:10] + 'figure.png')
 
 # Closes communication with the instrument... Don't forget to do this!
 TECpak586.set_output(0)
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+
+# Fleet of Arroyo TEC Controllers #
+ArroyoFleet drives a rack of controllers with one worker thread per port.
+Every port is opened, configured and polled in parallel, so the time taken
+for a whole rack is about the time taken for its slowest controller.
+Commands for one port always run on that port's thread, one at a time.
+
+Example:
+    fleet = ArroyoFleet()
+    fleet.configure([("set_mode", ("T",)),
+                     ("set_PID", (32, 0.031, 0)),
+                     ("set_output", (1,))])
+    for timestamp, snapshots in fleet.stream(1.0):
+        print(timestamp, snapshots)
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from serial_interface import arroyo, find_ports
+
+
+
+class ArroyoFleet(object):
+    """ Class to control several Arroyo TEC Sources in parallel """
+
+
+    def __init__(self, ports = None, timeout = 1.0, **kwargs):
+        """ Opens every port in parallel worker threads
+            ports defaults to every port found by serial_interface.find_ports
+            Keyword arguments, e.g. cache, transport, instrumentation or
+            shadow, are passed on to each arroyo
+            Ports that fail to open are left out of self.devices and their
+            exception is kept in self.failed """
+        if ports is None:
+            ports = find_ports()
+        self.timeout = timeout
+        self.devices = {}
+        self.failed = {}
+        self._workers = {}
+        futures = {}
+        for port in ports:
+            worker = ThreadPoolExecutor(max_workers = 1,
+                                        thread_name_prefix = "arroyo-" +
+                                                             str(port))
+            self._workers[port] = worker
+            futures[port] = worker.submit(arroyo, port, timeout, **kwargs)
+        for port, future in futures.items():
+            try:
+                self.devices[port] = future.result()
+            except Exception as error:
+                self.failed[port] = error
+                self._workers.pop(port).shutdown(wait = False)
+                print("Failed to connect to " + str(port) + ": " + str(error))
+
+
+    def __len__(self):
+        return(len(self.devices))
+
+
+    def submit(self, port, function, *args, **kwargs):
+        """ Runs function(device, *args, **kwargs) on the worker thread of
+            port and returns a concurrent.futures.Future """
+        device = self.devices[port]
+        return(self._workers[port].submit(function, device, *args, **kwargs))
+
+
+    def call(self, method, *args, return_exceptions = False, **kwargs):
+        """ Calls the named arroyo method with args on every device in
+            parallel and returns a dictionary of results keyed by port
+            With return_exceptions the exception raised by a device is
+            returned in place of its result, otherwise it is re-raised """
+        futures = {port: self.submit(port, getattr(arroyo, method), *args,
+                                     **kwargs)
+                   for port in self.devices}
+        return(self._collect(futures, return_exceptions))
+
+
+    def configure(self, settings, return_exceptions = False):
+        """ Applies the same settings to every device in parallel
+            settings is a list of (method name, argument tuple) pairs applied
+            in order on each device. Returns a dictionary keyed by port of the
+            list of results of each setting """
+        def apply(device):
+            return([getattr(device, method)(*args) for method, args in
+                    settings])
+        futures = {port: self.submit(port, apply) for port in self.devices}
+        return(self._collect(futures, return_exceptions))
+
+
+    def poll(self, return_exceptions = True):
+        """ Reads a snapshot from every device in parallel
+            Returns the time.time() timestamp taken when the requests were
+            issued and a dictionary of Snapshots keyed by port """
+        timestamp = time.time()
+        snapshots = self.call("read_snapshot",
+                              return_exceptions = return_exceptions)
+        return(timestamp, snapshots)
+
+
+    def stream(self, interval, count = None):
+        """ Yields (timestamp, snapshots) from poll every interval seconds
+            Ticks follow monotonic deadlines so samples from all devices stay
+            aligned on one time grid without drifting. A tick that cannot be
+            served on time is skipped. Stops after count samples if given """
+        deadline = time.monotonic()
+        sample = 0
+        while count is None or sample < count:
+            yield(self.poll())
+            sample += 1
+            deadline += interval
+            now = time.monotonic()
+            if now > deadline:
+                # Skips the ticks that were missed while polling
+                deadline += ((now - deadline) // interval + 1) * interval
+            time.sleep(deadline - now)
+
+
+    def close(self):
+        """ Closes every device and stops the worker threads """
+        self.call("close", return_exceptions = True)
+        for worker in self._workers.values():
+            worker.shutdown()
+        return
+
+
+    def _collect(self, futures, return_exceptions):
+        """ Waits on a dictionary of futures and returns their results """
+        results = {}
+        for port, future in futures.items():
+            try:
+                results[port] = future.result()
+            except Exception as error:
+                if not return_exceptions:
+                    raise
+                results[port] = error
+        return(results)
@@ -0,0 +1,296 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+
+# Instrumentation of the serial exchanges with Arroyo TEC Controllers #
+Instrumentation records every exchange made by serial_interface.arroyo:
+* A latency histogram per command, keyed by the command headers of the
+    line with values left out, e.g. "TEC:T;TEC:SET:T?".
+* Counters of exchanges, timeouts (no reply), short reads (a reply cut off
+    before its terminator), parse failures, other errors, retries (a line
+    sent again right after it failed) and bytes written and read.
+* Hooks called before and after every exchange.
+snapshot() returns all of it as a dictionary, and export_json and
+export_prometheus write it to a local file or in the Prometheus text format
+read by metrics scrapers (e.g. the node_exporter textfile collector).
+
+Example:
+    metrics = Instrumentation(labels = {"unit": "WETCAT"})
+    TECpak586 = arroyo(instrumentation = metrics)
+    ...
+    for command, stats in metrics.top(5):
+        print(command, stats["total_s"], stats["p99_ms"])
+    metrics.export_prometheus("/var/lib/node_exporter/arroyo.prom")
+"""
+
+import json
+import os
+import tempfile
+import threading
+import numpy as np
+from time import perf_counter, time
+
+
+# Upper bounds in seconds of the latency histogram buckets, 100 us to about
+#   9 s in half octave steps. Slower exchanges fall in a last, open bucket.
+BUCKETS = tuple(1e-4 * 2 ** (i / 2.0) for i in range(34))
+
+# Counters kept for every instrumented device
+COUNTERS = ("exchanges", "timeouts", "short_reads", "parse_failures",
+            "errors", "retries", "bytes_out", "bytes_in")
+
+
+def command_key(command):
+    """ Headers of the commands of a line with their values left out """
+    return(";".join(part.strip().split(" ")[0].upper()
+                    for part in command.split(";") if part.strip()))
+
+
+
+class LatencyHistogram(object):
+    """ Fixed bucket histogram of durations in seconds """
+
+
+    def __init__(self, bounds = BUCKETS):
+        self.bounds = np.asarray(bounds, dtype = float)
+        self.counts = np.zeros(len(self.bounds) + 1, dtype = np.int64)
+        self.count = 0
+        self.total = 0.0
+        self.minimum = np.inf
+        self.maximum = 0.0
+
+
+    def add(self, duration):
+        self.counts[np.searchsorted(self.bounds, duration)] += 1
+        self.count += 1
+        self.total += duration
+        self.minimum = min(self.minimum, duration)
+        self.maximum = max(self.maximum, duration)
+        return
+
+
+    def percentile(self, q):
+        """ Estimates the q-th percentile, interpolating inside a bucket """
+        if not self.count:
+            return(np.nan)
+        rank = q / 100.0 * self.count
+        cumulative = np.cumsum(self.counts)
+        bucket = int(np.searchsorted(cumulative, rank))
+        low = self.bounds[bucket - 1] if bucket else 0.0
+        high = self.bounds[bucket] if bucket < len(self.bounds) else \
+            self.maximum
+        below = cumulative[bucket - 1] if bucket else 0
+        fraction = (rank - below) / self.counts[bucket]
+        value = low + fraction * (high - low)
+        return(float(min(max(value, self.minimum), self.maximum)))
+
+
+    def summary(self):
+        """ Dictionary of the count, total, extremes and percentiles """
+        return({"count":    self.count,
+                "total_s":  self.total,
+                "mean_ms":  self.total / self.count * 1e3 if self.count
+                            else np.nan,
+                "min_ms":   self.minimum * 1e3 if self.count else np.nan,
+                "max_ms":   self.maximum * 1e3,
+                "p50_ms":   self.percentile(50) * 1e3,
+                "p95_ms":   self.percentile(95) * 1e3,
+                "p99_ms":   self.percentile(99) * 1e3,
+                "buckets":  self.counts.tolist()})
+
+
+
+class Instrumentation(object):
+    """ Class collecting latency, counters and hooks for the exchanges of
+        one or more arroyo devices. Safe to share between threads. """
+
+
+    def __init__(self, labels = None, bounds = BUCKETS):
+        """ labels is a dictionary added to every exported metric, e.g. the
+            port or unit name. bounds are the histogram bucket bounds. """
+        self.labels = dict(labels or {})
+        self.bounds = bounds
+        self.pre_hooks = []
+        self.post_hooks = []
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.histograms = {}
+        self.failures = {}
+        self.last_error = None
+        self._failed = None
+        self._lock = threading.Lock()
+
+
+    def add_pre_hook(self, hook):
+        """ Calls hook(command) before every exchange """
+        self.pre_hooks.append(hook)
+        return
+
+
+    def add_post_hook(self, hook):
+        """ Calls hook(command, response, elapsed, error) after every
+            exchange, response being the raw bytes read (b"" for commands
+            without a reply) and error the exception raised, or None """
+        self.post_hooks.append(hook)
+        return
+
+
+    def measure(self, exchange, command, timeout, terminator):
+        """ Runs exchange(command, timeout), returning the bytes it read,
+            and records it. Replies not ending with terminator are counted
+            as timeouts when empty and short reads otherwise. """
+        for hook in self.pre_hooks:
+            hook(command)
+        error = None
+        response = b""
+        start = perf_counter()
+        try:
+            response = exchange(command, timeout)
+            return(response)
+        except Exception as exception:
+            error = exception
+            raise
+        finally:
+            elapsed = perf_counter() - start
+            self._record(command, response, elapsed, error, terminator)
+            for hook in self.post_hooks:
+                hook(command, response, elapsed, error)
+
+
+    def _record(self, command, response, elapsed, error, terminator):
+        """ Updates the histogram and counters for one exchange """
+        key = command_key(command)
+        failure = None
+        if error is not None:
+            failure = "errors"
+            self.last_error = error
+        elif "?" in command and not response.endswith(terminator):
+            failure = "short_reads" if response else "timeouts"
+        with self._lock:
+            counters = self.counters
+            counters["exchanges"] += 1
+            counters["bytes_out"] += len(command) + len(terminator)
+            counters["bytes_in"] += len(response)
+            if self._failed == key:
+                counters["retries"] += 1
+            self._failed = key if failure else None
+            if failure:
+                counters[failure] += 1
+                self._fail(key)
+            if key not in self.histograms:
+                self.histograms[key] = LatencyHistogram(self.bounds)
+            self.histograms[key].add(elapsed)
+        return
+
+
+    def _fail(self, key):
+        self.failures[key] = self.failures.get(key, 0) + 1
+        return
+
+
+    def parse_failed(self, command, response):
+        """ Counts a reply to command that could not be parsed """
+        key = command_key(command)
+        with self._lock:
+            self.counters["parse_failures"] += 1
+            self._failed = key
+            self._fail(key)
+        return
+
+
+    def snapshot(self):
+        """ Returns a dictionary with the time, labels, counters and the
+            latency summary and failure count of every command """
+        with self._lock:
+            commands = {key: dict(histogram.summary(),
+                                  failures = self.failures.get(key, 0))
+                        for key, histogram in self.histograms.items()}
+            return({"time":     time(),
+                    "labels":   dict(self.labels),
+                    "counters": dict(self.counters),
+                    "last_error": repr(self.last_error) if self.last_error
+                                  else None,
+                    "commands": commands})
+
+
+    def top(self, count = 10):
+        """ Lists (command, summary) for the commands taking the most total
+            time, the ones dominating a poll loop """
+        commands = self.snapshot()["commands"]
+        return(sorted(commands.items(), key = lambda c: -c[1]["total_s"])
+               [:count])
+
+
+    def reset(self):
+        """ Clears every counter and histogram, keeping the hooks """
+        with self._lock:
+            self.counters = dict.fromkeys(COUNTERS, 0)
+            self.histograms = {}
+            self.failures = {}
+            self.last_error = None
+            self._failed = None
+        return
+
+
+    def export_json(self, path):
+        """ Writes snapshot() to a JSON file atomically """
+        _write(path, json.dumps(self.snapshot(), indent = 1))
+        return
+
+
+    def export_prometheus(self, path = None, prefix = "arroyo"):
+        """ Returns the metrics in the Prometheus text format, also written
+            atomically to path if given """
+        snapshot = self.snapshot()
+        lines = []
+        for name, value in snapshot["counters"].items():
+            metric = prefix + "_" + name + "_total"
+            lines.append("# TYPE " + metric + " counter")
+            lines.append(metric + _labels(self.labels) + " " + str(value))
+        metric = prefix + "_command_seconds"
+        lines.append("# TYPE " + metric + " histogram")
+        bounds = [repr(float(b)) for b in self.bounds] + ["+Inf"]
+        for key, stats in snapshot["commands"].items():
+            labels = dict(self.labels, command = key)
+            for bound, count in zip(bounds, np.cumsum(stats["buckets"])):
+                lines.append(metric + "_bucket" +
+                             _labels(dict(labels, le = bound)) + " " +
+                             str(int(count)))
+            lines.append(metric + "_sum" + _labels(labels) + " " +
+                         repr(stats["total_s"]))
+            lines.append(metric + "_count" + _labels(labels) + " " +
+                         str(stats["count"]))
+        text = "\n".join(lines) + "\n"
+        if path is not None:
+            _write(path, text)
+        return(text)
+
+
+def _labels(labels):
+    """ Formats a dictionary as Prometheus labels """
+    if not labels:
+        return("")
+    return("{" + ",".join(str(k) + '="' + str(v).replace('"', '\\"') + '"'
+                          for k, v in labels.items()) + "}")
+
+
+def _write(path, text):
+    """ Writes text to path through a temporary file of its own in the same
+        directory, so readers never see a partly written file and writers
+        of the same path never share one """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok = True)
+    descriptor, temporary = tempfile.mkstemp(
+        prefix = os.path.basename(path) + ".", suffix = ".tmp",
+        dir = directory or ".")
+    try:
+        with os.fdopen(descriptor, "w") as metrics_file:
+            metrics_file.write(text)
+        # mkstemp creates the file readable by its owner only, collectors
+        #   often run as another user
+        os.chmod(temporary, 0o644)
+        os.replace(temporary, path)
+    except BaseException:
+        os.remove(temporary)
+        raise
+    return
@@ -0,0 +1,311 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+
+# Live plotting of Arroyo TEC Controller telemetry #
+LivePlot draws the temperature, target, current, voltage and power of a
+controller over a fixed time window at a constant cost per frame:
+* Samples are reduced on arrival to the minimum and maximum of each of a
+    fixed number of time bins (about one per pixel), so a 5 hour or 5 day
+    window draws the same number of points.
+* Only the data lines are redrawn each frame, blitted over a saved
+    background. Axes are redrawn only when the time window has to scroll.
+PlotProcess runs a LivePlot in its own process so drawing never delays
+acquisition.
+
+Example:
+    plot = LivePlot(window = 5 * 3600)
+    while True:
+        plot.add(time(), TECpak586.read_snapshot())
+        plot.update()
+        plot.pause(1.0)
+"""
+
+import multiprocessing
+import queue
+import numpy as np
+from matplotlib import pyplot as plt
+from matplotlib import dates as mdates
+
+
+# Layout of the figure: subplot position, y label, y limits and the
+#   (snapshot field, line style) pairs drawn on each axes
+AXES = [(1, "Temperature [°C]",                (22.9, 23.1),
+         [("temp", "r."), ("set_temp", "b--")]),
+        (4, "Output Current [Amps]",              (-5.0, 5.0),
+         [("current", "b.")]),
+        (3, "Output Voltage [Volts]",             (-21.0, 21.0),
+         [("voltage", "g.")]),
+        (2, "Output Electrical Power [Watts]",    (0, 50),
+         [("power", "g.")])]
+
+# Matplotlib date number of the unix epoch, for converting epoch seconds
+EPOCH = mdates.date2num(np.datetime64("1970-01-01T00:00:00"))
+
+
+def decimate_minmax(x, y, bins):
+    """ Reduces y to its minimum and maximum over bins equal slices of the
+        data, returning at most 2 * bins points with the x of each slice's
+        first and last sample. Data already small enough is returned as is """
+    x = np.asarray(x)
+    y = np.asarray(y)
+    if len(y) <= 2 * bins:
+        return(x, y)
+    edges = np.linspace(0, len(y), bins + 1).astype(int)
+    lows = np.minimum.reduceat(y, edges[:-1])
+    highs = np.maximum.reduceat(y, edges[:-1])
+    out_x = np.empty(2 * bins, dtype = x.dtype)
+    out_y = np.empty(2 * bins, dtype = y.dtype)
+    out_x[0::2] = x[edges[:-1]]
+    out_x[1::2] = x[edges[1:] - 1]
+    out_y[0::2] = lows
+    out_y[1::2] = highs
+    return(out_x, out_y)
+
+
+
+class MinMaxDecimator(object):
+    """ Running minimum and maximum of samples over fixed width time bins
+        covering a sliding window. Adding a sample costs the same whatever
+        the window length, and the output always has at most 2 * bins
+        points. """
+
+
+    def __init__(self, window, bins = 1000):
+        """ window is the time span kept in seconds, split into bins bins """
+        self.bins = int(bins)
+        self.width = float(window) / self.bins
+        self._low = np.full(self.bins, np.nan)
+        self._high = np.full(self.bins, np.nan)
+        # Absolute index (time // width) of the newest bin, None when empty
+        self._newest = None
+
+
+    def add(self, t, y):
+        """ Adds one sample or arrays of samples at times t (seconds) """
+        index = np.floor(np.atleast_1d(np.asarray(t, dtype = float)) /
+                         self.width).astype(np.int64)
+        y = np.atleast_1d(np.asarray(y, dtype = float))
+        newest = int(index.max())
+        if self._newest is None or newest - self._newest >= self.bins:
+            self._low[:] = np.nan
+            self._high[:] = np.nan
+        elif newest > self._newest:
+            # Clears the ring slots of bins that scrolled out of the window
+            slots = np.arange(self._newest + 1, newest + 1) % self.bins
+            self._low[slots] = np.nan
+            self._high[slots] = np.nan
+        if self._newest is None or newest > self._newest:
+            self._newest = newest
+        keep = index > self._newest - self.bins
+        slots = index[keep] % self.bins
+        np.fmin.at(self._low, slots, y[keep])
+        np.fmax.at(self._high, slots, y[keep])
+        return
+
+
+    def data(self):
+        """ Returns x (bin centres in seconds) and y arrays holding the
+            minimum then maximum of every non-empty bin in time order """
+        if self._newest is None:
+            return(np.empty(0), np.empty(0))
+        absolute = np.arange(self._newest - self.bins + 1, self._newest + 1)
+        slots = absolute % self.bins
+        filled = ~np.isnan(self._low[slots])
+        centres = (absolute[filled] + 0.5) * self.width
+        x = np.repeat(centres, 2)
+        y = np.empty(len(x))
+        y[0::2] = self._low[slots][filled]
+        y[1::2] = self._high[slots][filled]
+        return(x, y)
+
+
+
+class LivePlot(object):
+    """ Blitted live plot of controller telemetry over a time window """
+
+
+    def __init__(self, window = 5 * 3600, bins = 1000, title = None,
+                 ylims = True, margin = 0.05):
+        """ window is the time span shown in seconds, split into bins min/max
+            bins per line. ylims True uses the limits in AXES, None scales
+            to the data. The time axis jumps ahead by margin * window when
+            the data reaches its end, the only time the axes are redrawn. """
+        self.window = float(window)
+        self.margin = margin * self.window
+        self.figure = plt.figure(figsize = (4,3), dpi = 150)
+        self.canvas = self.figure.canvas
+        self.lines = []
+        self._autoscale = ylims is None
+        for position, label, limits, fields in AXES:
+            ax = self.figure.add_subplot(2, 2, position)
+            ax.xaxis_date()
+            ax.set_xlabel("Time (Date then hour)")
+            ax.set_ylabel(label)
+            if ylims:
+                ax.set_ylim(*limits)
+            for field, style in fields:
+                line, = ax.plot([], [], style, animated = True)
+                self.lines.append((field, line, MinMaxDecimator(window,
+                                                                 bins)))
+        if title:
+            self.figure.axes[0].set_title(title)
+        self._latest = None
+        self._end = None
+        self._background = None
+        self.canvas.mpl_connect("draw_event", self._on_draw)
+
+
+    def add(self, timestamp, snapshot):
+        """ Adds a serial_interface.Snapshot taken at timestamp (epoch s) """
+        for field, line, decimator in self.lines:
+            decimator.add(timestamp, getattr(snapshot, field))
+        self._latest = timestamp if self._latest is None else \
+            max(self._latest, timestamp)
+        return
+
+
+    def add_array(self, data):
+        """ Adds a structured array of samples, such as
+            telemetry.TelemetryBuffer.view() """
+        if not len(data):
+            return
+        columns = {"temp": "temperature", "set_temp": "target"}
+        for field, line, decimator in self.lines:
+            decimator.add(data["time"], data[columns.get(field, field)])
+        latest = float(data["time"][-1])
+        self._latest = latest if self._latest is None else \
+            max(self._latest, latest)
+        return
+
+
+    def update(self):
+        """ Draws the latest data, redrawing the axes only if the time
+            window has to move or the data left the y limits """
+        if self._latest is None:
+            return
+        for field, line, decimator in self.lines:
+            x, y = decimator.data()
+            line.set_data(x / 86400.0 + EPOCH, y)
+        if self._needs_redraw():
+            self._redraw()
+        elif self._background is None or not self.canvas.supports_blit:
+            self.canvas.draw_idle()
+        else:
+            self.canvas.restore_region(self._background)
+            for field, line, decimator in self.lines:
+                line.axes.draw_artist(line)
+            self.canvas.blit(self.figure.bbox)
+        self.canvas.flush_events()
+        return
+
+
+    def pause(self, interval):
+        """ Lets the GUI handle events for interval seconds """
+        if self.canvas.figure.stale:
+            self.canvas.draw_idle()
+        self.canvas.start_event_loop(interval)
+        return
+
+
+    def _needs_redraw(self):
+        """ Checks whether the axes must be redrawn for the newest data """
+        if self._end is None or self._latest > self._end:
+            return(True)
+        if self._autoscale:
+            for field, line, decimator in self.lines:
+                y = line.get_ydata()
+                if len(y):
+                    low, high = line.axes.get_ylim()
+                    if y[-2:].min() < low or y[-2:].max() > high:
+                        return(True)
+        return(False)
+
+
+    def _redraw(self):
+        """ Moves the time window to the newest data and redraws the axes """
+        self._end = self._latest + self.margin
+        start = self._end - self.window - self.margin
+        for ax in self.figure.axes:
+            ax.set_xlim(start / 86400.0 + EPOCH, self._end / 86400.0 + EPOCH)
+            if self._autoscale:
+                ax.relim()
+                ax.autoscale_view(scalex = False)
+        self.canvas.draw()
+        return
+
+
+    def _on_draw(self, event):
+        """ Saves the freshly drawn background and draws the lines on it """
+        if not self.canvas.supports_blit:
+            return
+        self._background = self.canvas.copy_from_bbox(self.figure.bbox)
+        for field, line, decimator in self.lines:
+            line.axes.draw_artist(line)
+        self.canvas.blit(self.figure.bbox)
+        return
+
+
+    def savefig(self, path):
+        """ Saves the figure including the data lines """
+        for field, line, decimator in self.lines:
+            line.set_animated(False)
+        self.figure.savefig(path)
+        for field, line, decimator in self.lines:
+            line.set_animated(True)
+        return
+
+
+
+def _run_plot(samples, interval, kwargs):
+    """ Body of the plotting process, draws samples until None arrives """
+    plot = LivePlot(**kwargs)
+    plt.show(block = False)
+    while True:
+        try:
+            while True:
+                item = samples.get_nowait()
+                if item is None:
+                    return
+                plot.add(*item)
+        except queue.Empty:
+            pass
+        plot.update()
+        plot.pause(interval)
+
+
+
+class PlotProcess(object):
+    """ LivePlot running in a separate process, fed through a queue """
+
+
+    def __init__(self, interval = 0.5, maxsize = 100000, **kwargs):
+        """ Starts the plotting process, redrawing every interval seconds
+            Keyword arguments are passed on to LivePlot """
+        self.samples = multiprocessing.Queue(maxsize)
+        self.dropped = 0
+        self.process = multiprocessing.Process(target = _run_plot,
+                                               args = (self.samples, interval,
+                                                       kwargs),
+                                               name = "arroyo-plot",
+                                               daemon = True)
+        self.process.start()
+
+
+    def send(self, timestamp, snapshot):
+        """ Queues a sample for the plot without ever blocking
+            Samples are dropped, and counted, if the plot falls behind """
+        try:
+            self.samples.put_nowait((timestamp, snapshot))
+        except queue.Full:
+            self.dropped += 1
+        return
+
+
+    def close(self, timeout = 5.0):
+        """ Asks the plotting process to finish and waits for it """
+        self.samples.put(None)
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+        return
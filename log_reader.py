@@ -0,0 +1,405 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+
+# Log reader and offline analysis for Arroyo TEC Controller runs #
+Reads both the legacy CSV data logs written by earlier versions of
+example_script.py and the binary chunk logs of data_logger.py in bounded
+chunks, so a multi-day log never has to fit in memory:
+* ChunkLogReader memory-maps a binary log and indexes the time range of each
+    chunk, so a time range is found without reading the rest of the file.
+* CsvLogReader binary searches the byte offsets of a CSV log for the start
+    of a time range and parses rows in batches straight into NumPy arrays.
+
+Command line use:
+    python log_reader.py LOG [LOG ...] [--start TIME] [--end TIME]
+                         [--plot FIGURE.png] [--bins 1000]
+prints summary statistics of every column over the time range and saves a
+min/max decimated figure of it. TIME is epoch seconds or an ISO date/time.
+"""
+
+import argparse
+import mmap
+import os
+import sys
+import zlib
+import numpy as np
+from datetime import datetime
+from time import localtime
+from data_logger import (CHUNK_HEADER, CHUNK_MAGIC, MAGIC, decode_chunk,
+                         read_header)
+from rollup import combine
+from telemetry import SAMPLE_DTYPE
+
+
+def _to_epoch(local_times):
+    """ Converts naive local datetime64[us] values to epoch seconds """
+    seconds = local_times.astype("int64") / 1e6
+    if not len(seconds):
+        return(seconds)
+    # The local UTC offset is taken from the ends of the batch, rows are
+    #   converted one by one only if a DST change falls inside it
+    first = localtime(seconds[0]).tm_gmtoff
+    last = localtime(seconds[-1]).tm_gmtoff
+    if first == last:
+        return(seconds - first)
+    return(np.array([datetime.fromisoformat(str(t)).timestamp()
+                     for t in local_times]))
+
+
+
+class ChunkLogReader(object):
+    """ Memory-mapped reader of data_logger binary chunk logs """
+
+
+    def __init__(self, path):
+        """ Maps the file at path and indexes its chunks """
+        self.path = path
+        self._file = open(path, "rb")
+        self.header, self.dtype = read_header(self._file)
+        self._start = self._file.tell()
+        size = os.path.getsize(path)
+        self._map = mmap.mmap(self._file.fileno(), 0,
+                              access = mmap.ACCESS_READ) if size else b""
+        self._scan()
+
+
+    def _scan(self):
+        """ Records the offset, row count and time range of every chunk
+            Only chunk headers and time columns are touched. The CRC of the
+            last chunk is checked to drop a chunk torn by a crash. """
+        time_offset = 0
+        for name in self.dtype.names:
+            if name == "time":
+                break
+            time_offset += self.dtype.fields[name][0].itemsize
+        time_type = self.dtype.fields["time"][0]
+        offsets, rows, crcs, first, last = [], [], [], [], []
+        offset = self._start
+        size = len(self._map)
+        while offset + CHUNK_HEADER.size <= size:
+            magic, count, crc = CHUNK_HEADER.unpack_from(self._map, offset)
+            payload = offset + CHUNK_HEADER.size
+            end = payload + count * self.dtype.itemsize
+            if magic != CHUNK_MAGIC or end > size or not count:
+                break
+            times = np.frombuffer(self._map, dtype = time_type, count = count,
+                                  offset = payload + time_offset * count)
+            offsets.append(payload)
+            rows.append(count)
+            crcs.append(crc)
+            first.append(times[0])
+            last.append(times[-1])
+            offset = end
+        if offsets and zlib.crc32(self._map[offsets[-1]:offsets[-1] +
+                                            rows[-1] *
+                                            self.dtype.itemsize]) != crcs[-1]:
+            del offsets[-1], rows[-1], first[-1], last[-1]
+        self._offsets = np.array(offsets, dtype = np.int64)
+        self._rows = np.array(rows, dtype = np.int64)
+        self.first = np.array(first, dtype = float)
+        self.last = np.array(last, dtype = float)
+        return
+
+
+    def __len__(self):
+        return(int(self._rows.sum()))
+
+
+    def time_range(self):
+        """ Returns the first and last sample time, None if empty """
+        if not len(self._offsets):
+            return(None)
+        return(float(self.first[0]), float(self.last[-1]))
+
+
+    def iter_chunks(self, start = None, end = None):
+        """ Yields structured arrays of the samples with start <= time < end
+            one chunk at a time, seeking straight to the first chunk """
+        first = 0 if start is None else \
+            np.searchsorted(self.last, start, side = "left")
+        for chunk in range(first, len(self._offsets)):
+            if end is not None and self.first[chunk] >= end:
+                return
+            offset = self._offsets[chunk]
+            rows = int(self._rows[chunk])
+            payload = self._map[offset:offset + rows * self.dtype.itemsize]
+            data = decode_chunk(payload, rows, self.dtype)
+            if start is not None or end is not None:
+                keep = np.ones(rows, dtype = bool)
+                if start is not None:
+                    keep &= data["time"] >= start
+                if end is not None:
+                    keep &= data["time"] < end
+                data = data[keep]
+            if len(data):
+                yield(data)
+
+
+    def close(self):
+        """ Releases the memory map and file """
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+        self._file.close()
+        return
+
+
+
+class CsvLogReader(object):
+    """ Chunked reader of legacy CSV data logs
+        Rows are Timestamp, Target, Temperature, Current, Voltage, Power
+        with timestamps written by str(datetime) in local time """
+
+
+    def __init__(self, path, chunk_rows = 100000):
+        """ chunk_rows is the number of rows parsed per batch """
+        self.path = path
+        self.chunk_rows = chunk_rows
+        self.dtype = SAMPLE_DTYPE
+        self._file = open(path, "rb")
+        self._size = os.path.getsize(path)
+
+
+    def _line_at(self, offset):
+        """ Returns the offset and timestamp of the first data row starting
+            at or after offset, (size, None) past the last row """
+        self._file.seek(offset)
+        if offset:
+            # Skips the rest of the line offset falls in
+            self._file.readline()
+        while True:
+            position = self._file.tell()
+            line = self._file.readline()
+            if not line:
+                return(self._size, None)
+            stamp = line.split(b",", 1)[0].decode(errors = "replace")
+            if stamp and stamp != "Timestamp":
+                try:
+                    stamp = np.array([stamp], dtype = "datetime64[us]")
+                except ValueError:
+                    # Skips a row that cannot be parsed, e.g. cut short
+                    continue
+                return(position, float(_to_epoch(stamp)[0]))
+
+
+    def seek(self, start):
+        """ Returns the byte offset of the first row with time >= start """
+        low, high = 0, self._size
+        while low < high:
+            middle = (low + high) // 2
+            position, stamp = self._line_at(middle)
+            if stamp is None or stamp >= start:
+                high = middle
+            else:
+                low = position + 1
+        return(self._line_at(low)[0])
+
+
+    def time_range(self):
+        """ Returns the first and last sample time, None if empty """
+        position, first = self._line_at(0)
+        if first is None:
+            return(None)
+        self._file.seek(max(self._size - 4096, 0))
+        tail = self._file.read().splitlines()
+        for line in reversed(tail):
+            stamp = line.split(b",", 1)[0].decode(errors = "replace")
+            if stamp and stamp != "Timestamp":
+                try:
+                    stamp = np.array([stamp], dtype = "datetime64[us]")
+                except ValueError:
+                    continue
+                return(first, float(_to_epoch(stamp)[0]))
+        return(first, first)
+
+
+    def iter_chunks(self, start = None, end = None):
+        """ Yields structured arrays of the samples with start <= time < end
+            chunk_rows at a time """
+        offset = 0 if start is None else self.seek(start)
+        self._file.seek(offset)
+        while True:
+            lines = self._file.readlines(self.chunk_rows * 80)
+            if not lines:
+                return
+            fields = [line.decode(errors = "replace").strip().split(",")
+                      for line in lines]
+            fields = [f for f in fields if len(f) >= 6 and
+                      f[0] != "Timestamp"]
+            if not fields:
+                continue
+            try:
+                data = self._parse(fields)
+            except ValueError:
+                # Parses the batch row by row, skipping rows that cannot be
+                #   parsed
+                data = [row for row in map(self._parse_row, fields)
+                        if row is not None]
+                data = np.concatenate(data) if data else \
+                    np.empty(0, dtype = self.dtype)
+            if not len(data):
+                continue
+            if start is not None:
+                data = data[data["time"] >= start]
+            if end is not None:
+                past = data["time"] >= end
+                if past.any():
+                    yield(data[~past])
+                    return
+            if len(data):
+                yield(data)
+
+
+    def _parse(self, fields):
+        """ Parses rows split into fields into a structured array, raising
+            ValueError if any of them cannot be parsed """
+        data = np.empty(len(fields), dtype = self.dtype)
+        stamps = np.array([f[0] for f in fields], dtype = "datetime64[us]")
+        data["time"] = _to_epoch(stamps)
+        values = np.array([f[1:6] for f in fields], dtype = float)
+        for i, name in enumerate(self.dtype.names[1:]):
+            data[name] = values[:, i]
+        return(data)
+
+
+    def _parse_row(self, fields):
+        """ Parses one row, None if it cannot be parsed """
+        try:
+            return(self._parse([fields]))
+        except ValueError:
+            return(None)
+
+
+    def close(self):
+        self._file.close()
+        return
+
+
+def open_log(path):
+    """ Returns a ChunkLogReader or CsvLogReader for the log at path """
+    with open(path, "rb") as log_file:
+        binary = log_file.read(len(MAGIC)) == MAGIC
+    return(ChunkLogReader(path) if binary else CsvLogReader(path))
+
+
+def iter_logs(paths, start = None, end = None):
+    """ Yields the chunks of several logs in order over a time range """
+    for path in paths:
+        reader = open_log(path)
+        try:
+            for data in reader.iter_chunks(start, end):
+                yield(data)
+        finally:
+            reader.close()
+
+
+def summarize(chunks):
+    """ Computes count, mean, std, min and max of every column over an
+        iterable of structured arrays without holding more than one chunk
+        Returns a dictionary of column name to dictionary of statistics and
+        the first and last time seen """
+    totals = None
+    names = None
+    span = [None, None]
+    for data in chunks:
+        names = [n for n in data.dtype.names if n != "time"]
+        values = np.column_stack([data[n].astype(float) for n in names])
+        partial = (np.zeros(1, dtype = np.int64),
+                   np.array([float(len(data))]),
+                   values.mean(axis = 0)[None, :],
+                   ((values - values.mean(axis = 0))**2).sum(axis = 0)
+                   [None, :],
+                   values.min(axis = 0)[None, :],
+                   values.max(axis = 0)[None, :])
+        if totals is None:
+            totals = partial
+        else:
+            totals = combine(*(np.concatenate([t, p]) for t, p in
+                               zip(totals, partial)))
+        if span[0] is None:
+            span[0] = float(data["time"][0])
+        span[1] = float(data["time"][-1])
+    if totals is None:
+        return({}, span)
+    index, count, mean, m2, low, high = totals
+    stats = {}
+    for i, name in enumerate(names):
+        stats[name] = {"count":  int(count[0]),
+                       "mean":   float(mean[0, i]),
+                       "std":    float(np.sqrt(m2[0, i] / count[0])),
+                       "min":    float(low[0, i]),
+                       "max":    float(high[0, i])}
+    return(stats, span)
+
+
+def plot_logs(paths, figure_path, start = None, end = None, bins = 1000):
+    """ Saves a min/max decimated figure of the logs over a time range,
+        reading them one chunk at a time """
+    import matplotlib
+    matplotlib.use("Agg")
+    from live_plot import LivePlot
+    if start is None or end is None:
+        ranges = []
+        for path in paths:
+            reader = open_log(path)
+            ranges.append(reader.time_range())
+            reader.close()
+        ranges = [r for r in ranges if r is not None]
+        if not ranges:
+            raise ValueError("No samples in " + str(paths))
+        start = min(r[0] for r in ranges) if start is None else start
+        end = max(r[1] for r in ranges) + 1 if end is None else end
+    plot = LivePlot(window = end - start, bins = bins, ylims = None,
+                    margin = 0.0)
+    for data in iter_logs(paths, start, end):
+        plot.add_array(data)
+    plot.update()
+    plot.savefig(figure_path)
+    return
+
+
+def _parse_time(text):
+    """ Reads epoch seconds or an ISO local date/time """
+    if text is None:
+        return(None)
+    try:
+        return(float(text))
+    except ValueError:
+        return(datetime.fromisoformat(text).timestamp())
+
+
+def main(argv = None):
+    """ Command line entry point, see the module description """
+    parser = argparse.ArgumentParser(description = "Summarise and plot " +
+                                     "Arroyo TEC telemetry logs")
+    parser.add_argument("logs", nargs = "+",
+                        help = "CSV or binary log files, in time order")
+    parser.add_argument("--start", help = "epoch seconds or ISO time")
+    parser.add_argument("--end", help = "epoch seconds or ISO time")
+    parser.add_argument("--plot", help = "path of a figure to save")
+    parser.add_argument("--bins", type = int, default = 1000,
+                        help = "min/max bins across the figure")
+    args = parser.parse_args(argv)
+    start = _parse_time(args.start)
+    end = _parse_time(args.end)
+    stats, span = summarize(iter_logs(args.logs, start, end))
+    if not stats:
+        print("No samples in the requested range.")
+        return(1)
+    print("From " + str(datetime.fromtimestamp(span[0])) + " to " +
+          str(datetime.fromtimestamp(span[1])))
+    print("{:<14}{:>10}{:>14}{:>14}{:>14}{:>14}".format("Column", "Count",
+                                                      "Mean", "Std", "Min",
+                                                      "Max"))
+    for name, column in stats.items():
+        print("{:<14}{:>10}{:>14.6g}{:>14.6g}{:>14.6g}{:>14.6g}".format(
+            name, column["count"], column["mean"], column["std"],
+            column["min"], column["max"]))
+    if args.plot:
+        plot_logs(args.logs, args.plot, start, end, args.bins)
+        print("Saved figure to " + args.plot)
+    return(0)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
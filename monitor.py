@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+
+# Change driven monitoring of Arroyo TEC Controllers #
+ConditionMonitor polls only the TEC condition status register (TEC:COND?),
+a reply of a few bytes, at a high rate on its own thread. The detailed
+fields (readings, set point, output, mode and limits) are read in one
+chained exchange only when a watched condition bit changes, and otherwise
+at a slow background refresh. Changes are reported to callbacks:
+* current_limit, voltage_limit           the output hit a limit
+* temperature_high, temperature_low     a temperature limit tripped
+* out_of_tolerance, in_tolerance        the temperature left or settled in
+                                            the tolerance window
+* output_off, output_on                 the output was switched, by a
+                                            command, a limit or the panel
+* change                                any change of a watched bit
+* refresh                               every read of the detailed fields
+Compared with reading every field on every cycle, the bus carries a fraction
+of the bytes and a trip is seen within one short poll interval.
+
+Example:
+    monitor = ConditionMonitor(TECpak586, interval = 0.05, refresh = 5.0)
+    monitor.on("output_off", lambda event, state: print("Output off", state))
+    monitor.start()
+"""
+
+import threading
+from time import monotonic, time
+from serial_interface import (COND_CURRENT_LIMIT, COND_OUT_OF_TOLERANCE,
+                              COND_OUTPUT_ON, COND_T_HIGH, COND_T_LOW,
+                              COND_VOLTAGE_LIMIT)
+
+
+# Events raised for each condition bit, when it is set and when it clears
+EVENTS = [(COND_CURRENT_LIMIT,      "current_limit",    None),
+          (COND_VOLTAGE_LIMIT,      "voltage_limit",    None),
+          (COND_T_HIGH,             "temperature_high", None),
+          (COND_T_LOW,              "temperature_low",  None),
+          (COND_OUT_OF_TOLERANCE,   "out_of_tolerance", "in_tolerance"),
+          (COND_OUTPUT_ON,          "output_on",        "output_off")]
+
+# Condition bits whose change triggers a read of the detailed fields
+WATCH = 0
+for bit, _, _ in EVENTS:
+    WATCH |= bit
+
+# Detailed fields, read in one exchange, with their queries
+DETAILS = [("temp",             "TEC:T?"),
+           ("set_temp",         "TEC:SET:T?"),
+           ("current",          "TEC:ITE?"),
+           ("voltage",          "TEC:V?"),
+           ("output",           "TEC:OUT?"),
+           ("mode",             "TEC:MODE?"),
+           ("current_limit",    "TEC:LIM:ITE?"),
+           ("THI_limit",        "TEC:LIM:THI?"),
+           ("TLO_limit",        "TEC:LIM:TLO?")]
+
+
+
+class ConditionMonitor(object):
+    """ Class watching an arroyo device through its condition register on a
+        worker thread, see the module description """
+
+
+    def __init__(self, device, interval = 0.05, refresh = 5.0,
+                 watch = WATCH):
+        """ device is an arroyo
+            interval is the time in seconds between condition polls
+            refresh is the time in seconds between reads of the detailed
+            fields when nothing changes, None for never
+            watch is the mask of condition bits whose change triggers a
+            read of the detailed fields and raises events """
+        self.device = device
+        self.interval = interval
+        self.refresh = refresh
+        self.watch = watch
+        # Last condition read, None before the first poll
+        self.condition = None
+        # Last detailed fields read, with "time" the time.time() of the read
+        self.state = {}
+        self.polls = 0
+        self.refreshes = 0
+        self.events = 0
+        self.errors = 0
+        self.last_error = None
+        self._callbacks = {}
+        self._refreshed = None
+        self._stop = threading.Event()
+        self._thread = None
+
+
+    def on(self, event, callback):
+        """ Calls callback(event, state) when event happens, on the monitor
+            thread. event is one of the names in the module description,
+            state the detailed fields read after the change. """
+        names = [n for _, on, off in EVENTS for n in (on, off) if n]
+        if event not in names + ["change", "refresh"]:
+            raise ValueError("Unknown event " + str(event))
+        self._callbacks.setdefault(event, []).append(callback)
+        return
+
+
+    def _raise(self, event):
+        if event not in ("change", "refresh"):
+            self.events += 1
+        for callback in self._callbacks.get(event, []):
+            callback(event, self.state)
+        return
+
+
+    def read_details(self, condition = None):
+        """ Reads the detailed fields in one exchange into self.state
+            condition is the condition register value they go with, kept in
+            self.condition only once they have been read """
+        values = self.device.query_many([query for _, query in DETAILS])
+        if condition is not None:
+            self.condition = condition
+        state = dict(zip([name for name, _ in DETAILS], values))
+        state["time"] = time()
+        state["condition"] = self.condition
+        self.state = state
+        self._refreshed = monotonic()
+        self.refreshes += 1
+        self._raise("refresh")
+        return(state)
+
+
+    def poll(self):
+        """ Reads the condition register once, reading the detailed fields
+            and raising events if a watched bit changed, or if the refresh
+            is due. Returns the list of events raised.
+            A change is only taken in once its detailed fields are read, so
+            if that read fails the next poll sees the change again. """
+        previous = self.condition
+        condition = self.device.read_condition()
+        self.polls += 1
+        if previous is None:
+            self.read_details(condition)
+            return([])
+        changed = (previous ^ condition) & self.watch
+        if not changed:
+            self.condition = condition
+            if self.refresh is not None and (self._refreshed is None or
+                    monotonic() - self._refreshed >= self.refresh):
+                self.read_details()
+            return([])
+        self.read_details(condition)
+        events = []
+        for bit, set_event, clear_event in EVENTS:
+            if changed & bit:
+                event = set_event if condition & bit else clear_event
+                if event:
+                    events.append(event)
+        for event in events:
+            self._raise(event)
+        self._raise("change")
+        return(events)
+
+
+    @property
+    def running(self):
+        return(self._thread is not None and self._thread.is_alive())
+
+
+    def start(self):
+        """ Starts polling on a daemon thread """
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target = self._run,
+                                        name = "arroyo-monitor",
+                                        daemon = True)
+        self._thread.start()
+        return
+
+
+    def stop(self, timeout = None):
+        """ Stops polling and waits for the thread to finish """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return
+
+
+    def _run(self):
+        """ Polls the condition register on monotonic deadlines """
+        deadline = monotonic()
+        while not self._stop.is_set():
+            try:
+                self.poll()
+            except Exception as error:
+                self.errors += 1
+                self.last_error = error
+            deadline += self.interval
+            now = monotonic()
+            if now > deadline:
+                # Skips the deadlines missed, rather than polling in a burst
+                deadline += ((now - deadline) // self.interval + 1) * \
+                    self.interval
+            self._stop.wait(deadline - now)
+        return
+
+
+    def stats(self):
+        """ Returns a dictionary with the number of polls, detailed reads,
+            events raised and errors """
+        return({"polls":        self.polls,
+                "refreshes":    self.refreshes,
+                "events":       self.events,
+                "errors":       self.errors,
+                "last_error":   repr(self.last_error) if self.last_error
+                                else None})
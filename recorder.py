@@ -0,0 +1,331 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+
+# Recording and replay of serial sessions with Arroyo TEC Controllers #
+Recorder is a transport for serial_interface.arroyo (and AsyncArroyo) that
+passes everything through to the real port while writing every byte sent
+and received, with monotonic timestamps, to a compact trace file. Replayer
+is a transport serving a trace back without hardware, with the original
+timing or faster, so field problems and performance comparisons can be
+reproduced from production traffic.
+
+Example:
+    TECpak586 = arroyo("COM3", transport = Recorder("session.atrace"))
+    ...
+    TECpak586.close()
+    # Later, without the controller:
+    TECpak586 = arroyo("COM3", cache = None,
+                       transport = Replayer("session.atrace", speed = 10))
+
+## Trace format ##
+MAGIC, a 4 byte little endian header length, a UTF-8 JSON header with the
+port and creation time, then one EVENT record per write or read:
+    seconds since the port was opened (8 byte float), event kind (1 byte),
+    data length (4 bytes), then the data
+Reads are recorded when they return, with the bytes they returned.
+
+Command line use, printing a trace:
+    python recorder.py session.atrace
+"""
+
+import json
+import struct
+import sys
+from time import monotonic, sleep, time
+from serial_interface import TERMINATOR
+from transports import open_transport
+
+
+MAGIC = b"ARROYOTRACE1\n"
+EVENT = struct.Struct("<dBI")
+EXTENSION = ".atrace"
+
+# Event kinds
+WRITE = 1
+READ = 2
+CLOSE = 3
+
+# Seconds between flushes of the trace file
+FLUSH_INTERVAL = 1.0
+
+
+def read_trace(path):
+    """ Returns the header of a trace and a list of its events as (time,
+        kind, data). A record cut off by a crash ends the list. """
+    events = []
+    with open(path, "rb") as trace:
+        if trace.read(len(MAGIC)) != MAGIC:
+            raise ValueError("Not an Arroyo serial trace: " + str(path))
+        length, = struct.unpack("<I", trace.read(4))
+        header = json.loads(trace.read(length).decode("utf-8"))
+        while True:
+            record = trace.read(EVENT.size)
+            if len(record) < EVENT.size:
+                break
+            seconds, kind, length = EVENT.unpack(record)
+            data = trace.read(length)
+            if len(data) < length:
+                break
+            events.append((seconds, kind, data))
+    return(header, events)
+
+
+
+class RecordingTransport(object):
+    """ serial.Serial like object recording all traffic of another one """
+
+
+    def __init__(self, ser, path, port = None):
+        """ ser is the open port to pass through, path the trace file """
+        self.ser = ser
+        self.path = path
+        self._trace = open(path, "wb")
+        header = json.dumps({"port": port, "created": time()}).encode()
+        self._trace.write(MAGIC + struct.pack("<I", len(header)) + header)
+        self._start = monotonic()
+        self._flushed = self._start
+
+
+    def _record(self, kind, data):
+        now = monotonic()
+        self._trace.write(EVENT.pack(now - self._start, kind, len(data)) +
+                          data)
+        if now - self._flushed >= FLUSH_INTERVAL:
+            self._trace.flush()
+            self._flushed = now
+        return
+
+
+    @property
+    def is_open(self):
+        return(self.ser.is_open)
+
+
+    @property
+    def timeout(self):
+        return(self.ser.timeout)
+
+
+    @timeout.setter
+    def timeout(self, timeout):
+        self.ser.timeout = timeout
+
+
+    @property
+    def in_waiting(self):
+        return(self.ser.in_waiting)
+
+
+    def reset_input_buffer(self):
+        self.ser.reset_input_buffer()
+        return
+
+
+    def write(self, data):
+        self._record(WRITE, bytes(data))
+        return(self.ser.write(data))
+
+
+    def read(self, size = 1):
+        data = self.ser.read(size)
+        self._record(READ, data)
+        return(data)
+
+
+    def read_until(self, expected = TERMINATOR):
+        data = self.ser.read_until(expected)
+        self._record(READ, data)
+        return(data)
+
+
+    def close(self):
+        """ Closes the port and the trace """
+        self.ser.close()
+        if not self._trace.closed:
+            self._record(CLOSE, b"")
+            self._trace.close()
+        return
+
+
+
+class Recorder(object):
+    """ Transport opening ports with another transport and recording them """
+
+
+    def __init__(self, path, opener = open_transport):
+        """ path is the trace file. Further ports opened by the same
+            Recorder, as when choosing a port, get _1, _2, ... added.
+            opener is the transport being recorded. """
+        self.path = path
+        self.opener = opener
+        self.paths = []
+
+
+    def __call__(self, port, timeout):
+        path = self.path
+        if self.paths:
+            stem, dot, extension = self.path.rpartition(".")
+            path = (stem + "_" + str(len(self.paths)) + dot + extension
+                    if dot else self.path + "_" + str(len(self.paths)))
+        self.paths.append(path)
+        return(RecordingTransport(self.opener(port, timeout), path, port))
+
+
+
+class ReplayTransport(object):
+    """ serial.Serial like object answering writes from a trace
+        Each write is matched to the next recorded write, and the reads
+        that followed it in the recording become available after the same
+        delay, divided by speed, or at once when speed is None. Writes
+        differing from the recording are listed in self.mismatches, or
+        raise ValueError when strict. """
+
+
+    def __init__(self, events, timeout = 1.0, speed = 1.0, strict = False):
+        self.timeout = timeout
+        self.speed = speed
+        self.strict = strict
+        self.is_open = True
+        self.mismatches = []
+        self._events = events
+        self._next = 0
+        # Replies not yet read as [time due, bytes]
+        self._pending = []
+
+
+    def _release(self, now):
+        """ Moves the bytes due by now into one ready string """
+        ready = b""
+        while self._pending and self._pending[0][0] <= now:
+            ready += self._pending.pop(0)[1]
+        if ready:
+            self._pending.insert(0, [now, ready])
+        return(ready)
+
+
+    @property
+    def in_waiting(self):
+        return(len(self._release(monotonic())))
+
+
+    def reset_input_buffer(self):
+        if self._release(monotonic()):
+            self._pending.pop(0)
+        return
+
+
+    def write(self, data):
+        """ Finds the recorded write and schedules the reads after it """
+        data = bytes(data)
+        while self._next < len(self._events) and \
+                self._events[self._next][1] != WRITE:
+            self._next += 1
+        if self._next >= len(self._events):
+            self.mismatches.append((data, None))
+            if self.strict:
+                raise ValueError("Trace ended before write " + repr(data))
+            return(len(data))
+        written, kind, recorded = self._events[self._next]
+        if recorded != data:
+            self.mismatches.append((data, recorded))
+            if self.strict:
+                raise ValueError("Wrote " + repr(data) + ", recorded " +
+                                 repr(recorded))
+        self._next += 1
+        now = monotonic()
+        while self._next < len(self._events) and \
+                self._events[self._next][1] == READ:
+            seconds, kind, reply = self._events[self._next]
+            delay = 0.0 if self.speed is None else \
+                (seconds - written) / self.speed
+            if reply:
+                self._pending.append([now + delay, reply])
+            self._next += 1
+        return(len(data))
+
+
+    def read(self, size = 1):
+        """ Returns up to size bytes, waiting up to timeout for any """
+        deadline = monotonic() + (self.timeout or 0)
+        ready = self._release(monotonic())
+        while not ready and self._pending and \
+                self._pending[0][0] <= deadline:
+            sleep(max(self._pending[0][0] - monotonic(), 0))
+            ready = self._release(monotonic())
+        if not ready:
+            sleep(max(deadline - monotonic(), 0))
+            return(b"")
+        self._pending.pop(0)
+        if len(ready) > size:
+            self._pending.insert(0, [monotonic(), ready[size:]])
+        return(ready[:size])
+
+
+    def read_until(self, expected = TERMINATOR):
+        """ Returns bytes up to and including expected, or what arrived
+            before timeout """
+        deadline = monotonic() + (self.timeout or 0)
+        data = b""
+        while expected not in data:
+            ready = self._release(monotonic())
+            if ready:
+                self._pending.pop(0)
+                data += ready
+                continue
+            if not self._pending:
+                sleep(max(deadline - monotonic(), 0))
+                break
+            if self._pending[0][0] > deadline:
+                if self._pending[0][1].endswith(expected):
+                    sleep(max(deadline - monotonic(), 0))
+                    break
+                # A reply recorded cut off by a timeout is cut off by this
+                #   timeout, however the two timeouts line up
+                self._pending[0][0] = deadline
+            sleep(max(self._pending[0][0] - monotonic(), 0))
+        if expected in data:
+            end = data.index(expected) + len(expected)
+            if end < len(data):
+                self._pending.insert(0, [monotonic(), data[end:]])
+            data = data[:end]
+        return(data)
+
+
+    def close(self):
+        self.is_open = False
+        return
+
+
+
+class Replayer(object):
+    """ Transport replaying a trace in place of opening a port """
+
+
+    def __init__(self, path, speed = 1.0, strict = False):
+        """ speed divides the recorded delays, None replays at once """
+        self.path = path
+        self.speed = speed
+        self.strict = strict
+        self.header, self.events = read_trace(path)
+
+
+    def __call__(self, port, timeout):
+        return(ReplayTransport(self.events, timeout, self.speed, self.strict))
+
+
+def main(argv = None):
+    """ Prints the events of a trace """
+    path = (argv or sys.argv[1:])[0]
+    header, events = read_trace(path)
+    print("Port " + str(header.get("port")) + ", " + str(len(events)) +
+          " events")
+    names = {WRITE: "->", READ: "<-", CLOSE: "close"}
+    for seconds, kind, data in events:
+        print("{:12.6f} {:<5} {!r}".format(seconds, names.get(kind, kind),
+                                           data))
+    return(0)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
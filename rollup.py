@@ -0,0 +1,284 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+
+# Downsampling rollups for long Arroyo TEC Controller runs #
+Rollup summarises telemetry as it arrives into tiers of fixed width time
+buckets, 1 second, 1 minute and 1 hour by default. Each bucket holds the
+sample count and the mean, standard deviation, minimum and maximum of every
+column. Finer tiers feed coarser ones as their buckets close, so months of
+1 Hz data can be plotted or reported from a few thousand rows.
+
+Example:
+    rollup = Rollup(directory = "rollups")
+    rollup.add(time(), TECpak586.read_snapshot())
+    ...
+    width, rows = rollup.query(start, end, resolution = 300)
+    excursion = rows["temperature_max"].max() - rows["temperature_min"].min()
+"""
+
+import numpy as np
+from data_logger import ChunkLogger
+from telemetry import TelemetryBuffer
+
+
+# Columns summarised by default, as named in telemetry.SAMPLE_DTYPE
+COLUMNS = ("target", "temperature", "current", "voltage", "power")
+
+# Default tiers as (bucket width in seconds, buckets kept in memory)
+#   A bucket of the default columns takes 352 bytes in memory, the ring
+#   buffers grow to about 30, 45 and 30 MB as the tiers fill, after a day, 90
+#   days and 10 years
+TIERS = ((1, 86400),            # 1 day of seconds
+         (60, 129600),          # 90 days of minutes
+         (3600, 87600))         # 10 years of hours
+
+# Buckets a tier's ring buffer starts with, doubled as needed up to its
+#   capacity
+INITIAL_BUCKETS = 1024
+
+
+def rollup_dtype(columns = COLUMNS):
+    """ Structured dtype of a rollup bucket: start time, sample count, and
+        the mean, std, min and max of each column """
+    fields = [("time", "f8"), ("count", "i8")]
+    for column in columns:
+        fields += [(column + "_mean", "f8"), (column + "_std", "f8"),
+                   (column + "_min", "f8"), (column + "_max", "f8")]
+    return(np.dtype(fields))
+
+
+def combine(index, count, mean, m2, low, high):
+    """ Merges partial summaries sharing a bucket index, index sorted
+        count has one value per row, mean, m2 (sum of squared deviations),
+        low and high have one row per partial and one column per column.
+        Uses the pairwise update of Chan et al. so no precision is lost to
+        large means. Returns the merged arrays in the same order. """
+    starts = np.flatnonzero(np.r_[True, index[1:] != index[:-1]])
+    if len(starts) == len(index):
+        return(index, count, mean, m2, low, high)
+    total = np.add.reduceat(count, starts)
+    merged = np.add.reduceat(count[:, None] * mean, starts, axis = 0) / \
+        total[:, None]
+    group = np.repeat(np.arange(len(starts)),
+                      np.diff(np.r_[starts, len(index)]))
+    m2 = np.add.reduceat(m2 + count[:, None] * (mean - merged[group])**2,
+                         starts, axis = 0)
+    return(index[starts], total, merged, m2,
+           np.minimum.reduceat(low, starts, axis = 0),
+           np.maximum.reduceat(high, starts, axis = 0))
+
+
+
+class RollupTier(object):
+    """ One tier of fixed width buckets """
+
+
+    def __init__(self, width, capacity, columns = COLUMNS, logger = None):
+        """ width is the bucket width in seconds, the latest capacity closed
+            buckets are kept in memory and also written to logger, a
+            data_logger.ChunkLogger, if given """
+        self.width = width
+        self.capacity = int(capacity)
+        self.columns = tuple(columns)
+        self.dtype = rollup_dtype(columns)
+        self.buckets = TelemetryBuffer(min(self.capacity, INITIAL_BUCKETS),
+                                       dtype = self.dtype)
+        self.logger = logger
+        # Partial summary of the bucket still receiving samples
+        self._open = None
+
+
+    def push(self, index, count, mean, m2, low, high):
+        """ Adds partial summaries for bucket indices index (time // width)
+            Returns the partial summaries of the buckets this closed """
+        partials = combine(index, count, mean, m2, low, high)
+        if self._open is not None:
+            if partials[0][0] < self._open[0][0]:
+                # Late data for a bucket already closed is dropped
+                keep = partials[0] >= self._open[0][0]
+                if not keep.any():
+                    return(None)
+                partials = tuple(p[keep] for p in partials)
+            partials = combine(*(np.concatenate([o, p]) for o, p in
+                                 zip(self._open, partials)))
+        self._open = tuple(p[-1:] for p in partials)
+        closed = tuple(p[:-1] for p in partials)
+        if not len(closed[0]):
+            return(None)
+        rows = self._rows(closed)
+        self._store(rows)
+        if self.logger is not None:
+            # Buffered, so chunks are written by chunk_rows and
+            #   flush_interval rather than one per closed bucket
+            self.logger.extend(rows)
+        return(closed)
+
+
+    def _store(self, rows):
+        """ Keeps closed buckets, doubling the ring buffer while it is
+            smaller than capacity and full """
+        buckets = self.buckets
+        needed = len(buckets) + len(rows)
+        if needed > buckets.capacity and buckets.capacity < self.capacity:
+            size = buckets.capacity
+            while size < needed and size < self.capacity:
+                size *= 2
+            grown = TelemetryBuffer(min(size, self.capacity),
+                                    dtype = self.dtype)
+            grown.extend(buckets.view())
+            self.buckets = grown
+        self.buckets.extend(rows)
+        return
+
+
+    def _rows(self, partials):
+        """ Converts partial summaries to rollup_dtype rows """
+        index, count, mean, m2, low, high = partials
+        rows = np.empty(len(index), dtype = self.dtype)
+        rows["time"] = index * self.width
+        rows["count"] = count
+        std = np.sqrt(m2 / count[:, None])
+        for i, column in enumerate(self.columns):
+            rows[column + "_mean"] = mean[:, i]
+            rows[column + "_std"] = std[:, i]
+            rows[column + "_min"] = low[:, i]
+            rows[column + "_max"] = high[:, i]
+        return(rows)
+
+
+    def current(self):
+        """ Returns the bucket still receiving samples as a rollup row """
+        if self._open is None:
+            return(np.empty(0, dtype = self.dtype))
+        return(self._rows(self._open))
+
+
+    def rows(self, start = None, end = None):
+        """ Returns the buckets overlapping start <= time < end, the open
+            bucket included, in time order """
+        rows = np.concatenate([self.buckets.view(), self.current()])
+        times = rows["time"]
+        first = 0 if start is None else \
+            np.searchsorted(times, start - self.width, side = "right")
+        last = len(rows) if end is None else \
+            np.searchsorted(times, end, side = "left")
+        return(rows[first:last])
+
+
+    def first_time(self):
+        """ Start time of the oldest bucket held, None when empty """
+        if len(self.buckets):
+            return(float(self.buckets.view()["time"][0]))
+        if self._open is not None:
+            return(float(self._open[0][0] * self.width))
+        return(None)
+
+
+
+class Rollup(object):
+    """ Class maintaining tiers of telemetry summaries """
+
+
+    def __init__(self, tiers = TIERS, columns = COLUMNS, directory = None):
+        """ tiers is a list of (bucket width in seconds, buckets kept in
+            memory), each width a multiple of the previous one. If directory
+            is given closed buckets of every tier are also logged there in
+            data_logger chunk files named rollup_<width>s_... """
+        widths = [width for width, capacity in tiers]
+        for finer, coarser in zip(widths, widths[1:]):
+            if coarser % finer:
+                raise ValueError("Tier widths must be multiples of each " +
+                                 "other, got " + str(widths))
+        self.columns = tuple(columns)
+        self.tiers = []
+        for width, capacity in tiers:
+            logger = None
+            if directory is not None:
+                logger = ChunkLogger(directory,
+                                     prefix = "rollup_" + str(width) + "s",
+                                     dtype = rollup_dtype(columns))
+            self.tiers.append(RollupTier(width, capacity, columns, logger))
+
+
+    def add(self, timestamp, snapshot):
+        """ Adds a serial_interface.Snapshot taken at timestamp (epoch s) """
+        values = {"target": snapshot.set_temp, "temperature": snapshot.temp,
+                  "current": snapshot.current, "voltage": snapshot.voltage,
+                  "power": snapshot.power}
+        sample = np.array([[values[column] for column in self.columns]],
+                          dtype = float)
+        self._push(np.array([timestamp], dtype = float), sample)
+        return
+
+
+    def add_array(self, data):
+        """ Adds a structured array of samples, such as
+            telemetry.TelemetryBuffer.view() or data_logger.read_log() """
+        if not len(data):
+            return
+        times = np.asarray(data["time"], dtype = float)
+        samples = np.column_stack([np.asarray(data[column], dtype = float)
+                                   for column in self.columns])
+        order = np.argsort(times, kind = "stable")
+        self._push(times[order], samples[order])
+        return
+
+
+    def _push(self, times, samples):
+        """ Feeds raw samples to the finest tier and closed buckets on to
+            the coarser tiers """
+        finest = self.tiers[0]
+        partials = (np.floor(times / finest.width).astype(np.int64),
+                    np.ones(len(times)), samples, np.zeros_like(samples),
+                    samples, samples)
+        for tier, coarser in zip(self.tiers, self.tiers[1:] + [None]):
+            closed = tier.push(*partials)
+            if closed is None or coarser is None:
+                break
+            index = closed[0] // (coarser.width // tier.width)
+            partials = (index,) + tuple(closed[1:])
+        return
+
+
+    def tier(self, width):
+        """ Returns the tier with buckets of width seconds """
+        for tier in self.tiers:
+            if tier.width == width:
+                return(tier)
+        raise KeyError("No tier of width " + str(width))
+
+
+    def query(self, start, end = None, resolution = None):
+        """ Returns (bucket width, rows) for start <= time < end from the
+            coarsest tier whose buckets are no wider than resolution seconds
+            and which still holds data back to start. Without a resolution
+            about 1000 buckets over the range are aimed for. """
+        if resolution is None:
+            span = (end if end is not None else self._latest()) - start
+            resolution = max(span / 1000.0, self.tiers[0].width)
+        eligible = [t for t in self.tiers if t.width <= resolution] or \
+            self.tiers[:1]
+        for tier in reversed(eligible):
+            first = tier.first_time()
+            if first is not None and first <= start:
+                return(tier.width, tier.rows(start, end))
+        # No tier reaches back to start, use the one reaching back furthest
+        tier = min(eligible, key = lambda t: t.first_time() 
+                   if t.first_time() is not None else np.inf)
+        return(tier.width, tier.rows(start, end))
+
+
+    def _latest(self):
+        """ Start time of the newest bucket of the finest tier """
+        rows = self.tiers[0].current()
+        return(float(rows["time"][0]) if len(rows) else 0.0)
+
+
+    def close(self):
+        """ Flushes and closes the tier logs. Open buckets are not written,
+            they are still incomplete. """
+        for tier in self.tiers:
+            if tier.logger is not None:
+                tier.logger.close()
+        return
@@ -0,0 +1,249 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+
+# Priority scheduling of commands to Arroyo TEC Controllers #
+CommandScheduler sits in front of write_command of a serial_interface.arroyo
+shared by several threads. Every line any thread sends is queued and sent by
+one worker thread in order of priority, so a safety command such as
+set_output(0) overtakes the telemetry polls queued before it:
+* SAFETY     commands making the controller safe, TEC:OUT 0
+* CONTROL    commands steering the output: set points, output on, autotune
+* CONFIG     every other command and query
+* TELEMETRY  queries of live readings only (temperature, current, voltage,
+                set points, status), as sent by read_snapshot
+Lines are classified by classify(), or given a priority for a block of code
+with the priority() context manager. The sleeps inside arroyo methods happen
+in the calling thread and never hold up the queue.
+
+A SAFETY line waits at most for the exchange in progress, no longer than its
+timeout, and for SAFETY lines queued before it: see safety_bound(). The
+queue holds at most depth lines. When it is full a new line evicts the
+oldest line of a lower priority, whose caller gets queue.Full, or is refused
+with queue.Full itself; SAFETY lines are always queued. A TELEMETRY line
+identical to one already queued shares its reply, and one still queued
+max_age seconds after it was asked is dropped with a TimeoutError, as its
+reading would be stale.
+
+Example:
+    TECpak586 = arroyo("COM3")
+    scheduler = CommandScheduler(TECpak586)
+    acquirer = Acquirer(TECpak586, rate = 10)
+    ...
+    scheduler.call(SAFETY, TECpak586.set_output, 0)
+"""
+
+import contextlib
+import heapq
+import itertools
+import queue
+import threading
+from time import monotonic
+
+
+# Priority classes, lower values are sent first
+SAFETY = 0
+CONTROL = 1
+CONFIG = 2
+TELEMETRY = 3
+PRIORITY_NAMES = ("safety", "control", "config", "telemetry")
+
+# Commands sent as SAFETY
+SAFETY_COMMANDS = ("TEC:OUT 0",)
+
+# Headers of the commands sent as CONTROL
+CONTROL_COMMANDS = ("TEC:T", "TEC:ITE", "TEC:OUT", "TEC:AUTOTUNE")
+
+# Queries of live readings. Lines holding only these are sent as TELEMETRY
+TELEMETRY_QUERIES = ("TEC:T?", "TEC:SET:T?", "TEC:ITE?", "TEC:SET:ITE?",
+                     "TEC:V?", "TEC:VBULK?", "TEC:R?", "TEC:COND?", "TIME?",
+                     "*ESR?")
+
+
+def classify(command):
+    """ Returns the priority class of a line of commands chained with ";" """
+    parts = [" ".join(part.upper().split()) for part in command.split(";")
+             if part.strip()]
+    if any(part in SAFETY_COMMANDS for part in parts):
+        return(SAFETY)
+    if parts and all(part in TELEMETRY_QUERIES for part in parts):
+        return(TELEMETRY)
+    if any(part.split(" ")[0] in CONTROL_COMMANDS for part in parts):
+        return(CONTROL)
+    return(CONFIG)
+
+
+
+class _Request(object):
+    """ A queued line and the reply its callers wait for """
+
+
+    def __init__(self, command, timeout, priority):
+        self.command = command
+        self.timeout = timeout
+        self.priority = priority
+        self.queued = monotonic()
+        self.done = threading.Event()
+        self.reply = None
+        self.error = None
+
+
+    def finish(self, reply = None, error = None):
+        self.reply = reply
+        self.error = error
+        self.done.set()
+        return
+
+
+
+class CommandScheduler(object):
+    """ Priority queue in front of the write_command of one arroyo device,
+        see the module description """
+
+
+    def __init__(self, device, depth = 32, max_age = None):
+        """ Routes every write_command of device through the queue until
+            close(). depth is the most lines queued, max_age the seconds a
+            TELEMETRY line may wait, by default the device timeout. """
+        self.device = device
+        self.depth = depth
+        self.max_age = device.timeout if max_age is None else max_age
+        self.stats = dict.fromkeys(["queued", "sent", "coalesced", "stale",
+                                    "evicted", "refused"], 0)
+        # Longest time in seconds a line of each priority has waited
+        self.max_wait = [0.0] * len(PRIORITY_NAMES)
+        self._send = device.write_command
+        self._heap = []
+        self._order = itertools.count()
+        self._condition = threading.Condition()
+        self._local = threading.local()
+        self._closed = False
+        self._thread = threading.Thread(target = self._run,
+                                        name = "arroyo-scheduler",
+                                        daemon = True)
+        self._thread.start()
+        device.write_command = self.write_command
+
+
+    def __enter__(self):
+        return(self)
+
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+    @property
+    def backlog(self):
+        """ Number of lines waiting in the queue """
+        return(len(self._heap))
+
+
+    @contextlib.contextmanager
+    def priority(self, priority):
+        """ Sends the lines of the calling thread at priority inside the
+            with block, in place of their classify() class """
+        previous = getattr(self._local, "priority", None)
+        self._local.priority = priority
+        try:
+            yield
+        finally:
+            self._local.priority = previous
+
+
+    def call(self, priority, function, *args, **kwargs):
+        """ Calls function(*args, **kwargs), sending its lines at priority,
+            e.g. call(SAFETY, device.set_output, 0) """
+        with self.priority(priority):
+            return(function(*args, **kwargs))
+
+
+    def write_command(self, command, timeout = None):
+        """ Queues a line and returns its reply, as arroyo.write_command """
+        priority = getattr(self._local, "priority", None)
+        if priority is None:
+            priority = classify(command)
+        request = self._queue(command, timeout, priority)
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return(request.reply)
+
+
+    def _queue(self, command, timeout, priority):
+        """ Adds a line to the queue, or finds the identical TELEMETRY line
+            already queued, evicting or refusing lines when full """
+        with self._condition:
+            if self._closed:
+                raise ValueError("CommandScheduler is closed")
+            if priority == TELEMETRY:
+                for _, _, queued in self._heap:
+                    if queued.priority == TELEMETRY and \
+                            queued.command == command and \
+                            queued.timeout == timeout:
+                        self.stats["coalesced"] += 1
+                        return(queued)
+            if len(self._heap) >= self.depth and priority != SAFETY:
+                entry = max(self._heap, key = lambda e: (e[0], -e[1]))
+                if entry[0] <= priority:
+                    self.stats["refused"] += 1
+                    raise queue.Full("Command queue full, refused " +
+                                     command.strip())
+                self._heap.remove(entry)
+                heapq.heapify(self._heap)
+                self.stats["evicted"] += 1
+                entry[2].finish(error = queue.Full(
+                    "Command queue full, dropped " + entry[2].command.strip()
+                    + " for " + command.strip()))
+            request = _Request(command, timeout, priority)
+            heapq.heappush(self._heap, (priority, next(self._order),
+                                        request))
+            self.stats["queued"] += 1
+            self._condition.notify()
+        return(request)
+
+
+    def _run(self):
+        """ Sends queued lines, highest priority and oldest first """
+        while True:
+            with self._condition:
+                while not self._heap and not self._closed:
+                    self._condition.wait()
+                if not self._heap:
+                    return
+                priority, _, request = heapq.heappop(self._heap)
+                waited = monotonic() - request.queued
+                if priority == TELEMETRY and waited > self.max_age:
+                    self.stats["stale"] += 1
+                    request.finish(error = TimeoutError(
+                        "Dropped stale " + request.command.strip() +
+                        " after waiting " + str(round(waited, 3)) + " s"))
+                    continue
+                self.stats["sent"] += 1
+                self.max_wait[priority] = max(self.max_wait[priority],
+                                              waited)
+            try:
+                request.finish(self._send(request.command, request.timeout))
+            except Exception as error:
+                request.finish(error = error)
+
+
+    def safety_bound(self):
+        """ Longest time in seconds a SAFETY line queued now can wait before
+            it is sent: the exchange in progress and the SAFETY lines ahead
+            of it, each taking at most the device timeout """
+        with self._condition:
+            ahead = sum(1 for entry in self._heap if entry[0] == SAFETY)
+        return((ahead + 1) * self.device.timeout)
+
+
+    def close(self):
+        """ Sends the lines still queued, then gives the device back its own
+            write_command and stops the worker thread """
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._thread.join()
+        if self.device.write_command == self.write_command:
+            del self.device.write_command
+        return
@@ -58,87 +58,555 @@ Tested on the following models:
 This program was developed with following python package versions.
 * dpython-dateutil  2.8.1
 * matplotlib        3.1.3
-* numpy             1.19.1
+* numpy             1.20.0
 * pyserial          3.4
-* python            3.7.7
+* python            3.8.0
 * vs2015_runtime    14.16.27012      
 """
 
-import serial
+import json
+import threading
 import serial.tools.list_ports as port_list
 import numpy as np
-from time import sleep 
-
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from time import monotonic, sleep 
+from discovery import (DEFAULT_CACHE, OPTIONAL_COMMANDS, DeviceCache, 
+                       UnsupportedCommand, firmware_major, matches, 
+                       parse_identity)
+from transports import open_transport
+
+
+# Every reply from the controller is terminated by a carriage return and 
+#   line feed
+TERMINATOR = b'\r\n'
+
+# Longest line sent when chaining commands with ";" in query_many
+MAX_LINE = 200
+
+# Types of the comma separated fields returned by each query. Used to split
+#   and parse the single reply returned for several chained queries
+QUERY_FORMATS = {"*IDN?":           (str,),
+                 "TIME?":           (str,),
+                 "TEC:T?":          (float,),
+                 "TEC:SET:T?":      (float,),
+                 "TEC:ITE?":        (float,),
+                 "TEC:SET:ITE?":    (float,),
+                 "TEC:V?":          (float,),
+                 "TEC:VBULK?":      (float,),
+                 "TEC:LIM:ITE?":    (float,),
+                 "TEC:LIM:V?":      (float,),
+                 "TEC:LIM:THI?":    (float,),
+                 "TEC:LIM:TLO?":    (float,),
+                 "TEC:OUT?":        (int,),
+                 "TEC:AUTOTUNE?":   (int,),
+                 "TEC:AUTOTUNESTATE?": (int,),
+                 "TEC:COND?":       (int,),
+                 "TEC:MODE?":       (str,),
+                 "TEC:GAIN?":       (str,),
+                 "TEC:HEATCOOL?":   (str,),
+                 "TEC:TOL?":        (float, float),
+                 "TEC:PID?":        (float, float, float),
+                 "TEC:CONST?":      (float, float, float),
+                 "TEC:FAN?":        (str, int, int),
+                 "*ESR?":           (int,)}
+
+# Configuration queries held in the shadow register cache
+SHADOW_QUERIES = ["TEC:MODE?", "TEC:GAIN?", "TEC:PID?", "TEC:TOL?", 
+                  "TEC:LIM:ITE?", "TEC:LIM:V?", "TEC:LIM:THI?", 
+                  "TEC:LIM:TLO?", "TEC:HEATCOOL?", "TEC:FAN?", "TEC:CONST?"]
+
+# Bits of the standard event status register (*ESR?) set by a front panel 
+#   key press (user request) or a power cycle. Either one means settings may
+#   have changed behind the shadow register cache
+ESR_INVALIDATE = (1 << 6) | (1 << 7)
+
+# Bits of the TEC condition status register (TEC:COND?), set while the 
+#   condition lasts
+COND_CURRENT_LIMIT = 1 << 0
+COND_VOLTAGE_LIMIT = 1 << 1
+COND_T_HIGH = 1 << 3
+COND_T_LOW = 1 << 4
+COND_OUT_OF_TOLERANCE = 1 << 9
+COND_OUTPUT_ON = 1 << 10
+
+# Settings accepted by arroyo.apply_config in the order they are written, 
+#   with the query reading each one and the command writing it
+CONFIG_SETTINGS = [("mode",             "TEC:MODE?",        "TEC:MODE:{}"),
+                   ("heatcool",         "TEC:HEATCOOL?",    "TEC:HEATCOOL {}"),
+                   ("current_limit",    "TEC:LIM:ITE?",     "TEC:LIM:ITE {}"),
+                   ("voltage_limit",    "TEC:LIM:V?",       "TEC:LIM:V {}"),
+                   ("fan",              "TEC:FAN?",         "TEC:FAN {}"),
+                   ("TLO_limit",        "TEC:LIM:TLO?",     "TEC:LIM:TLO {}"),
+                   ("THI_limit",        "TEC:LIM:THI?",     "TEC:LIM:THI {}"),
+                   ("tolerance",        "TEC:TOL?",         "TEC:TOL {}"),
+                   ("gain",             "TEC:GAIN?",        "TEC:GAIN {}"),
+                   ("PID",              "TEC:PID?",         "TEC:PID {}"),
+                   ("sensor_constants", "TEC:CONST?",       "TEC:CONST {}"),
+                   ("temp",             "TEC:SET:T?",       "TEC:T {}"),
+                   ("current",          "TEC:SET:ITE?",     "TEC:ITE {}"),
+                   ("output",           "TEC:OUT?",         "TEC:OUT {}")]
+
+# Outcome of arroyo.apply_config
+#   changed     dictionary of setting: (previous value, new value)
+#   unchanged   list of settings already at the wanted value
+#   failed      dictionary of setting: (wanted value, value read back)
+ConfigResult = namedtuple("ConfigResult", ["changed", "unchanged", "failed"])
+
+# Values returned together by arroyo.read_snapshot
+Snapshot = namedtuple("Snapshot", ["temp", "set_temp", "current", "voltage",
+                                   "power"])
+
+# Outcome of a wait: wait_until_stable and autotune with wait
+#   value       temperature when stable, or the autotune result code
+#   elapsed     seconds waited
+#   polls       number of exchanges made while waiting
+WaitResult = namedtuple("WaitResult", ["value", "elapsed", "polls"])
+
+# Shortest and longest time in seconds between polls while waiting
+MIN_POLL_INTERVAL = 0.05
+MAX_POLL_INTERVAL = 2.0
+
+
+def chain_commands(commands):
+    """ Joins commands with ";" into lines no longer than MAX_LINE
+        Yields each line with the list of queries it contains """
+    line = []
+    for command in [c.strip() for c in commands]:
+        if line and len(";".join(line + [command])) > MAX_LINE:
+            yield(";".join(line), [c for c in line if "?" in c])
+            line = []
+        line.append(command)
+    if line:
+        yield(";".join(line), [c for c in line if "?" in c])
+
+
+def parse_replies(queries, response):
+    """ Splits the reply to a line of chained queries and converts each 
+        answer to its python types with QUERY_FORMATS
+        Returns a list with one value, or tuple of values, per query """
+    if not queries:
+        return([])
+    fields = response.split(";")
+    if len(fields) == len(queries):
+        fields = [f.split(",") for f in fields]
+    else:
+        # Replies separated by commas are split by the width of each query
+        flat = response.replace(";", ",").split(",")
+        fields = []
+        for query in queries:
+            width = len(QUERY_FORMATS.get(query, (str,)))
+            fields.append(flat[:width])
+            flat = flat[width:]
+        if flat or len(fields[-1]) != len(QUERY_FORMATS.get(queries[-1], 
+                                                            (str,))):
+            raise ValueError("Reply " + repr(response) + 
+                             " does not match queries " + str(queries))
+    values = []
+    for query, field in zip(queries, fields):
+        types = QUERY_FORMATS.get(query, (str,) * len(field))
+        if len(types) != len(field):
+            raise ValueError("Expected " + str(len(types)) + " fields for " + 
+                             query + ", received " + str(field))
+        value = tuple(t(f.strip()) for t, f in zip(types, field))
+        values.append(value[0] if len(value) == 1 else value)
+    return(values)
+
+
+def find_ports():
+    """ Lists the names of serial ports that may hold Arroyo devices """
+    # Listing all available COM ports on windows computer
+    ports = list(port_list.comports())
+    return([p[0] for p in ports if "USB Serial Port" in p[1]])
+
+
+def discover(ports = None, timeout = 1.0, cache = DEFAULT_CACHE):
+    """ Probes ports (default find_ports()) in parallel and stores the 
+        identity of every controller found in the discovery cache
+        Returns a list of identity records, one per responding port """
+    if ports is None:
+        ports = find_ports()
+    def probe(port):
+        try:
+            device = arroyo(port, timeout, cache = cache)
+        except Exception:
+            print("Failed to connect to " + port)
+            return(None)
+        device.close()
+        return(device.identity)
+    with ThreadPoolExecutor(max_workers = max(len(ports), 1)) as workers:
+        records = list(workers.map(probe, ports))
+    return([r for r in records if r is not None])
 
 
 class arroyo(object):
     """ Class to control Arroyo Instrument's TEC Sources """
 
 
-    def __init__(self):
+    def __init__(self, port = None, timeout = 1.0, serial_number = None,
+                 model = None, cache = DEFAULT_CACHE, shadow = False,
+                 shadow_interval = 1.0, instrumentation = None,
+                 transport = None):
         """ Sets up connection to Arroyo device
-        Searches through available COM connections and chooses 5310
+        Connects to port if given, otherwise to the device with the given 
+        serial_number and/or model string, looked up in the discovery cache 
+        and found by probing every COM port if it is not cached. With none of 
+        these it searches through available COM connections and asks which 
+        one to use.
+        timeout is the default time in seconds to wait for a full reply
+        cache is the path of the discovery cache file, None disables it
+        shadow enables the shadow register cache, serving configuration 
+        reads from memory. The cache is dropped when the event status 
+        register reports a front panel change, checked at most every 
+        shadow_interval seconds
+        instrumentation is an instrumentation.Instrumentation recording the
+        latency and failures of every exchange, None for no recording
+        transport opens the port: a function of (port, timeout) returning
+        an open serial.Serial like object. The default, 
+        transports.open_transport, also takes "tcp://host:port" and 
+        pyserial URLs as port. See transports.py and recorder.py for others.
         """
-        # Listing all available COM ports on windows computer
-        ports = list(port_list.comports())
+        self.timeout = timeout
+        # One exchange at a time, so threads sharing the device never
+        #   interleave their bytes on the port
+        self._lock = threading.RLock()
+        self.transport = transport if transport is not None else \
+            open_transport
+        self.instrumentation = instrumentation
+        self.shadow = None
+        self.shadow_interval = shadow_interval
+        self._shadow_checked = 0
+        self.cache = DeviceCache(cache) if cache else None
+        self.identity = None
+        # Commands the firmware lacks, refused before reaching the device
+        self.unsupported = set()
+        selected = serial_number is not None or model is not None
+        if port is None and selected:
+            port = self._find_port(serial_number, model)
+        elif port is None:
+            port = self._choose_port()
+        self.port = port
+        self.ser = self._open(self.port)
+        if self.ser.is_open:
+            print("\n" + self.port + " has been opened.\n")
+            self._identify()
+        else:
+            print("\nDid not connect to " + self.port + "\n")
+        if selected and (self.identity is None or 
+                         not matches(self.identity, serial_number, model)):
+            # The device moved since it was cached, search all ports again
+            self.ser.close()
+            if self.cache:
+                self.cache.remove(self.port)
+            self.port = self._find_port(serial_number, model, 
+                                        use_cache = False)
+            self.ser = self._open(self.port)
+            self._identify()
+        if shadow:
+            self.refresh_shadow()
+
+
+    def _find_port(self, serial_number, model, use_cache = True):
+        """ Returns the port of the device matching serial_number and model
+            from the discovery cache, or by probing every port """
+        if use_cache and self.cache:
+            record = self.cache.find(serial_number, model)
+            if record:
+                return(record["port"])
+        cache = self.cache.path if self.cache else None
+        for record in discover(timeout = self.timeout, cache = cache):
+            if matches(record, serial_number, model):
+                return(record["port"])
+        raise IOError("No Arroyo device found with serial number " + 
+                      str(serial_number) + " and model " + str(model))
+
+
+    def _identify(self):
+        """ Reads the device identity and its unsupported commands
+            Capabilities are taken from the discovery cache when the cached 
+            identity of this port is unchanged, otherwise they are worked out
+            from the firmware version, or probed, and cached """
+        identity = parse_identity(self.write_command("*IDN? "))
+        record = self.cache.get(self.port) if self.cache else None
+        if record and record.get("idn") == identity["idn"]:
+            self.identity = record
+            self.unsupported = set(record.get("unsupported", []))
+            return(self.identity)
+        major = firmware_major(identity["firmware"])
+        unsupported = []
+        for command, first_major in sorted(OPTIONAL_COMMANDS.items()):
+            if major is not None:
+                supported = major >= first_major
+            else:
+                try:
+                    self.write_command(command + "?", 
+                                       timeout = min(self.timeout, 0.25))
+                    supported = True
+                except TimeoutError:
+                    supported = False
+            if not supported:
+                unsupported.append(command)
+        self.identity = dict(identity, port = self.port, 
+                             unsupported = unsupported)
+        self.unsupported = set(unsupported)
+        if self.cache:
+            self.identity = self.cache.update(self.identity)
+        return(self.identity)
+
+
+    def _choose_port(self):
+        """ Lists the Arroyo devices found on COM ports and returns the port
+            the user picks """
         options = []
         option = 1
-        for p in ports:
+        for p in find_ports():
             # Lists all available devices by Arroyo Instruments
-            if "USB Serial Port" in p[1]:
-                try:
-                    self.port = p[0]
-                    # Setting up and connecting to device
-                    self.ser = serial.Serial(port =     self.port,
-                                             baudrate = 38400,
-                                             parity =   serial.PARITY_NONE,
-                                             stopbits = serial.STOPBITS_ONE,
-                                             bytesize = serial.EIGHTBITS,
-                                             timeout =  0,
-                                             write_timeout = 0)
-                    if self.ser.is_open:
-                        self.ser.write(b'*IDN? \r\n')
-                        sleep(0.1)
-                        # Shows the model of Arroyo Instrument
-                        print("Option " + str(option) + ": " + 
-                              bytes.decode(self.ser.read(256)))
-                        options.append(p[0])
-                        option += 1 
-                        self.ser.close()
-                        sleep(0.1)
-                    else:
-                        print("\nDid not connect to " + self.port + "\n")
-                except:
-                    print("Failed to connect to " + p[0])
+            try:
+                self.port = p
+                # Setting up and connecting to device
+                self.ser = self._open(self.port)
+                if self.ser.is_open:
+                    # Shows the model of Arroyo Instrument
+                    print("Option " + str(option) + ": " + 
+                          self.write_command("*IDN? "))
+                    options.append(p)
+                    option += 1 
+                    self.ser.close()
+                    sleep(0.1)
+                else:
+                    print("\nDid not connect to " + self.port + "\n")
+            except:
+                print("Failed to connect to " + p)
         # Allows user to choose Arroyo instrument they would like to connect
         choice = None
         while choice == None:
             print("Which option would you like to connect to?\n" + 
                   "Press 1, 2, 3,... then hit ENTER: ")
             choice = int(input()) - 1
-        self.port = options[choice]
-        self.ser = serial.Serial(port =     self.port,
-                                 baudrate = 38400,
-                                 parity =   serial.PARITY_NONE,
-                                 stopbits = serial.STOPBITS_ONE,
-                                 bytesize = serial.EIGHTBITS,
-                                 timeout =  0,
-                                 write_timeout = 0)
-        if self.ser.is_open:
-            print("\n" + self.port + " has been opened.\n")
-            self.ser.write(b'*IDN? \r\n')
-            sleep(0.1)
-        else:
-            print("\nDid not connect to " + self.port + "\n")
+        return(options[choice])
+
+
+    def _open(self, port):
+        """ Opens the port of a device through the transport """
+        return(self.transport(port, self.timeout))
+
+
+    def write_command(self, command, timeout = None):
+        """Takes in string type AT command and returns string type response
+            Queries (commands containing "?") return as soon as the reply 
+            terminator arrives. A TimeoutError is raised if the full reply 
+            does not arrive within timeout seconds (defaults to 
+            self.timeout). Commands without a reply return an empty string.
+            Safe to call from several threads, exchanges are made one at a 
+            time."""
+        if timeout is None:
+            timeout = self.timeout
+        if self.unsupported:
+            self._check_supported(command)
+        with self._lock:
+            if self.instrumentation is None:
+                response = self._exchange(command, timeout)
+            else:
+                response = self.instrumentation.measure(self._exchange,
+                                                        command, timeout,
+                                                        TERMINATOR)
+        if "?" not in command:
+            return("")
+        if not response.endswith(TERMINATOR):
+            raise TimeoutError("No complete reply to " + command.strip() + 
+                               " within " + str(timeout) + " s, received " +
+                               repr(response))
+        response = bytes.decode(response[:-len(TERMINATOR)])
+        return(response)
 
 
-    def write_command(self,command):
-        """Takes in string type AT command and returns string type response"""
-        response = None
-        self.ser.write(str.encode(command) + b'\r\n')
-        sleep(0.1)
-        response = bytes.decode(self.ser.read(256))
-        return(response)
+    def _exchange(self, command, timeout):
+        """ Writes a command and returns the raw bytes of its reply, b"" for
+            commands without a reply """
+        # Discards stale bytes so they are not mistaken for this reply
+        self.ser.reset_input_buffer()
+        self.ser.write(str.encode(command) + TERMINATOR)
+        if "?" not in command:
+            return(b"")
+        if self.ser.timeout != timeout:
+            self.ser.timeout = timeout
+        return(self.ser.read_until(TERMINATOR))
+
+
+    def _check_supported(self, command):
+        """ Raises UnsupportedCommand if command, or any command chained in
+            it, is not supported by the device's firmware """
+        for part in command.split(";"):
+            header = part.strip().split(" ")[0].rstrip("?")
+            if header in self.unsupported:
+                raise UnsupportedCommand(header + " is not supported by " + 
+                                         str(self.identity.get("model")) + 
+                                         " firmware " + 
+                                         str(self.identity.get("firmware")))
+        return
+
+
+    def query_many(self, commands, timeout = None):
+        """ Sends a list of commands chained with ";" in as few writes as 
+            possible and returns a list with the parsed reply to each query
+            Commands without a "?" are sent in order but add nothing to the 
+            returned list. Replies are parsed with QUERY_FORMATS, queries 
+            returning several fields give a tuple. """
+        results = []
+        for line, queries in chain_commands(commands):
+            response = self.write_command(line, timeout)
+            try:
+                results += parse_replies(queries, response)
+            except ValueError:
+                if self.instrumentation is not None:
+                    self.instrumentation.parse_failed(line, response)
+                raise
+        return(results)
+
+
+    def read_snapshot(self):
+        """ Queries temperature, set point, current and voltage in a single 
+            exchange and returns them with the output power as a Snapshot 
+            With the shadow cache on, the event status register is read in 
+            the same exchange to catch front panel changes """
+        queries = ["TEC:T?", "TEC:SET:T?", "TEC:ITE?", "TEC:V?"]
+        if self.shadow is not None:
+            queries.append("*ESR?")
+        values = self.query_many(queries)
+        if self.shadow is not None:
+            self._apply_event_status(values.pop())
+        temp, set_temp, current, voltage = values
+        return(Snapshot(temp, set_temp, current, voltage, current * voltage))
+
+
+    def refresh_shadow(self):
+        """ Reads every configuration setting in one exchange and turns on 
+            the shadow register cache """
+        queries = [q for q in SHADOW_QUERIES 
+                   if q[:-1] not in self.unsupported]
+        values = self.query_many(queries + ["*ESR?"])
+        values.pop()
+        self.shadow = dict(zip(queries, values))
+        self._shadow_checked = monotonic()
+        return
+
+
+    def invalidate_shadow(self):
+        """ Empties the shadow register cache, settings are read from the 
+            device again the next time they are needed """
+        if self.shadow is not None:
+            self.shadow = {}
+        return
+
+
+    def _apply_event_status(self, status):
+        """ Drops the shadow cache if the event status register shows a front
+            panel change or power cycle """
+        self._shadow_checked = monotonic()
+        if status & ESR_INVALIDATE:
+            self.invalidate_shadow()
+        return
+
+
+    def _read_config(self, query):
+        """ Returns a configuration setting from the shadow cache when it is
+            on and still valid, otherwise from the device """
+        if self.shadow is None:
+            response, = self.query_many([query])
+            return(response)
+        if monotonic() - self._shadow_checked > self.shadow_interval:
+            self._apply_event_status(self.query_many(["*ESR?"])[0])
+        if query not in self.shadow:
+            self.shadow[query], = self.query_many([query])
+        return(self.shadow[query])
+
+
+    def _remember(self, query, value):
+        """ Stores a setting read back after a write in the shadow cache """
+        if self.shadow is not None:
+            self.shadow[query] = value
+        return
+
+
+    def _write_config(self, query, command):
+        """ Writes a setting and reads it back in one exchange
+            Returns the previous and new value. The previous value comes from
+            the shadow cache when it is on, saving a read. """
+        if self.shadow is not None:
+            previous = self._read_config(query)
+            new, = self.query_many([command, query])
+        else:
+            previous, new = self.query_many([query, command, query])
+        self._remember(query, new)
+        return(previous, new)
+
+
+    def apply_config(self, config):
+        """ Brings the controller to the settings in config, a dictionary or 
+            the path of a JSON file, keyed by the names in CONFIG_SETTINGS:
+                {"mode": "T", "current_limit": 4.7, "fan": ["OFF", 1],
+                 "tolerance": [0.01, 5], "PID": [32, 0.031, 0], 
+                 "temp": 23.0, "output": 1}
+            The current settings are read in one exchange and only those that
+            differ are written, chained with a single combined read-back.
+            Settings are written in the order of CONFIG_SETTINGS, so the mode
+            is set before the set point and the output is switched last.
+            Returns a ConfigResult """
+        if isinstance(config, str):
+            with open(config) as config_file:
+                config = json.load(config_file)
+        known = [name for name, query, command in CONFIG_SETTINGS]
+        unknown = [name for name in config if name not in known]
+        if unknown:
+            raise ValueError("Unknown settings " + str(unknown) + 
+                             ", expected some of " + str(known))
+        settings = [(name, query, command) for name, query, command 
+                    in CONFIG_SETTINGS if name in config]
+        wanted = {}
+        for name, query, command in settings:
+            value = config[name]
+            if not isinstance(value, (list, tuple)):
+                value = (value,)
+            types = QUERY_FORMATS[query]
+            wanted[name] = tuple(t(v) for t, v in zip(types, value))
+        # Reads current state, from the shadow cache where possible
+        current = {}
+        if self.shadow is not None:
+            for name, query, command in settings:
+                if query in SHADOW_QUERIES and query[:-1] not in \
+                        self.unsupported:
+                    current[name] = self._read_config(query)
+        missing = [(name, query) for name, query, command in settings 
+                   if name not in current]
+        values = self.query_many([query for name, query in missing])
+        current.update(zip([name for name, query in missing], values))
+        changes = []
+        unchanged = []
+        for name, query, command in settings:
+            value = current[name]
+            if not isinstance(value, tuple):
+                value = (value,)
+            if value[:len(wanted[name])] == wanted[name]:
+                unchanged.append(name)
+            else:
+                changes.append((name, query, command))
+        if not changes:
+            return(ConfigResult({}, unchanged, {}))
+        # Writes every change, then reads all of them back in the same line
+        writes = [command.format(", ".join(str(v) for v in wanted[name])) 
+                  for name, query, command in changes]
+        values = self.query_many(writes + 
+                                 [query for name, query, command in changes])
+        changed = {}
+        failed = {}
+        for (name, query, command), new in zip(changes, values):
+            self._remember(query, new)
+            value = new if isinstance(new, tuple) else (new,)
+            if value[:len(wanted[name])] == wanted[name]:
+                changed[name] = (current[name], new)
+            else:
+                failed[name] = (config[name], new)
+        return(ConfigResult(changed, unchanged, failed))
 
 
     def beep(self):
@@ -149,7 +617,9 @@ class arroyo(object):
 
     def close(self):
         """ Closes serial connection with controller """
-        self.ser.close()
+        self.invalidate_shadow()
+        with self._lock:
+            self.ser.close()
         sleep(0.1)
         if not self.ser.is_open:
             print("\n" + self.port + " has been closed.\n")
@@ -158,36 +628,34 @@ class arroyo(object):
 
     def sensor_constants(self):
         """ Queries device for sensor constants and returns array of floats"""
-        response = self.write_command("TEC:CONST? ")
-        response = response.split(',')
-        response = np.array(response, dtype=float)
+        response = np.array(self._read_config("TEC:CONST?"), dtype=float)
         return(response)
 
 
     def set_sensor_constants(self, A, B, C):
         """ Writes values for sensor constants
             Takes in float values A, B, and C """
-        print("Previous constants:    " + str(self.sensor_constants()))
-        self.write_command("TEC:CONST " +
-                           str(A) + ", " +
-                           str(B) + ", " +
-                           str(C))
-        sleep(0.1)
-        print("     New constants:    " + str(self.sensor_constants()))
+        previous, new = self._write_config("TEC:CONST?",
+                                           "TEC:CONST " +
+                                           str(A) + ", " +
+                                           str(B) + ", " +
+                                           str(C))
+        print("Previous constants:    " + str(np.array(previous)))
+        print("     New constants:    " + str(np.array(new)))
         return
 
 
     def read_temp(self):
         """ Queries temperature read by device and returns float in 
             Celsius """
-        temp = float(self.write_command("TEC:T? "))
+        temp, = self.query_many(["TEC:T?"])
         return(temp)
 
 
     def read_set_temp(self):
         """ Queries temperature set point from device and returns a float 
             value in Celsius """
-        set_point = float(self.write_command("TEC:SET:T? "))
+        set_point, = self.query_many(["TEC:SET:T?"])
         return(set_point)
 
 
@@ -195,9 +663,8 @@ class arroyo(object):
         """ Writes new temperature set point for controller """
         if self.read_mode() != "T":
             self.set_mode("T")
-        self.write_command("TEC:T " + str(set_point) + " ")
-        sleep(0.1)
-        if set_point == self.read_set_temp():
+        new, = self.query_many(["TEC:T " + str(set_point), "TEC:SET:T?"])
+        if set_point == new:
             print("Updated set point to: " + str(set_point) + "\xb0C")
             return True
         else:
@@ -211,9 +678,7 @@ class arroyo(object):
             seconds 
                 tolerance = 0.01 to 10°C
                 time = 0.1 to 50 seconds """
-        response = self.write_command("TEC:TOL? ").split(",")
-        tolerance = float(response[0])
-        time =  float(response[1])
+        tolerance, time = self._read_config("TEC:TOL?")
         return(tolerance,time)
 
 
@@ -221,12 +686,12 @@ class arroyo(object):
         """ Takes float types
             tolerance = 0.01 to 10 C
             time = 0.1 to 50 seconds """
-        print("Previous tolerances:    " + str(self.read_tolerance()))
-        self.write_command("TEC:TOL " +
-                           str(tolerance) + ", " +
-                           str(time))
-        sleep(0.1)
-        print("     New tolerances:    " + str(self.read_tolerance()))
+        previous, new = self._write_config("TEC:TOL?",
+                                           "TEC:TOL " +
+                                           str(tolerance) + ", " +
+                                           str(time))
+        print("Previous tolerances:    " + str(previous))
+        print("     New tolerances:    " + str(new))
         return
 
 
@@ -240,9 +705,8 @@ class arroyo(object):
     def read_gain(self):
         """ Query the control loop gain or PID control 
             Returns str type value 1, 3, 5, 10, 30, 50, 100 ,300, PID """
-        gain = self.write_command("TEC:GAIN? ")
         try:
-            gain = (gain.split('\r'))[0]
+            gain = self._read_config("TEC:GAIN?")
             return(gain)
         except:
             print("Error reading gain.")
@@ -252,9 +716,9 @@ class arroyo(object):
     def set_gain(self, gain): 
         """ Sets control loop gain of controller or switches to PID mode
             Takes str type value 1, 3, 5, 10, 30, 50, 100 ,300, PID """
-        self.write_command("TEC:GAIN " + str(gain) )
-        sleep(0.1)
-        if str(gain) == self.read_gain():
+        new, = self.query_many(["TEC:GAIN " + str(gain), "TEC:GAIN?"])
+        self._remember("TEC:GAIN?", new)
+        if str(gain) == new:
             print("Updated controller gain to: " + gain)
             return True
         else:
@@ -265,30 +729,35 @@ class arroyo(object):
     def read_PID(self):
         """ Reads the PID values of the controller and returns them as 
             float type values in order P I D"""
-        response = self.write_command("TEC:PID? ")
-        response = response.split(",")
-        P, I, D = np.array(response, dtype=float)
+        P, I, D = self._read_config("TEC:PID?")
         return(P, I, D)
 
 
     def set_PID(self, P, I, D):
         """ Writes controller PID values
             takes in P I D in order as float type values """
-        print("Previous PID:    " + str(self.read_PID()))
-        self.write_command("TEC:PID " +
-                           str(P) + ", " +
-                           str(I) + ", " +
-                           str(D))
-        sleep(0.1)
-        print("     New PID:    " + str(self.read_PID()))
+        previous, new = self._write_config("TEC:PID?",
+                                           "TEC:PID " +
+                                           str(P) + ", " +
+                                           str(I) + ", " +
+                                           str(D))
+        print("Previous PID:    " + str(previous))
+        print("     New PID:    " + str(new))
         return
 
 
+    def read_condition(self):
+        """ Queries the TEC condition status register and returns it as an 
+            int, see the COND_ bits """
+        condition, = self.query_many(["TEC:COND?"])
+        return(condition)
+
+
     def read_output(self):
         """ Checks if the output is enabled or disabled
             returns True for enabled and
             returns False for disabled """
-        output = int(self.write_command("TEC:OUT? "))
+        output, = self.query_many(["TEC:OUT?"])
         return(output)
 
 
@@ -296,9 +765,8 @@ class arroyo(object):
         """ Sets the output of the TEC controller to on or off 
             receiving the value 1 sets the controller output to on
             receiving the value 0 sets the controller output to off"""
-        self.write_command("TEC:OUT " + str(value))
-        sleep(0.1)
-        if value == self.read_output():
+        new, = self.query_many(["TEC:OUT " + str(value), "TEC:OUT?"])
+        if value == new:
             print("Updated output to: " + str(value))
             return True
         else:
@@ -309,15 +777,16 @@ class arroyo(object):
     def read_THI_limit(self):
         """ Queries the temperature limit of the controller and returns
             it as float type value """
-        limit = float(self.write_command("TEC:LIM:THI? "))
+        limit = self._read_config("TEC:LIM:THI?")
         return(limit)
 
 
     def set_THI_limit(self, THIlim):
         """ Sets the maximum temperature at which the output remains on """
-        self.write_command("TEC:LIM:THI " + str(THIlim) + " ")
-        sleep(0.1)
-        if THIlim == self.read_THI_limit():
+        new, = self.query_many(["TEC:LIM:THI " + str(THIlim), 
+                                "TEC:LIM:THI?"])
+        self._remember("TEC:LIM:THI?", new)
+        if THIlim == new:
             print("Updated Temperature High limit to: " + str(THIlim))
             return True
         else:
@@ -328,15 +797,16 @@ class arroyo(object):
     def read_TLO_limit(self):
         """ Queries the temperature limit of the controller and returns
             it as float type value """
-        limit = float(self.write_command("TEC:LIM:TLO? "))
+        limit = self._read_config("TEC:LIM:TLO?")
         return(limit)
 
 
     def set_TLO_limit(self, TLOlim):
         """ Sets the minimum temperature at which the output remains on """
-        self.write_command("TEC:LIM:TLO " + str(TLOlim) + " ")
-        sleep(0.1)
-        if TLOlim == self.read_TLO_limit():
+        new, = self.query_many(["TEC:LIM:TLO " + str(TLOlim), 
+                                "TEC:LIM:TLO?"])
+        self._remember("TEC:LIM:TLO?", new)
+        if TLOlim == new:
             print("Updated Temperature Low limit to: " + str(TLOlim))
             return True
         else:
@@ -349,11 +819,7 @@ class arroyo(object):
             speed returns str type OFF, SLOW, MEDIUM, FAST, or 4.0 to 12.0 in V
             mode returns int type 1, 2, or 3 (2 is always on)
             delay returns int type 1 to 240 in minutes """
-        response = self.write_command("TEC:FAN? ")
-        response = response.split(",")
-        speed = response[0]
-        mode = int(response[1])
-        delay = int(response[2])
+        speed, mode, delay = self._read_config("TEC:FAN?")
         return(speed, mode, delay)
 
 
@@ -364,16 +830,13 @@ class arroyo(object):
             delay takes int type 1 to 240 in minutes 
             recomend: arroyo.set_fan(12,2) """
         if not delay:
-            self.write_command("TEC:FAN " + 
-                               str(speed) + "," + 
-                               str(mode))
+            command = "TEC:FAN " + str(speed) + "," + str(mode)
         else:
-            self.write_command("TEC:FAN " + 
-                               str(speed) + "," + 
-                               str(mode) + "," +
-                               str(delay))
-        sleep(0.1)
-        speed_new, mode_new, delay_new = self.read_fan()
+            command = ("TEC:FAN " + str(speed) + "," + str(mode) + "," + 
+                       str(delay))
+        (speed_new, mode_new, delay_new), = self.query_many([command, 
+                                                             "TEC:FAN?"])
+        self._remember("TEC:FAN?", (speed_new, mode_new, delay_new))
         
         if str(speed) == str(speed_new):
             print("Updated fan speed to: " + str(speed))
@@ -397,7 +860,7 @@ class arroyo(object):
                 T   Temperature
                 R   Resistance
                 ITE Current """
-        response = self.write_command("TEC:MODE? ").split("\r")[0]
+        response = self._read_config("TEC:MODE?")
         return(response)
 
 
@@ -407,9 +870,9 @@ class arroyo(object):
                 T   Temperature
                 R   Resistance
                 ITE Current """
-        print("Controller mode is set to: " + self.read_mode())
-        self.write_command("TEC:MODE:" + mode + " ")
-        if mode == self.read_mode():
+        previous, new = self._write_config("TEC:MODE?", "TEC:MODE:" + mode)
+        print("Controller mode is set to: " + previous)
+        if mode == new:
             print("Controller mode updated to: " + mode)
         else:
             print("Failed to update controller mode!")
@@ -419,14 +882,14 @@ class arroyo(object):
     def read_current(self):
         """ Queries the measured output value of the current
             Returns a float type value """
-        response = float(self.write_command("TEC:ITE? "))
+        response, = self.query_many(["TEC:ITE?"])
         return(response)
 
 
     def read_set_current(self):
         """ Queries the set point value of the current
             Returns a float type value """
-        response = float(self.write_command("TEC:SET:ITE? "))
+        response, = self.query_many(["TEC:SET:ITE?"])
         return(response)
 
 
@@ -434,8 +897,8 @@ class arroyo(object):
         """ """
         if self.read_mode() != "ITE":
             self.set_mode("ITE")
-        self.write_command("TEC:ITE " + str(set_point) + " ")
-        if float(set_point) == self.read_set_current():
+        new, = self.query_many(["TEC:ITE " + str(set_point), "TEC:SET:ITE?"])
+        if float(set_point) == new:
             print("Updated current set point to: " + str(set_point) + " Amps")
             return True
         else:
@@ -446,17 +909,17 @@ class arroyo(object):
     def read_current_limit(self):
         """ Queries the maximum current output of the controller
             Returns a float type value """
-        response = float(self.write_command("TEC:LIM:ITE? "))
+        response = self._read_config("TEC:LIM:ITE?")
         return(response)
 
 
     def set_current_limit(self, limit):
         """ Sets the maximum current output of the controller
             Takes a float type value up to 10 """
-        print("Current limit is set to: " + 
-              str(self.read_current_limit()) + " Amps")
-        self.write_command("TEC:LIM:ITE " + str(limit) + " ")
-        if float(limit) == self.read_current_limit():
+        previous, new = self._write_config("TEC:LIM:ITE?", 
+                                           "TEC:LIM:ITE " + str(limit))
+        print("Current limit is set to: " + str(previous) + " Amps")
+        if float(limit) == new:
             print("Updated current limit to: " + str(limit) + " Amps")
             return True
         else:
@@ -466,14 +929,14 @@ class arroyo(object):
 
     def vbulk(self):
         """ Queries the unit's supply voltage """
-        response = float(self.write_command("TEC:VBULK? "))
+        response, = self.query_many(["TEC:VBULK?"])
         return(response)
 
 
     def read_voltage(self):
         """ Queries the measured output value of the voltage
             Returns a float type value """
-        response = float(self.write_command("TEC:V? "))
+        response, = self.query_many(["TEC:V?"])
         return(response)
 
 
@@ -481,17 +944,17 @@ class arroyo(object):
         """ Queries the voltage limit of the controller and returns
             it as float type value 
             Only available for v3.X firmware """
-        limit = float(self.write_command("TEC:LIM:V? "))
+        limit = self._read_config("TEC:LIM:V?")
         return(limit)
 
 
     def set_voltage_limit(self, vlim):
         """ Sets the maximum voltage over the peltier modules
             Only available for v3.X firmware """
-        print("Voltage limit is set to: " + 
-              str(self.read_voltage_limit()) + " Volts")
-        self.write_command("TEC:LIM:V " + str(vlim) + " ")
-        if float(vlim) == self.read_voltage_limit():
+        previous, new = self._write_config("TEC:LIM:V?", 
+                                           "TEC:LIM:V " + str(vlim))
+        print("Voltage limit is set to: " + str(previous) + " Volts")
+        if float(vlim) == new:
             print("Updated voltage limit to: " + str(vlim) + " Volts")
             return True
         else:
@@ -504,7 +967,7 @@ class arroyo(object):
                 BOTH
                 HEAT 
                 COOL """
-        mode = self.write_command("TEC:HEATCOOL? ").split("\r")[0]
+        mode = self._read_config("TEC:HEATCOOL?")
         return(mode)
 
 
@@ -514,10 +977,10 @@ class arroyo(object):
                 BOTH
                 HEAT
                 COOL """
-        print("Heat/cool mode is set to: " + 
-              str(self.read_heatcool()))    
-        self.write_command("TEC:HEATCOOL " + str(mode))
-        if str(mode) == self.read_heatcool():
+        previous, new = self._write_config("TEC:HEATCOOL?", 
+                                           "TEC:HEATCOOL " + str(mode))
+        print("Heat/cool mode is set to: " + str(previous))
+        if str(mode) == new:
             print("Updated heat/cool mode to: " + str(mode))
             return True
         else:
@@ -527,7 +990,7 @@ class arroyo(object):
 
     def read_autotune(self):
         """ Queries autotune result since boot-up """
-        response = int(self.write_command("TEC:AUTOTUNE? ").split("\r")[0])
+        response, = self.query_many(["TEC:AUTOTUNE?"])
         if response == 0:
             print("No AutoTune has been performed since last power-up")
             return(0)
@@ -545,23 +1008,143 @@ class arroyo(object):
             return(None)
     
     
-    def autotune(self, test_point):
+    def autotune(self, test_point, wait = False, timeout = 600.0,
+                 background = False):
         """ The TEC:AUTOTUNE command is used to start the AutoTune process, 
         using the temperature parameter as the AutoTune point. The current and
         temperature limits should be properly setup prior to starting AutoTune.
         
-        Takes one float type variable as the set point to be tested."""
-        self.read_autotune()
+        Takes one float type variable as the set point to be tested.
+        With wait, waits for the AutoTune to be reported in process and then
+        to finish, polling less often as it goes on, and returns a 
+        WaitResult with the result code of read_autotune (2 failed, 3 
+        successful). TimeoutError is raised if it has not finished within 
+        timeout seconds. With background as well, returns at once with a 
+        concurrent.futures.Future of the WaitResult. background without wait
+        raises ValueError."""
+        if background and not wait:
+            raise ValueError("background needs wait = True")
+        before = self.read_autotune()
         self.write_command("TEC:AUTOTUNE " + str(test_point) + " ")
-        sleep(0.5)
+        # AutoTune rewrites the PID values and gain
+        self.invalidate_shadow()
+        if not wait:
+            # Returns once the AutoTune is reported in process, or after 1 s
+            try:
+                self._wait_for(lambda: self._autotune_started(before), 1.0)
+            except TimeoutError:
+                pass
+            self.read_autotune()
+            return()
+        if background:
+            return(_in_background(self._wait_autotune, before, timeout))
+        return(self._wait_autotune(before, timeout))
+
+
+    def _autotune_started(self, before):
+        """ Returns the AutoTune result code once it no longer shows the 
+            result from before the command, which it may for a moment """
+        response, = self.query_many(["TEC:AUTOTUNE?"])
+        return(response if response == 1 or response != before else None)
+
+
+    def _wait_autotune(self, before, timeout):
+        """ Waits for an AutoTune just started to finish, see autotune """
+        def finished():
+            response, = self.query_many(["TEC:AUTOTUNE?"])
+            return(None if response == 1 else response)
+        started = self._wait_for(lambda: self._autotune_started(before), 
+                                 timeout, "AutoTune start")
+        result = started
+        if started.value == 1:
+            finish = self._wait_for(finished, 
+                                    max(timeout - started.elapsed, 0), 
+                                    "AutoTune finished")
+            result = WaitResult(finish.value, 
+                                started.elapsed + finish.elapsed, 
+                                started.polls + finish.polls)
+        self.invalidate_shadow()
         self.read_autotune()
-        return()
+        print("AutoTune took " + str(round(result.elapsed, 1)) + " s")
+        return(result)
 
 
     def read_autotunestate(self):
-        """ Work in progress, feel free to write this one if you need it. :) """
-        return()
-
-        
-        
-        
+        """ Queries the step of the AutoTune process in progress 
+            Returns 0 when no AutoTune is running, otherwise the step it is 
+            on, counting up from 1 """
+        state, = self.query_many(["TEC:AUTOTUNESTATE?"])
+        return(state)
+
+
+    def wait_until_stable(self, timeout = 300.0, background = False):
+        """ Waits until the controller reports the temperature within the 
+            tolerance window set with set_tolerance, returning a WaitResult 
+            with the temperature and the settle time as soon as it is. 
+            Raises TimeoutError if not stable within timeout seconds.
+            Polls often while the temperature is near or inside the window
+            and backs off while it is far away, each poll one exchange.
+            With background, returns at once with a 
+            concurrent.futures.Future of the WaitResult. """
+        if background:
+            return(_in_background(self.wait_until_stable, timeout))
+        tolerance, hold = self.read_tolerance()
+        previous = [None, None]
+        def stable():
+            condition, temp, set_temp = self.query_many(["TEC:COND?", 
+                                                         "TEC:T?", 
+                                                         "TEC:SET:T?"])
+            now = monotonic()
+            error = abs(temp - set_temp)
+            # The condition register can lag a set point change just made
+            if not condition & COND_OUT_OF_TOLERANCE and error <= tolerance:
+                return(temp)
+            last, previous[:] = list(previous), [now, error]
+            if error <= tolerance:
+                # Inside the window the controller waits hold seconds
+                return(None, hold / 4.0)
+            if last[0] is not None and last[1] > error:
+                # Closing in: polls again before the window is reached
+                rate = (last[1] - error) / (now - last[0])
+                return(None, (error - tolerance) / rate / 2.0)
+            return(None)
+        return(self._wait_for(stable, timeout, "Temperature stable"))
+
+
+    def _wait_for(self, check, timeout, description = "Condition met",
+                  minimum = MIN_POLL_INTERVAL, maximum = MAX_POLL_INTERVAL):
+        """ Calls check() until it returns a value other than None, or a 
+            tuple (None, hint) with hint the seconds it expects to wait.
+            Sleeps minimum seconds after the first call, twice as long 
+            after each later one up to maximum, or the hint if shorter. 
+            Returns a WaitResult, or raises TimeoutError after timeout 
+            seconds, naming the condition awaited by description. """
+        start = monotonic()
+        interval = minimum
+        polls = 0
+        while True:
+            value = check()
+            polls += 1
+            hint = None
+            if isinstance(value, tuple):
+                value, hint = value
+            elapsed = monotonic() - start
+            if value is not None:
+                return(WaitResult(value, elapsed, polls))
+            if elapsed >= timeout:
+                raise TimeoutError(description + " not reached within " + 
+                                   str(timeout) + " s")
+            delay = interval if hint is None else \
+                min(interval, max(hint, minimum))
+            sleep(min(delay, timeout - elapsed))
+            interval = min(interval * 2, maximum)
+
+
+def _in_background(function, *args):
+    """ Runs function(*args) on a new thread, returning a Future of it """
+    executor = ThreadPoolExecutor(max_workers = 1, 
+                                  thread_name_prefix = "arroyo-wait")
+    future = executor.submit(function, *args)
+    # The thread exits once the function returns
+    executor.shutdown(wait = False)
+    return(future)
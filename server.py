@@ -0,0 +1,286 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+
+# Network server sharing one Arroyo TEC Controller #
+Only one process can open a serial port. ArroyoServer owns the port, as an
+open serial_interface.arroyo, and serves it to any number of clients over
+TCP with the controller's own line protocol, so plotting, logging and
+control scripts share one unit by connecting to the server in place of the
+port:
+    TECpak586 = arroyo("tcp://127.0.0.1:10001")
+* Lines are sent to the controller one at a time, in the order they arrive.
+* Identical queries asked at the same time, e.g. every client's TEC:T?, are
+    coalesced: one exchange is made and its reply goes to all of them.
+* Replies to queries are kept for ttl seconds and served from memory to
+    clients asking again within that time.
+* Any line holding a command (no "?") drops every kept reply, so a client
+    reads back what it has just set.
+* If the controller cannot be reached, e.g. it was unplugged, queries are
+    answered with ERROR_REPLY at once rather than left to time out.
+Ten clients polling the same readings therefore cost about as much serial
+time as one. self.stats counts the lines received, the exchanges made, and
+the replies coalesced and served from memory.
+
+*ESR? is never kept or coalesced as reading it clears the register, and for
+the same reason clients should not enable the shadow register cache: only
+the client reading *ESR? first would see a front panel change.
+
+Example:
+    with ArroyoServer(arroyo("COM3")) as server:
+        ...
+
+Command line use, serving until ^C:
+    python server.py [--port COM3] [--listen 127.0.0.1:10001] [--ttl 0.1]
+"""
+
+import argparse
+import socket
+import sys
+import threading
+from time import monotonic, sleep
+from serial_interface import TERMINATOR, arroyo
+
+
+# TCP port of network attached Arroyo units, so clients address the server
+#   as they would a unit
+DEFAULT_PORT = 10001
+
+# Queries never kept or coalesced, reading the event status register clears it
+UNCACHED = {"*ESR?"}
+
+# Reply to queries the controller could not be asked, which clients fail to
+#   parse with a ValueError
+ERROR_REPLY = "ERROR"
+
+
+def _queries_only(line):
+    """ Whether every command chained in line is a query """
+    return(all(part.strip().endswith("?") for part in line.split(";")
+               if part.strip()))
+
+
+
+class _Exchange(object):
+    """ A query in progress, waited on by the clients coalesced with it """
+
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.reply = None
+
+
+
+class ArroyoServer(object):
+    """ Serves one arroyo device to many TCP clients, see the module
+        description """
+
+
+    def __init__(self, device, host = "127.0.0.1", port = DEFAULT_PORT,
+                 ttl = 0.1):
+        """ device is an open serial_interface.arroyo, closed with the server
+            Listens on host:port, a free port when 0, given as self.address
+            ttl is the time in seconds replies to queries are kept, 0 to
+            keep none """
+        self.device = device
+        self.ttl = ttl
+        self.stats = dict.fromkeys(["clients", "lines", "exchanges",
+                                    "coalesced", "cache_hits", "errors"], 0)
+        # Serializes the exchanges with the controller
+        self._serial = threading.Lock()
+        # Guards the kept replies, the queries in progress and the stats
+        self._state = threading.Lock()
+        self._cache = {}
+        self._inflight = {}
+        # Counts the commands written, a reply read across one is not kept
+        self._generation = 0
+        self._stop = threading.Event()
+        self._connections = []
+        self._listener = socket.create_server((host, port))
+        self._listener.settimeout(0.1)
+        host, port = self._listener.getsockname()[:2]
+        self.address = "tcp://" + host + ":" + str(port)
+        self._thread = threading.Thread(target = self._accept,
+                                        name = "arroyo-server",
+                                        daemon = True)
+        self._thread.start()
+
+
+    def __enter__(self):
+        return(self)
+
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+    def request(self, line):
+        """ Answers one line from a client as described in the module
+            description. Returns the reply without its terminator, "" for
+            commands, None when the controller gave no reply, or
+            ERROR_REPLY when it could not be reached. """
+        line = line.strip()
+        if not line:
+            return("")
+        with self._state:
+            self.stats["lines"] += 1
+        if not _queries_only(line):
+            return(self._command(line))
+        if line.upper() in UNCACHED:
+            return(self._exchange(line))
+        with self._state:
+            kept = self._cache.get(line)
+            if kept is not None and monotonic() - kept[0] < self.ttl:
+                self.stats["cache_hits"] += 1
+                return(kept[1])
+            exchange = self._inflight.get(line)
+            leader = exchange is None
+            if leader:
+                exchange = self._inflight[line] = _Exchange()
+                generation = self._generation
+            else:
+                self.stats["coalesced"] += 1
+        if not leader:
+            exchange.done.wait()
+            return(exchange.reply)
+        started = monotonic()
+        try:
+            exchange.reply = self._exchange(line)
+        finally:
+            with self._state:
+                if exchange.reply not in (None, ERROR_REPLY) and \
+                        generation == self._generation:
+                    self._cache[line] = (started, exchange.reply)
+                if self._inflight.get(line) is exchange:
+                    del self._inflight[line]
+            exchange.done.set()
+        return(exchange.reply)
+
+
+    def _command(self, line):
+        """ Sends a line holding commands, dropping every kept reply """
+        with self._state:
+            self._generation += 1
+            self._cache.clear()
+            # Later queries wait for a reply read after this command
+            self._inflight = {}
+        reply = self._exchange(line)
+        with self._state:
+            self._generation += 1
+            self._cache.clear()
+        return(reply)
+
+
+    def _exchange(self, line):
+        """ Sends a line to the controller, returning its reply, None if it
+            gave none, or ERROR_REPLY if it could not be reached """
+        with self._serial:
+            with self._state:
+                self.stats["exchanges"] += 1
+            try:
+                return(self.device.write_command(line))
+            except (TimeoutError, ValueError):
+                # A garbled reply, or an UnsupportedCommand
+                with self._state:
+                    self.stats["errors"] += 1
+                return(None)
+            except OSError:
+                # serial.SerialException is an OSError, as are the errors of
+                #   a lost network connection
+                with self._state:
+                    self.stats["errors"] += 1
+                return(ERROR_REPLY)
+
+
+    def _accept(self):
+        """ Accepts clients until closed """
+        while not self._stop.is_set():
+            try:
+                connection, address = self._listener.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+            connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            connection.settimeout(0.1)
+            with self._state:
+                self.stats["clients"] += 1
+            self._connections.append(connection)
+            threading.Thread(target = self._serve, args = (connection,),
+                             name = "arroyo-server-client",
+                             daemon = True).start()
+        return
+
+
+    def _serve(self, connection):
+        """ Answers the lines of one client, in order, until it leaves """
+        pending = b""
+        while not self._stop.is_set():
+            try:
+                data = connection.recv(4096)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            if not data:
+                break
+            pending += data.replace(b"\r", b"")
+            while b"\n" in pending:
+                line, pending = pending.split(b"\n", 1)
+                line = line.decode(errors = "replace")
+                try:
+                    reply = self.request(line)
+                except Exception:
+                    # Keeps serving the client after an unexpected failure
+                    with self._state:
+                        self.stats["errors"] += 1
+                    reply = ERROR_REPLY
+                if reply and "?" in line:
+                    try:
+                        connection.sendall(str.encode(reply) + TERMINATOR)
+                    except OSError:
+                        break
+        connection.close()
+        self._connections.remove(connection)
+        return
+
+
+    def close(self):
+        """ Stops serving, disconnects every client and closes the device """
+        self._stop.set()
+        self._thread.join()
+        self._listener.close()
+        for connection in list(self._connections):
+            connection.close()
+        with self._serial:
+            self.device.close()
+        return
+
+
+def main(argv = None):
+    """ Command line entry point, see the module description """
+    parser = argparse.ArgumentParser(description = "Share an Arroyo TEC " +
+                                     "controller with clients over TCP")
+    parser.add_argument("--port", default = None,
+                        help = "serial port of the controller, asked for " +
+                        "if not given")
+    parser.add_argument("--listen", default = "127.0.0.1:" +
+                        str(DEFAULT_PORT), help = "host:port to serve on")
+    parser.add_argument("--ttl", type = float, default = 0.1,
+                        help = "seconds replies to queries are kept")
+    args = parser.parse_args(argv)
+    host, _, port = args.listen.rpartition(":")
+    with ArroyoServer(arroyo(args.port), host or "127.0.0.1", int(port),
+                      args.ttl) as server:
+        print("Serving " + server.device.port + " on " + server.address +
+              ", ^C to stop")
+        try:
+            while True:
+                sleep(1.0)
+        except KeyboardInterrupt:
+            pass
+    return(0)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
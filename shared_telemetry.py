@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+
+# Shared memory telemetry for Arroyo TEC Controllers #
+SharedTelemetryBuffer is a telemetry.TelemetryBuffer whose samples and
+sample count live in a named multiprocessing.shared_memory block, so one
+acquisition process publishes samples that plotting, logging and analysis
+processes read in place. SharedTelemetryReader maps the same block in
+another process: view(), window() and latest() work as on a TelemetryBuffer,
+and poll() returns the samples added since the previous poll. Neither side
+takes a lock, a slow reader never delays the writer.
+
+The sample count is the sequence counter: it is advanced only after a
+sample is written, so every sample below it is complete. A reader falling
+more than the capacity behind loses the oldest samples, counted in
+reader.missed, and intact() tells whether samples it still holds a view of
+have since been overwritten.
+
+Example, in the acquisition process:
+    buffer = SharedTelemetryBuffer(18000, name = "arroyo_WETCAT")
+    acquirer = Acquirer(TECpak586, rate = 10, buffer = buffer)
+and in any other process:
+    reader = SharedTelemetryReader("arroyo_WETCAT")
+    samples = reader.poll()
+"""
+
+import json
+import numpy as np
+from multiprocessing import resource_tracker, shared_memory
+from telemetry import SAMPLE_DTYPE, TelemetryBuffer
+
+
+# Bytes before the samples: the header fields, then the sample dtype as JSON
+HEADER_SIZE = 4096
+
+# Header fields, int64 each
+HEADER_DTYPE = np.dtype([("count",      "i8"),
+                         ("capacity",   "i8"),
+                         ("dtype_size", "i8")])
+
+DEFAULT_NAME = "arroyo_telemetry"
+
+
+def _dtype_json(dtype):
+    """ Describes a structured dtype as JSON, read back by _dtype_from """
+    return(json.dumps(dtype.descr).encode())
+
+
+def _dtype_from(text):
+    return(np.dtype([tuple(field) for field in json.loads(text.decode())]))
+
+
+def _attach(name):
+    """ Maps an existing shared memory block without taking ownership of it,
+        so it is not unlinked when this process exits """
+    try:
+        return(shared_memory.SharedMemory(name, track = False))
+    except TypeError:
+        # Before Python 3.13 attaching registers the block with the resource
+        #   tracker, which removes it when the process exits
+        register = resource_tracker.register
+        resource_tracker.register = lambda name, rtype: None
+        try:
+            return(shared_memory.SharedMemory(name))
+        finally:
+            resource_tracker.register = register
+
+
+
+class SharedTelemetryBuffer(TelemetryBuffer):
+    """ TelemetryBuffer held in shared memory, written by one process
+        Meant for one writing thread, like TelemetryBuffer. """
+
+
+    def __init__(self, capacity, dtype = SAMPLE_DTYPE, name = DEFAULT_NAME):
+        """ Creates the shared memory block name, raising FileExistsError if
+            it exists. The block is removed by close(). """
+        self.capacity = int(capacity)
+        self.dtype = np.dtype(dtype)
+        description = _dtype_json(self.dtype)
+        if HEADER_DTYPE.itemsize + len(description) > HEADER_SIZE:
+            raise ValueError("dtype has too many fields to share")
+        self._memory = shared_memory.SharedMemory(
+            name, create = True,
+            size = HEADER_SIZE + 2 * self.capacity * self.dtype.itemsize)
+        self.name = self._memory.name
+        self._header = np.ndarray(1, HEADER_DTYPE, self._memory.buf)[0]
+        self._memory.buf[HEADER_DTYPE.itemsize:
+                         HEADER_DTYPE.itemsize + len(description)] = \
+            description
+        self._header["capacity"] = self.capacity
+        self._header["dtype_size"] = len(description)
+        self._header["count"] = 0
+        self._data = np.ndarray(2 * self.capacity, self.dtype,
+                                self._memory.buf, offset = HEADER_SIZE)
+
+
+    @property
+    def count(self):
+        """ Total number of samples appended, the sequence counter """
+        return(int(self._header["count"]))
+
+
+    @count.setter
+    def count(self, count):
+        self._header["count"] = count
+
+
+    def __enter__(self):
+        return(self)
+
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+    def close(self):
+        """ Unmaps and removes the shared memory block. Readers keep their
+            mapping until they close. """
+        self._header = None
+        self._data = None
+        self._memory.close()
+        self._memory.unlink()
+        return
+
+
+
+class SharedTelemetryReader(TelemetryBuffer):
+    """ Read-only mapping of a SharedTelemetryBuffer in another process """
+
+
+    def __init__(self, name = DEFAULT_NAME, start = None):
+        """ Maps the shared memory block name, raising FileNotFoundError if
+            no buffer publishes it. The first poll() returns the samples
+            from sequence start on, by default only samples added from now """
+        self._memory = _attach(name)
+        self.name = name
+        self._header = np.ndarray(1, HEADER_DTYPE, self._memory.buf)[0]
+        self.capacity = int(self._header["capacity"])
+        size = int(self._header["dtype_size"])
+        self.dtype = _dtype_from(bytes(self._memory.buf[
+            HEADER_DTYPE.itemsize:HEADER_DTYPE.itemsize + size]))
+        self._data = np.ndarray(2 * self.capacity, self.dtype,
+                                self._memory.buf, offset = HEADER_SIZE)
+        self._data.flags.writeable = False
+        # Sequence of the next sample poll() returns, and of the first
+        #   sample it last returned
+        self.position = self.count if start is None else start
+        self.first = self.position
+        # Samples overwritten before poll() could return them
+        self.missed = 0
+
+
+    @property
+    def count(self):
+        """ Total number of samples appended by the writer """
+        return(int(self._header["count"]))
+
+
+    def __enter__(self):
+        return(self)
+
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+    def intact(self, sequence):
+        """ Whether the sample numbered sequence, and every later one, is
+            still stored and not being overwritten by the writer """
+        # The writer may be writing sample count, over count - capacity
+        return(sequence > self.count - self.capacity)
+
+
+    def poll(self, copy = False):
+        """ Returns the samples appended since the previous poll, in order,
+            as a read-only structured array. The view is not copied, so
+            samples in it are overwritten once the writer gets capacity
+            samples ahead of them, check with intact(self.first). With copy
+            the samples are copied and checked before being returned. """
+        while True:
+            count = self.count
+            if count < self.position:
+                # The writer was cleared or restarted
+                self.position = 0
+            first = max(self.position, count - self.capacity + 1, 0)
+            self.missed += first - self.position
+            end = (count - 1) % self.capacity + 1 + self.capacity
+            samples = self._data[end - (count - first):end]
+            if not copy:
+                break
+            samples = samples.copy()
+            if self.intact(first):
+                break
+        self.first = first
+        self.position = count
+        return(samples)
+
+
+    def clear(self):
+        raise TypeError("SharedTelemetryReader is read-only")
+
+
+    def close(self):
+        """ Unmaps the shared memory block """
+        self._header = None
+        self._data = None
+        self._memory.close()
+        return
@@ -0,0 +1,677 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+
+# Simulated Arroyo TEC Controller #
+Lets the rest of the library be exercised and benchmarked without hardware:
+* SimulatedArroyo answers the command set used by serial_interface.arroyo
+    from one line of text at a time (handle), with a first order thermal
+    plant driven by the configured mode, PID or gain, limits and heat/cool
+    setting. It knows nothing of how lines arrive, so any transport can
+    reuse it.
+* Faults adds per command latency, jitter, serial line time, dropped and
+    corrupted replies to the exchange.
+* PtySimulator serves a SimulatedArroyo on a pseudo-terminal (Linux, macOS)
+    whose path opens like any serial port, and SocketSimulator serves it
+    over TCP as "tcp://127.0.0.1:<port>" on any platform.
+
+Example:
+    with PtySimulator(faults = Faults(latency = 0.005)) as simulator:
+        TECpak586 = arroyo(simulator.port, cache = None)
+        TECpak586.set_output(1)
+        print(TECpak586.read_snapshot())
+
+Command line use, serving until ^C:
+    python simulator.py [--latency 0.005] [--jitter 0.002] [--drop-rate 0]
+                        [--corrupt-rate 0] [--firmware 3.1] [--seed 1]
+                        [--tcp PORT]
+"""
+
+import argparse
+import os
+import random
+import select
+import socket
+import threading
+import numpy as np
+from time import monotonic, sleep
+from serial_interface import (COND_CURRENT_LIMIT, COND_OUT_OF_TOLERANCE,
+                              COND_OUTPUT_ON, COND_T_HIGH, COND_T_LOW,
+                              COND_VOLTAGE_LIMIT, TERMINATOR)
+
+
+# Settings written by "HEADER value[, value...]" and read by "HEADER?", with
+#   the type of each field and the value at power up. TEC:T and TEC:ITE are
+#   read back through TEC:SET:T? and TEC:SET:ITE?
+SETTINGS = {"TEC:T":        ("TEC:SET:T?",      (float,),        (25.0,)),
+            "TEC:ITE":      ("TEC:SET:ITE?",    (float,),        (0.0,)),
+            "TEC:OUT":      ("TEC:OUT?",        (int,),          (0,)),
+            "TEC:LIM:ITE":  ("TEC:LIM:ITE?",    (float,),        (4.0,)),
+            "TEC:LIM:V":    ("TEC:LIM:V?",      (float,),        (8.0,)),
+            "TEC:LIM:THI":  ("TEC:LIM:THI?",    (float,),        (50.0,)),
+            "TEC:LIM:TLO":  ("TEC:LIM:TLO?",    (float,),        (0.0,)),
+            "TEC:HEATCOOL": ("TEC:HEATCOOL?",   (str,),          ("BOTH",)),
+            "TEC:FAN":      ("TEC:FAN?",        (str, int, int), ("OFF", 1, 5)),
+            "TEC:TOL":      ("TEC:TOL?",        (float, float),  (0.1, 10.0)),
+            "TEC:GAIN":     ("TEC:GAIN?",       (str,),          ("PID",)),
+            "TEC:PID":      ("TEC:PID?",        (float,) * 3,    (10.0, 0.1,
+                                                                  0.0)),
+            "TEC:CONST":    ("TEC:CONST?",      (float,) * 3,    (1.125, 2.347,
+                                                                  0.855))}
+
+# Accepted values of settings with a fixed set of choices
+CHOICES = {"TEC:MODE":      ("T", "ITE", "R"),
+           "TEC:OUT":       (0, 1),
+           "TEC:HEATCOOL":  ("BOTH", "HEAT", "COOL"),
+           "TEC:GAIN":      ("1", "3", "5", "10", "30", "50", "100", "300",
+                             "PID")}
+FAN_SPEEDS = ("OFF", "SLOW", "MEDIUM", "FAST")
+
+# Bits of the standard event status register (*ESR?)
+ESR_EXECUTION_ERROR = 1 << 4
+ESR_COMMAND_ERROR = 1 << 5
+ESR_USER_REQUEST = 1 << 6
+ESR_POWER_ON = 1 << 7
+
+# Seconds between control loop updates of the simulated controller
+CONTROL_PERIOD = 0.05
+# Most control loop updates run to catch up after a long idle time
+MAX_STEPS = 20000
+
+
+
+class ThermalPlant(object):
+    """ First order model of a TEC mount
+        The temperature relaxes with time constant tau towards ambient plus
+        gain times the current, positive current heating. The TEC voltage is
+        its resistance times the current plus a Seebeck term. """
+
+
+    def __init__(self, ambient = 22.0, tau = 60.0, gain = 4.0,
+                 resistance = 1.5, seebeck = 0.02):
+        """ ambient in °C, tau in s, gain in °C/A, resistance in Ohms and
+            seebeck in V/°C """
+        self.ambient = ambient
+        self.tau = tau
+        self.gain = gain
+        self.resistance = resistance
+        self.seebeck = seebeck
+        self.temperature = ambient
+
+
+    def step(self, current, dt):
+        """ Advances the temperature by dt seconds at a constant current """
+        target = self.ambient + self.gain * current
+        self.temperature += (target - self.temperature) * \
+            (1 - np.exp(-dt / self.tau))
+        return(self.temperature)
+
+
+    def voltage(self, current):
+        """ TEC voltage at current """
+        return(self.resistance * current +
+               self.seebeck * (self.temperature - self.ambient))
+
+
+
+class SimulatedArroyo(object):
+    """ Command interpreter and control loop of a simulated controller """
+
+
+    def __init__(self, model = "586-08-26", serial_number = "100001",
+                 firmware = "3.1", plant = None, noise = 0.0005,
+                 autotune_time = 10.0, clock = monotonic, seed = None):
+        """ model, serial_number and firmware make up the *IDN? reply, with
+            firmware before 3 lacking TEC:LIM:V as in discovery.py
+            noise is the standard deviation of the temperature reading in °C
+            autotune_time is the length of an AutoTune in seconds
+            clock gives the time in seconds, the plant is advanced to it
+            before every line handled """
+        self.idn = ("Arroyo " + model + " TECPak v" + firmware + " SN " +
+                    serial_number)
+        self.unsupported = set()
+        if int(firmware.split(".")[0]) < 3:
+            self.unsupported.add("TEC:LIM:V")
+        self.plant = plant if plant is not None else ThermalPlant()
+        self.noise = noise
+        self.autotune_time = autotune_time
+        self.clock = clock
+        self.random = np.random.default_rng(seed)
+        self.settings = {header: default for header, (query, types, default)
+                         in SETTINGS.items()}
+        self.mode = "T"
+        self.current = 0.0
+        self.esr = ESR_POWER_ON
+        self.condition = 0
+        self.autotune = 0
+        self.beeps = 0
+        self._started = clock()
+        self._time = self._started
+        self._integral = 0.0
+        self._error = None
+        self._in_tolerance = None
+        self._autotune_end = None
+        self._lock = threading.Lock()
+        self.queries = {"*IDN?":               lambda: self.idn,
+                        "*ESR?":               self._read_esr,
+                        "TIME?":               self._uptime,
+                        "TEC:T?":              self._temperature,
+                        "TEC:R?":              self._resistance,
+                        "TEC:ITE?":            lambda: "%.3f" % self.current,
+                        "TEC:V?":              self._voltage,
+                        "TEC:VBULK?":          lambda: "12.000",
+                        "TEC:MODE?":           lambda: self.mode,
+                        "TEC:COND?":           lambda: str(self.condition),
+                        "TEC:AUTOTUNE?":       lambda: str(self.autotune),
+                        "TEC:AUTOTUNESTATE?":  self._autotune_state}
+
+
+    def handle(self, line):
+        """ Runs every command of a line, chained with ";", and returns the
+            replies to its queries joined by ";", or None when the line has
+            no query that could be answered """
+        with self._lock:
+            self._advance(self.clock())
+            replies = []
+            for command in line.strip().split(";"):
+                command = command.strip()
+                if not command:
+                    continue
+                try:
+                    reply = self._run(command)
+                except (ValueError, IndexError):
+                    self.esr |= ESR_EXECUTION_ERROR
+                    continue
+                if reply is not None:
+                    replies.append(reply)
+            return(";".join(replies) if replies else None)
+
+
+    def front_panel(self, line):
+        """ Runs commands as if set from the front panel, which sets the
+            user request bit of the event status register """
+        self.handle(line)
+        with self._lock:
+            self.esr |= ESR_USER_REQUEST
+        return
+
+
+    def _run(self, command):
+        """ Runs one command, returning its reply if it is a query """
+        header, _, argument = command.partition(" ")
+        header = header.upper()
+        if header.rstrip("?") in self.unsupported:
+            self.esr |= ESR_COMMAND_ERROR
+            return(None)
+        if header.endswith("?"):
+            if header in self.queries:
+                return(self.queries[header]())
+            for name, (query, types, default) in SETTINGS.items():
+                if query == header:
+                    return(",".join(str(v) for v in self.settings[name]))
+            self.esr |= ESR_COMMAND_ERROR
+            return(None)
+        if header.startswith("TEC:MODE:"):
+            self._set_mode(header[len("TEC:MODE:"):])
+        elif header in SETTINGS:
+            self._set(header, [a.strip() for a in argument.split(",")])
+        elif header == "TEC:AUTOTUNE":
+            self._start_autotune(float(argument))
+        elif header == "BEEP":
+            self.beeps += 1
+        elif header == "*CLS":
+            self.esr = 0
+        else:
+            self.esr |= ESR_COMMAND_ERROR
+        return(None)
+
+
+    def _set(self, header, fields):
+        """ Stores a setting after checking its fields """
+        query, types, default = SETTINGS[header]
+        if header == "TEC:FAN" and len(fields) == 2:
+            fields.append(self.settings[header][2])
+        if len(fields) != len(types):
+            raise ValueError(header + " takes " + str(len(types)) +
+                             " values")
+        value = tuple(t(f) for t, f in zip(types, fields))
+        if header == "TEC:GAIN":
+            value = (value[0].upper(),)
+        if header in CHOICES and value[0] not in CHOICES[header]:
+            raise ValueError(str(value[0]) + " is not a choice of " + header)
+        if header == "TEC:FAN":
+            if value[0].upper() not in FAN_SPEEDS and \
+                    not 4.0 <= float(value[0]) <= 12.0:
+                raise ValueError("Fan speed " + value[0])
+            if value[1] not in (1, 2, 3) or not 1 <= value[2] <= 240:
+                raise ValueError("Fan mode or delay " + str(value[1:]))
+        self.settings[header] = value
+        if header == "TEC:OUT" and not value[0]:
+            self._autotune_end = None
+        return
+
+
+    def _set_mode(self, mode):
+        """ Changes the control mode, resetting the control loop """
+        if mode not in CHOICES["TEC:MODE"]:
+            raise ValueError("Unknown mode " + mode)
+        self.mode = mode
+        self._integral = 0.0
+        self._error = None
+        return
+
+
+    def _start_autotune(self, temperature):
+        """ Starts an AutoTune at temperature, failing at once if the
+            current limit leaves nothing to tune with """
+        if self.settings["TEC:LIM:ITE"][0] <= 0:
+            self.autotune = 2
+            return
+        self.settings["TEC:T"] = (temperature,)
+        self.settings["TEC:OUT"] = (1,)
+        self._set_mode("T")
+        self.autotune = 1
+        self._autotune_end = self._time + self.autotune_time
+        return
+
+
+    def _finish_autotune(self):
+        """ Stores PI terms for the plant, as an internal model controller
+            with a closed loop time constant of a quarter of the plant's """
+        plant = self.plant
+        p = 4.0 / plant.gain
+        self.settings["TEC:PID"] = (round(p, 4), round(p / plant.tau, 6), 0.0)
+        self.settings["TEC:GAIN"] = ("PID",)
+        self.autotune = 3
+        self._autotune_end = None
+        return
+
+
+    def _advance(self, now):
+        """ Runs the control loop and plant up to now """
+        steps = int((now - self._time) / CONTROL_PERIOD)
+        if steps <= 0:
+            return
+        dt = CONTROL_PERIOD
+        if steps > MAX_STEPS:
+            dt = (now - self._time) / MAX_STEPS
+            steps = MAX_STEPS
+        for step in range(steps):
+            self._time += dt
+            if self._autotune_end is not None and \
+                    self._time >= self._autotune_end:
+                self._finish_autotune()
+            self._control(dt)
+        return
+
+
+    def _control(self, dt):
+        """ One control loop update: output current, limits, plant """
+        settings = self.settings
+        condition = 0
+        error = settings["TEC:T"][0] - self.plant.temperature
+        if not settings["TEC:OUT"][0]:
+            current = 0.0
+            self._integral = 0.0
+            self._error = None
+        elif self.mode == "ITE":
+            current = settings["TEC:ITE"][0]
+        else:
+            # Resistance mode is controlled as the equivalent temperature
+            if settings["TEC:GAIN"][0] == "PID":
+                p, i, d = settings["TEC:PID"]
+            else:
+                p, i, d = float(settings["TEC:GAIN"][0]), 0.0, 0.0
+            slope = 0.0 if self._error is None else \
+                (error - self._error) / dt
+            self._error = error
+            current = p * error + i * (self._integral + error * dt) + \
+                d * slope
+        low, high = -settings["TEC:LIM:ITE"][0], settings["TEC:LIM:ITE"][0]
+        if settings["TEC:HEATCOOL"][0] == "HEAT":
+            low = 0.0
+        elif settings["TEC:HEATCOOL"][0] == "COOL":
+            high = 0.0
+        if not low <= current <= high:
+            condition |= COND_CURRENT_LIMIT
+            current = min(max(current, low), high)
+        # Largest current the voltage limit allows in the present direction
+        vlimit = settings["TEC:LIM:V"][0]
+        if abs(self.plant.voltage(current)) > vlimit:
+            condition |= COND_VOLTAGE_LIMIT
+            back = self.plant.voltage(0.0)
+            bound = (np.sign(current) * vlimit - back) / \
+                self.plant.resistance
+            current = bound if abs(bound) < abs(current) else current
+        if settings["TEC:OUT"][0] and self.mode != "ITE" and not condition:
+            # Integrates only while unsaturated to avoid windup
+            self._integral += error * dt
+        self.current = current
+        temperature = self.plant.step(current, dt)
+        if temperature > settings["TEC:LIM:THI"][0]:
+            condition |= COND_T_HIGH
+        if temperature < settings["TEC:LIM:TLO"][0]:
+            condition |= COND_T_LOW
+        if condition & (COND_T_HIGH | COND_T_LOW) and settings["TEC:OUT"][0]:
+            # Temperature limits switch the output off
+            settings["TEC:OUT"] = (0,)
+            self._autotune_end = None
+            if self.autotune == 1:
+                self.autotune = 2
+        tolerance, hold = settings["TEC:TOL"]
+        if abs(settings["TEC:T"][0] - temperature) > tolerance:
+            self._in_tolerance = None
+        elif self._in_tolerance is None:
+            self._in_tolerance = self._time
+        if self._in_tolerance is None or self._time - self._in_tolerance < hold:
+            condition |= COND_OUT_OF_TOLERANCE
+        if settings["TEC:OUT"][0]:
+            condition |= COND_OUTPUT_ON
+        self.condition = condition
+        return
+
+
+    def _read_esr(self):
+        """ Returns and clears the event status register """
+        esr, self.esr = self.esr, 0
+        return(str(esr))
+
+
+    def _uptime(self):
+        seconds = int(self._time - self._started)
+        return("%02d:%02d:%02d" % (seconds // 3600, seconds // 60 % 60,
+                                   seconds % 60))
+
+
+    def _temperature(self):
+        noise = self.random.normal(0.0, self.noise) if self.noise else 0.0
+        return("%.4f" % (self.plant.temperature + noise))
+
+
+    def _voltage(self):
+        return("%.3f" % self.plant.voltage(self.current))
+
+
+    def _resistance(self):
+        """ Thermistor resistance in kOhms from the Steinhart-Hart constants,
+            given as A x 1e-3, B x 1e-4 and C x 1e-7 """
+        a, b, c = self.settings["TEC:CONST"]
+        a, b, c = a * 1e-3, b * 1e-4, c * 1e-7
+        x = (a - 1.0 / (self.plant.temperature + 273.15)) / c
+        y = np.sqrt((b / (3 * c))**3 + x**2 / 4)
+        return("%.4f" % (np.exp(np.cbrt(y - x / 2) - np.cbrt(y + x / 2)) /
+                         1000.0))
+
+
+    def _autotune_state(self):
+        """ 0 when no AutoTune is running, else its phase from 1 to 4 """
+        if self._autotune_end is None:
+            return("0")
+        left = (self._autotune_end - self._time) / self.autotune_time
+        return(str(min(int(4 * (1 - left)) + 1, 4)))
+
+
+
+class Faults(object):
+    """ Latency and errors added to each exchange with a simulator """
+
+
+    def __init__(self, latency = 0.0, jitter = 0.0, per_command = None,
+                 drop_rate = 0.0, corrupt_rate = 0.0, baudrate = 38400,
+                 seed = None):
+        """ latency is the processing time of every line in seconds, plus
+            per_command[header] for each command of the line with that
+            header, e.g. {"TEC:AUTOTUNE": 0.05, "TEC:T?": 0.002}
+            jitter is the width in seconds of a uniform random extra delay
+            drop_rate and corrupt_rate are the chances a reply is lost or has
+            one byte changed or its end cut off
+            baudrate adds the time the line and reply take on the wire, None
+            for none """
+        self.latency = latency
+        self.jitter = jitter
+        self.per_command = dict(per_command or {})
+        self.drop_rate = drop_rate
+        self.corrupt_rate = corrupt_rate
+        self.baudrate = baudrate
+        self.random = random.Random(seed)
+        self.dropped = 0
+        self.corrupted = 0
+
+
+    def apply(self, line, reply):
+        """ Returns the delay in seconds before the reply and the reply
+            bytes to send, None when there are none """
+        delay = self.latency + self.random.uniform(0, self.jitter)
+        for command in line.split(";"):
+            header = command.strip().split(" ")[0].upper()
+            delay += self.per_command.get(header, 0.0)
+        if reply is None:
+            data = None
+        else:
+            data = reply.encode() + TERMINATOR
+            if self.random.random() < self.drop_rate:
+                self.dropped += 1
+                data = None
+            elif self.random.random() < self.corrupt_rate:
+                self.corrupted += 1
+                data = self._corrupt(data)
+        if self.baudrate:
+            wire = len(line) + len(TERMINATOR) + len(data or b"")
+            # 10 bits per byte with start and stop bits
+            delay += wire * 10.0 / self.baudrate
+        return(delay, data)
+
+
+    def _corrupt(self, data):
+        """ Changes one byte of a reply or cuts off its end """
+        if self.random.random() < 0.5:
+            return(data[:self.random.randrange(len(data) - 1)])
+        index = self.random.randrange(len(data) - len(TERMINATOR))
+        return(data[:index] + b"#" + data[index + 1:])
+
+
+
+class LineServer(object):
+    """ Shared part of the simulator servers: answers lines from a
+        SimulatedArroyo through Faults and counts the traffic """
+
+
+    def __init__(self, device = None, faults = None, **kwargs):
+        """ device is a SimulatedArroyo, made from kwargs if not given
+            faults is a Faults, none by default """
+        self.device = device if device is not None else \
+            SimulatedArroyo(**kwargs)
+        self.faults = faults if faults is not None else \
+            Faults(baudrate = None)
+        self.lines = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self._counts = threading.Lock()
+        # Lines from different connections are answered one at a time
+        self._handling = threading.Lock()
+        self._stop = threading.Event()
+
+
+    def __enter__(self):
+        return(self)
+
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+    def _answer(self, pending, data, send):
+        """ Answers the complete lines in pending + data, passing each reply
+            to send. Returns the bytes after the last complete line. """
+        with self._counts:
+            self.bytes_in += len(data)
+        data = pending + data.replace(b"\r", b"")
+        while b"\n" in data:
+            line, data = data.split(b"\n", 1)
+            line = line.decode(errors = "replace")
+            with self._handling:
+                delay, reply = self.faults.apply(line,
+                                                 self.device.handle(line))
+            with self._counts:
+                self.lines += 1
+            if delay > 0 and self._stop.wait(delay):
+                break
+            if reply:
+                send(reply)
+                with self._counts:
+                    self.bytes_out += len(reply)
+        return(data)
+
+
+
+class PtySimulator(LineServer):
+    """ Serves a SimulatedArroyo on a pseudo-terminal, POSIX only """
+
+
+    def __init__(self, device = None, faults = None, **kwargs):
+        """ device is a SimulatedArroyo, made from kwargs if not given
+            faults is a Faults, none by default
+            The serial port path to connect to is self.port """
+        import pty
+        import tty
+        LineServer.__init__(self, device, faults, **kwargs)
+        self._master, self._slave = pty.openpty()
+        # Raw mode, so line endings pass unchanged and nothing is echoed
+        tty.setraw(self._slave)
+        self.port = os.ttyname(self._slave)
+        self._thread = threading.Thread(target = self._run,
+                                        name = "arroyo-simulator",
+                                        daemon = True)
+        self._thread.start()
+
+
+    def _run(self):
+        """ Reads lines from the pseudo-terminal and answers them in turn """
+        pending = b""
+        while not self._stop.is_set():
+            ready, _, _ = select.select([self._master], [], [], 0.1)
+            if not ready:
+                continue
+            try:
+                data = os.read(self._master, 4096)
+            except OSError:
+                return
+            pending = self._answer(pending, data,
+                                   lambda reply: os.write(self._master,
+                                                          reply))
+        return
+
+
+    def close(self):
+        """ Stops serving and closes the pseudo-terminal """
+        self._stop.set()
+        self._thread.join()
+        os.close(self._master)
+        os.close(self._slave)
+        return
+
+
+
+class SocketSimulator(LineServer):
+    """ Serves a SimulatedArroyo over TCP, one thread per connection, for
+        transports.SocketTransport. Connections share the one device. """
+
+
+    def __init__(self, device = None, faults = None, host = "127.0.0.1",
+                 port = 0, **kwargs):
+        """ Listens on host:port, a free port when 0
+            The address to connect to is self.port, "tcp://host:port" """
+        LineServer.__init__(self, device, faults, **kwargs)
+        self._listener = socket.create_server((host, port))
+        self._listener.settimeout(0.1)
+        host, port = self._listener.getsockname()[:2]
+        self.port = "tcp://" + host + ":" + str(port)
+        self._connections = []
+        self._thread = threading.Thread(target = self._accept,
+                                        name = "arroyo-simulator",
+                                        daemon = True)
+        self._thread.start()
+
+
+    def _accept(self):
+        """ Accepts connections until closed """
+        while not self._stop.is_set():
+            try:
+                connection, address = self._listener.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+            connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            connection.settimeout(0.1)
+            self._connections.append(connection)
+            threading.Thread(target = self._serve, args = (connection,),
+                             name = "arroyo-simulator-client",
+                             daemon = True).start()
+        return
+
+
+    def _serve(self, connection):
+        """ Answers the lines of one connection until it closes """
+        pending = b""
+        while not self._stop.is_set():
+            try:
+                data = connection.recv(4096)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            if not data:
+                break
+            pending = self._answer(pending, data, connection.sendall)
+        connection.close()
+        return
+
+
+    def close(self):
+        """ Stops serving and closes every connection """
+        self._stop.set()
+        self._thread.join()
+        self._listener.close()
+        for connection in self._connections:
+            connection.close()
+        return
+
+
+def main(argv = None):
+    """ Command line entry point, see the module description """
+    parser = argparse.ArgumentParser(description = "Serve a simulated " +
+                                     "Arroyo TEC controller on a " +
+                                     "pseudo-terminal or TCP port")
+    parser.add_argument("--latency", type = float, default = 0.0)
+    parser.add_argument("--jitter", type = float, default = 0.0)
+    parser.add_argument("--drop-rate", type = float, default = 0.0)
+    parser.add_argument("--corrupt-rate", type = float, default = 0.0)
+    parser.add_argument("--baudrate", type = int, default = 38400)
+    parser.add_argument("--firmware", default = "3.1")
+    parser.add_argument("--seed", type = int, default = None)
+    parser.add_argument("--tcp", type = int, default = None,
+                        help = "serve on this TCP port instead of a pty")
+    args = parser.parse_args(argv)
+    faults = Faults(args.latency, args.jitter, None, args.drop_rate,
+                    args.corrupt_rate, args.baudrate, args.seed)
+    if args.tcp is None:
+        simulator = PtySimulator(faults = faults, firmware = args.firmware,
+                                 seed = args.seed)
+    else:
+        simulator = SocketSimulator(faults = faults, port = args.tcp,
+                                    firmware = args.firmware,
+                                    seed = args.seed)
+    with simulator:
+        print("Simulated controller on " + simulator.port +
+              ", ^C to stop")
+        try:
+            while True:
+                sleep(1.0)
+        except KeyboardInterrupt:
+            pass
+    return(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,384 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+
+# Online stability analysis of Arroyo TEC Controller temperatures #
+Stability follows the temperature stream of a controller over a sliding
+window of samples and keeps, without going back over the whole window on
+each sample:
+* RollingStats, the mean, standard deviation, minimum and maximum.
+* AllanDeviation, the overlapping Allan deviation at octave spaced tau.
+* WelchPSD, the Welch power spectral density of half overlapping segments.
+Each sample or batch of samples only adds the terms it brings in and removes
+the terms leaving the window, in NumPy, so a 5 hour window costs the same at
+every sample. Running sums are recomputed exactly once per window to stop
+rounding errors from building up.
+
+Samples are taken to be evenly spaced at rate samples per second, as from
+acquisition.Acquirer. Missed deadlines (Acquirer.stats()) are not filled in.
+
+Example:
+    stability = Stability(rate = 1.0, window = 5 * 3600)
+    stability.add(timestamp, snapshot)
+    ...
+    report = stability.report()
+    print(report["std"], report["adev"][report["taus"] == 64])
+"""
+
+import numpy as np
+from telemetry import TelemetryBuffer
+
+
+# Ring buffer rows of the analysers
+VALUE_DTYPE = np.dtype([("time", "f8"), ("value", "f8")])
+INTEGRAL_DTYPE = np.dtype([("time", "f8"), ("integral", "f8")])
+
+
+def octave_factors(window):
+    """ Averaging factors 1, 2, 4, ... up to a quarter of window samples """
+    factors = [1]
+    while factors[-1] * 2 <= window // 4:
+        factors.append(factors[-1] * 2)
+    return(np.array(factors, dtype = np.int64))
+
+
+
+class RollingStats(object):
+    """ Mean, standard deviation, minimum and maximum of the latest window
+        samples. Minimum and maximum are kept per block of block samples,
+        so they cost about window / block + 2 * block operations to read
+        whatever happens between reads. """
+
+
+    def __init__(self, window = 18000, block = 128):
+        self.window = int(window)
+        self.block = int(block)
+        self.values = TelemetryBuffer(self.window, dtype = VALUE_DTYPE)
+        # Sums are kept relative to the first value to avoid cancellation
+        self._shift = None
+        self._sum = 0.0
+        self._squares = 0.0
+        self._unsynced = 0
+        # Ring of per block minima and maxima, by absolute block number
+        self._blocks = self.window // self.block + 2
+        self._low = np.full(self._blocks, np.nan)
+        self._high = np.full(self._blocks, np.nan)
+        self._newest = None
+
+
+    def add(self, times, values):
+        """ Adds one sample or arrays of samples """
+        times = np.atleast_1d(np.asarray(times, dtype = float))
+        values = np.atleast_1d(np.asarray(values, dtype = float))
+        if not len(values):
+            return
+        if self._shift is None:
+            self._shift = values[0]
+        first = self.values.count
+        leaving = max(len(self.values) + len(values) - self.window, 0)
+        self._unsynced += len(values)
+        if self._unsynced < self.window:
+            old = self.values.view()["value"][:leaving] - self._shift
+            new = values - self._shift
+            self._sum += new.sum() - old.sum()
+            self._squares += (new**2).sum() - (old**2).sum()
+        rows = np.empty(len(values), dtype = VALUE_DTYPE)
+        rows["time"] = times
+        rows["value"] = values
+        self.values.extend(rows)
+        if self._unsynced >= self.window:
+            self._sync()
+        self._add_blocks(first, values)
+        return
+
+
+    def _sync(self):
+        """ Recomputes the running sums exactly """
+        values = self.values.view()["value"] - self._shift
+        self._sum = values.sum()
+        self._squares = (values**2).sum()
+        self._unsynced = 0
+        return
+
+
+    def _add_blocks(self, first, values):
+        """ Folds values, the first at absolute index first, into the
+            block minima and maxima """
+        blocks = (first + np.arange(len(values))) // self.block
+        newest = int(blocks[-1])
+        if self._newest is None or newest - self._newest >= self._blocks:
+            self._low[:] = np.nan
+            self._high[:] = np.nan
+        elif newest > self._newest:
+            slots = np.arange(self._newest + 1, newest + 1) % self._blocks
+            self._low[slots] = np.nan
+            self._high[slots] = np.nan
+        self._newest = newest
+        keep = blocks > newest - self._blocks
+        slots = blocks[keep] % self._blocks
+        np.fmin.at(self._low, slots, values[keep])
+        np.fmax.at(self._high, slots, values[keep])
+        return
+
+
+    def _extremes(self):
+        """ Minimum and maximum over the window from whole blocks plus the
+            partial blocks at either end """
+        values = self.values.view()["value"]
+        first = self.values.count - len(values)
+        whole = -(-first // self.block)
+        end = self.values.count // self.block
+        if whole >= end:
+            return(values.min(), values.max())
+        slots = np.arange(whole, end) % self._blocks
+        head = values[:whole * self.block - first]
+        tail = values[end * self.block - first:]
+        edges = np.concatenate([head, tail])
+        low = np.nanmin(self._low[slots])
+        high = np.nanmax(self._high[slots])
+        if len(edges):
+            low = min(low, edges.min())
+            high = max(high, edges.max())
+        return(low, high)
+
+
+    def stats(self):
+        """ Returns a dictionary of the sample count, mean, std, min, max
+            and peak to peak over the window, NaN when empty """
+        count = len(self.values)
+        if not count:
+            return({"count": 0, "mean": np.nan, "std": np.nan,
+                    "min": np.nan, "max": np.nan, "peak_to_peak": np.nan})
+        mean = self._sum / count
+        variance = max(self._squares / count - mean**2, 0.0)
+        low, high = self._extremes()
+        return({"count":        count,
+                "mean":         self._shift + mean,
+                "std":          np.sqrt(variance),
+                "min":          low,
+                "max":          high,
+                "peak_to_peak": high - low})
+
+
+
+class AllanDeviation(object):
+    """ Overlapping Allan deviation of the latest window samples
+        With S the running sum of the samples, each averaging factor m adds
+        up the squares of (S[j+2m] - 2 S[j+m] + S[j]) / m over the window.
+        A new sample brings one term per factor and the oldest sample takes
+        one away, both found from the stored running sums. """
+
+
+    def __init__(self, rate = 1.0, window = 18000, factors = None):
+        """ tau is factor / rate seconds for each averaging factor, octaves
+            up to a quarter of the window by default """
+        self.tau0 = 1.0 / rate
+        self.window = int(window)
+        self.factors = np.asarray(factors if factors is not None else
+                                  octave_factors(self.window),
+                                  dtype = np.int64)
+        if self.factors.min() < 1 or 2 * self.factors.max() >= self.window:
+            raise ValueError("Averaging factors must be from 1 to " +
+                             str((self.window - 1) // 2))
+        # Running sums S[k] of the first k samples, S[0] included
+        self.integrals = TelemetryBuffer(self.window + 1,
+                                         dtype = INTEGRAL_DTYPE)
+        self._shift = None
+        self._sums = np.zeros(len(self.factors))
+        self._unsynced = 0
+
+
+    def _terms(self, integrals, offset, start, stop, factor):
+        """ Sum of squared second differences for j in [start, stop), with
+            integrals[0] holding S[offset] """
+        j = np.arange(start, stop) - offset
+        if not len(j):
+            return(0.0)
+        terms = (integrals[j + 2 * factor] - 2 * integrals[j + factor] +
+                 integrals[j]) / factor
+        return((terms**2).sum())
+
+
+    def _span(self):
+        """ Returns the stored running sums and the index of the first """
+        integrals = self.integrals.view()["integral"]
+        return(integrals, self.integrals.count - len(integrals))
+
+
+    def add(self, times, values):
+        """ Adds one sample or arrays of samples """
+        times = np.atleast_1d(np.asarray(times, dtype = float))
+        values = np.atleast_1d(np.asarray(values, dtype = float))
+        if not len(values):
+            return
+        if self._shift is None:
+            self._shift = values[0]
+            start = np.zeros(1, dtype = INTEGRAL_DTYPE)
+            start["time"] = times[0]
+            self.integrals.extend(start)
+        integrals, offset = self._span()
+        # Window of samples before and after as S indices [first, last]
+        last = offset + len(integrals) - 1
+        first = offset
+        new_last = last + len(values)
+        new_first = max(new_last - self.window, 0)
+        self._unsynced += len(values)
+        if self._unsynced < self.window:
+            for i, factor in enumerate(self.factors):
+                self._sums[i] -= self._terms(integrals, offset, first,
+                                             min(new_first,
+                                                 last - 2 * factor + 1),
+                                             factor)
+        rows = np.empty(len(values), dtype = INTEGRAL_DTYPE)
+        rows["time"] = times
+        rows["integral"] = integrals[-1] + np.cumsum(values - self._shift)
+        self.integrals.extend(rows)
+        integrals, offset = self._span()
+        if self._unsynced >= self.window:
+            self._sync()
+            return
+        for i, factor in enumerate(self.factors):
+            self._sums[i] += self._terms(integrals, offset,
+                                         max(new_first,
+                                             last - 2 * factor + 1),
+                                         new_last - 2 * factor + 1, factor)
+        return
+
+
+    def _sync(self):
+        """ Recomputes the sums of every factor exactly """
+        integrals, offset = self._span()
+        last = offset + len(integrals) - 1
+        for i, factor in enumerate(self.factors):
+            self._sums[i] = self._terms(integrals, offset, offset,
+                                        last - 2 * factor + 1, factor)
+        self._unsynced = 0
+        return
+
+
+    def deviation(self):
+        """ Returns arrays of tau in seconds and the Allan deviation at each,
+            NaN where the window does not yet hold 2 tau of samples """
+        samples = max(len(self.integrals) - 1, 0)
+        terms = samples - 2 * self.factors + 1
+        with np.errstate(invalid = "ignore", divide = "ignore"):
+            variance = np.where(terms > 0, self._sums / (2 * terms), np.nan)
+        return(self.factors * self.tau0, np.sqrt(variance))
+
+
+
+class WelchPSD(object):
+    """ Welch power spectral density over the latest window samples
+        Every nperseg / 2 samples the newest segment is mean detrended, Hann
+        windowed and transformed once, and its periodogram replaces the
+        oldest one in a running average. """
+
+
+    def __init__(self, rate = 1.0, window = 18000, nperseg = 1024):
+        self.rate = float(rate)
+        self.nperseg = int(nperseg)
+        self.step = self.nperseg // 2
+        if self.nperseg > window:
+            raise ValueError("nperseg must not exceed the window")
+        self.frequencies = np.fft.rfftfreq(self.nperseg, 1.0 / self.rate)
+        self.taper = np.hanning(self.nperseg)
+        # Density scaling, doubled for the one sided spectrum
+        self.scale = np.full(len(self.frequencies),
+                             2.0 / (self.rate * (self.taper**2).sum()))
+        self.scale[0] /= 2
+        if not self.nperseg % 2:
+            self.scale[-1] /= 2
+        segments = (int(window) - self.nperseg) // self.step + 1
+        self.spectra = TelemetryBuffer(segments, dtype = [
+            ("time", "f8"), ("power", "f8", (len(self.frequencies),))])
+        self._sum = np.zeros(len(self.frequencies))
+        self._unsynced = 0
+        # Samples not yet part of a complete segment, from the next start
+        self._pending = np.empty(0, dtype = VALUE_DTYPE)
+
+
+    def add(self, times, values):
+        """ Adds one sample or arrays of samples """
+        rows = np.empty(np.size(values), dtype = VALUE_DTYPE)
+        rows["time"] = times
+        rows["value"] = values
+        pending = np.concatenate([self._pending, rows])
+        count = max((len(pending) - self.nperseg) // self.step + 1, 0)
+        if not count:
+            self._pending = pending
+            return
+        segments = np.lib.stride_tricks.sliding_window_view(
+            pending["value"], self.nperseg)[::self.step][:count]
+        segments = segments - segments.mean(axis = 1, keepdims = True)
+        power = np.abs(np.fft.rfft(segments * self.taper, axis = 1))**2 * \
+            self.scale
+        leaving = max(len(self.spectra) + count - self.spectra.capacity, 0)
+        self._unsynced += count
+        if self._unsynced < self.spectra.capacity:
+            self._sum += power.sum(axis = 0) - \
+                self.spectra.view()["power"][:leaving].sum(axis = 0)
+        new = np.empty(count, dtype = self.spectra.dtype)
+        new["time"] = pending["time"][:count * self.step:self.step]
+        new["power"] = power
+        self.spectra.extend(new)
+        if self._unsynced >= self.spectra.capacity:
+            self._sum = self.spectra.view()["power"].sum(axis = 0)
+            self._unsynced = 0
+        self._pending = pending[count * self.step:]
+        return
+
+
+    def density(self):
+        """ Returns arrays of frequency in Hz and the power spectral density
+            in units squared per Hz, NaN before the first segment """
+        segments = len(self.spectra)
+        if not segments:
+            return(self.frequencies, np.full(len(self.frequencies), np.nan))
+        return(self.frequencies, self._sum / segments)
+
+
+
+class Stability(object):
+    """ Class following the stability of one telemetry column """
+
+
+    def __init__(self, rate = 1.0, window = 5 * 3600, nperseg = 1024,
+                 factors = None, column = "temperature"):
+        """ rate is the sample rate in samples per second and window the
+            number of samples analysed. column is the telemetry.SAMPLE_DTYPE
+            column followed by add_array. """
+        self.column = column
+        self.rolling = RollingStats(window)
+        self.allan = AllanDeviation(rate, window, factors)
+        self.psd = WelchPSD(rate, window, min(nperseg, window))
+
+
+    def add(self, timestamp, snapshot):
+        """ Adds the temperature of a serial_interface.Snapshot """
+        self.add_values(timestamp, snapshot.temp)
+        return
+
+
+    def add_values(self, times, values):
+        """ Adds one value or arrays of values, such as read_temp() results """
+        self.rolling.add(times, values)
+        self.allan.add(times, values)
+        self.psd.add(times, values)
+        return
+
+
+    def add_array(self, data):
+        """ Adds a structured array of samples, such as
+            telemetry.TelemetryBuffer.view() or log_reader chunks """
+        if len(data):
+            self.add_values(data["time"], data[self.column])
+        return
+
+
+    def report(self):
+        """ Returns a dictionary of the rolling statistics with the Allan
+            deviation (taus, adev) and power spectral density (freqs, psd) """
+        report = self.rolling.stats()
+        report["taus"], report["adev"] = self.allan.deviation()
+        report["freqs"], report["psd"] = self.psd.density()
+        return(report)
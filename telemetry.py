@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+
+# Telemetry storage for Arroyo TEC Controllers #
+TelemetryBuffer keeps the most recent samples of a controller in fixed size
+NumPy arrays. Appending a sample costs the same no matter how full the buffer
+is, memory never grows, and the latest samples can be read as a contiguous
+array view without copying.
+"""
+
+import numpy as np
+
+
+# Columns of a telemetry sample, time is in seconds since the epoch
+SAMPLE_DTYPE = np.dtype([("time",           "f8"),
+                         ("target",         "f8"),
+                         ("temperature",    "f8"),
+                         ("current",        "f8"),
+                         ("voltage",        "f8"),
+                         ("power",          "f8")])
+
+
+
+class TelemetryBuffer(object):
+    """ Fixed capacity ring buffer of telemetry samples 
+        Meant for one writing thread. The sample count is advanced only after
+        a row is complete, so readers in other threads never see a partly 
+        written latest sample. """
+
+
+    def __init__(self, capacity, dtype = SAMPLE_DTYPE):
+        """ Preallocates room for the latest capacity samples
+            dtype may be any structured dtype with a "time" field """
+        self.capacity = int(capacity)
+        self.dtype = np.dtype(dtype)
+        # Each sample is stored twice, capacity rows apart, so the latest
+        #   samples always form one contiguous slice of the array
+        self._data = np.zeros(2 * self.capacity, dtype = self.dtype)
+        # Total number of samples appended since creation
+        self.count = 0
+
+
+    def __len__(self):
+        return(min(self.count, self.capacity))
+
+
+    def append(self, time, target, temperature, current, voltage, power):
+        """ Adds one sample, overwriting the oldest when the buffer is full """
+        row = (time, target, temperature, current, voltage, power)
+        index = self.count % self.capacity
+        self._data[index] = row
+        self._data[index + self.capacity] = row
+        self.count += 1
+        return
+
+
+    def extend(self, rows):
+        """ Adds a structured array of samples in one step """
+        rows = np.asarray(rows, dtype = self.dtype)
+        total = len(rows)
+        # Only the last capacity rows can be kept
+        rows = rows[-self.capacity:]
+        start = self.count + total - len(rows)
+        index = (start + np.arange(len(rows))) % self.capacity
+        self._data[index] = rows
+        self._data[index + self.capacity] = rows
+        self.count += total
+        return
+
+
+    def append_snapshot(self, time, snapshot):
+        """ Adds a serial_interface.Snapshot taken at time """
+        self.append(time, snapshot.set_temp, snapshot.temp, snapshot.current,
+                    snapshot.voltage, snapshot.power)
+        return
+
+
+    def view(self, samples = None):
+        """ Returns the latest samples (default all stored samples) in time
+            order as a read-only structured array view, e.g.
+                buffer.view()["temperature"] """
+        stored = len(self)
+        if samples is None or samples > stored:
+            samples = stored
+        end = (self.count - 1) % self.capacity + 1 + self.capacity
+        window = self._data[end - samples:end]
+        window.flags.writeable = False
+        return(window)
+
+
+    def window(self, start, end = None):
+        """ Returns a view of the stored samples with start <= time < end,
+            times in seconds since the epoch, end defaults to the latest """
+        data = self.view()
+        first = np.searchsorted(data["time"], start, side = "left")
+        if end is None:
+            return(data[first:])
+        last = np.searchsorted(data["time"], end, side = "left")
+        return(data[first:last])
+
+
+    def latest(self):
+        """ Returns the most recent sample as a structured scalar """
+        if not self.count:
+            raise IndexError("TelemetryBuffer is empty")
+        return(self._data[(self.count - 1) % self.capacity])
+
+
+    def clear(self):
+        """ Forgets all samples """
+        self.count = 0
+        return
@@ -0,0 +1,299 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+
+# Temperature profiles for Arroyo TEC Controllers #
+TemperatureProfile runs a schedule of set point steps, ramps and soaks on an
+arroyo device. Every set point write is timed from one monotonic start time,
+so time lost to a slow exchange or a late wake up is never carried into the
+rest of the profile, and a profile of many hours ends on schedule to within
+the lateness of its last write. Set points are written with TEC:T alone,
+without the mode check and read back of set_temp; the mode is checked once
+before starting and the set point read back once at the end of each segment.
+
+Soaks may be gated on the controller's in-tolerance window, the tolerance
+and time set with set_tolerance (see read_tolerance): the soak starts only
+once the controller reports the temperature within tolerance, as read from
+the out of tolerance bit of the condition register, and the temperature read
+is within the tolerance of the set point, as the register can lag a set
+point change just made. Time spent waiting moves the rest of the schedule
+back and is logged as held time.
+
+Every write, settling and segment end is logged with its planned and actual
+time, see ProfileEvent, and can be written to a CSV file.
+
+Example:
+    profile = TemperatureProfile(TECpak586, [ramp(30.0, rate = 0.5),
+                                             soak(600),
+                                             step(25.0),
+                                             soak(300)])
+    profile.run()
+    profile.write_log("profile_log.csv")
+
+## Profile files ##
+load_profile reads a JSON list of segments, e.g.
+    [{"ramp": 30.0, "rate": 0.5}, {"soak": 600}, {"step": 25.0},
+     {"ramp": 20.0, "duration": 900}, {"soak": 300, "gate": false}]
+"""
+
+import csv
+import json
+import threading
+from collections import namedtuple
+from time import monotonic, time
+from serial_interface import COND_OUT_OF_TOLERANCE
+
+
+# One segment of a profile
+#   kind        "step", "ramp" or "soak"
+#   target      set point in Celsius reached by a step or ramp
+#   duration    seconds taken by a ramp or soak
+#   rate        ramp rate in Celsius per minute, used when duration is None
+#   gate        whether a soak waits for the controller to be in tolerance
+Segment = namedtuple("Segment", ["kind", "target", "duration", "rate",
+                                 "gate"])
+
+# One line of the profile log, times in seconds since the profile started
+#   segment     index of the segment
+#   kind        "write" of a set point, "settled" in tolerance, or "end" of
+#               the segment with the set point read back
+#   planned     time the event was due
+#   actual      time it happened
+#   set_point   set point written, or read back at the end of a segment
+ProfileEvent = namedtuple("ProfileEvent", ["segment", "kind", "planned",
+                                           "actual", "set_point"])
+
+
+def step(target):
+    """ Sets target at once """
+    return(Segment("step", float(target), 0.0, None, False))
+
+
+def ramp(target, duration = None, rate = None):
+    """ Moves the set point linearly to target over duration seconds, or at
+        rate Celsius per minute """
+    if (duration is None) == (rate is None):
+        raise ValueError("A ramp takes either a duration or a rate")
+    if duration is not None and not float(duration) >= 0:
+        raise ValueError("Ramp duration must be 0 s or more, not " +
+                         str(duration))
+    if rate is not None and not float(rate) > 0:
+        raise ValueError("Ramp rate must be above 0 C/min, not " + str(rate))
+    return(Segment("ramp", float(target),
+                   None if duration is None else float(duration),
+                   None if rate is None else float(rate), False))
+
+
+def soak(duration, gate = True):
+    """ Holds the set point for duration seconds, starting once the
+        controller is in tolerance when gate is set """
+    return(Segment("soak", None, float(duration), None, bool(gate)))
+
+
+def load_profile(path):
+    """ Reads a list of segments from a JSON profile file, see the module
+        description """
+    with open(path) as profile_file:
+        entries = json.load(profile_file)
+    segments = []
+    for entry in entries:
+        if "step" in entry:
+            segments.append(step(entry["step"]))
+        elif "ramp" in entry:
+            segments.append(ramp(entry["ramp"], entry.get("duration"),
+                                 entry.get("rate")))
+        elif "soak" in entry:
+            segments.append(soak(entry["soak"], entry.get("gate", True)))
+        else:
+            raise ValueError("Unknown profile segment " + str(entry))
+    return(segments)
+
+
+
+class TemperatureProfile(object):
+    """ Class running a list of segments on an arroyo device, see the module
+        description """
+
+
+    def __init__(self, device, segments, interval = 1.0, gate_interval = 0.1,
+                 settle_timeout = None):
+        """ device is an arroyo
+            segments is a list of step, ramp and soak segments
+            interval is the time in seconds between set point writes during
+            a ramp
+            gate_interval is the time in seconds between reads of the
+            condition register while waiting to be in tolerance
+            settle_timeout is the longest time in seconds a gated soak
+            waits, None to wait as long as it takes """
+        self.device = device
+        self.segments = list(segments)
+        self.interval = interval
+        self.gate_interval = gate_interval
+        self.settle_timeout = settle_timeout
+        self.log = []
+        self.tolerance = None
+        # Seconds the schedule was moved back waiting to be in tolerance
+        self.held = 0.0
+        self.started = None
+        self._set_point = None
+        self._start = None
+        self._stop = threading.Event()
+        self._thread = None
+
+
+    def run(self):
+        """ Runs the profile to its end, or until stop(), and returns the
+            log. Raises TimeoutError if a gated soak does not settle within
+            settle_timeout. """
+        self._stop.clear()
+        self.log = []
+        self.held = 0.0
+        if self.device.read_mode() != "T":
+            self.device.set_mode("T")
+        self.tolerance = self.device.read_tolerance()
+        self._set_point, = self.device.query_many(["TEC:SET:T?"])
+        self.started = time()
+        self._start = monotonic()
+        planned = 0.0
+        for index, segment in enumerate(self.segments):
+            if self._stop.is_set():
+                break
+            if segment.kind == "step":
+                self._write(index, planned, segment.target)
+            elif segment.kind == "ramp":
+                planned = self._ramp(index, planned, segment)
+            else:
+                planned = self._soak(index, planned, segment)
+            if self._stop.is_set():
+                break
+            # One read back per segment confirms the last set point written
+            set_point, = self.device.query_many(["TEC:SET:T?"])
+            self.log.append(ProfileEvent(index, "end", planned,
+                                         self._now(), set_point))
+        return(self.log)
+
+
+    def _now(self):
+        return(monotonic() - self._start)
+
+
+    def _wait(self, planned):
+        """ Sleeps until planned seconds after the start, False if stopped """
+        return(not self._stop.wait(max(planned - self._now(), 0)))
+
+
+    def _write(self, index, planned, set_point):
+        """ Writes a set point at the planned time, skipping a repeat """
+        if not self._wait(planned):
+            return
+        set_point = round(set_point, 3)
+        if set_point != self._set_point:
+            self.device.write_command("TEC:T " + str(set_point))
+            self._set_point = set_point
+            self.log.append(ProfileEvent(index, "write", planned,
+                                         self._now(), set_point))
+        return
+
+
+    def _ramp(self, index, planned, segment):
+        """ Writes the set points of a ramp, returning its planned end """
+        start = self._set_point
+        duration = segment.duration
+        if duration is None:
+            duration = abs(segment.target - start) / segment.rate * 60.0
+        end = planned + duration
+        update = planned + self.interval
+        while update < end and not self._stop.is_set():
+            now = self._now()
+            if now > update:
+                # Skips the updates that are already late, writing the set
+                #   point due now rather than catching up one by one
+                update += ((now - update) // self.interval) * self.interval
+            fraction = (update - planned) / duration
+            self._write(index, update, start + fraction *
+                        (segment.target - start))
+            update += self.interval
+        self._write(index, end, segment.target)
+        return(end)
+
+
+    def _soak(self, index, planned, segment):
+        """ Holds the set point, returning the planned end of the soak """
+        if segment.gate and self._wait(planned):
+            while not self._settled():
+                waited = self._now() - planned
+                if self.settle_timeout is not None and \
+                        waited > self.settle_timeout:
+                    raise TimeoutError("Not in tolerance " +
+                                       str(self.tolerance) + " after " +
+                                       str(round(waited, 1)) + " s")
+                if self._stop.wait(self.gate_interval):
+                    return(planned)
+            now = self._now()
+            self.log.append(ProfileEvent(index, "settled", planned, now,
+                                         self._set_point))
+            if now > planned:
+                self.held += now - planned
+                planned = now
+        end = planned + segment.duration
+        self._wait(end)
+        return(end)
+
+
+    def _settled(self):
+        """ Whether the controller is in tolerance of the set point, read in
+            one exchange """
+        condition, temp = self.device.query_many(["TEC:COND?", "TEC:T?"])
+        # The condition register can lag a set point change just made
+        return(not condition & COND_OUT_OF_TOLERANCE and
+               abs(temp - self._set_point) <= self.tolerance[0])
+
+
+    @property
+    def running(self):
+        return(self._thread is not None and self._thread.is_alive())
+
+
+    def start(self):
+        """ Runs the profile on a daemon thread """
+        if self.running:
+            return
+        self._thread = threading.Thread(target = self.run,
+                                        name = "arroyo-profile",
+                                        daemon = True)
+        self._thread.start()
+        return
+
+
+    def stop(self, timeout = None):
+        """ Stops the profile, leaving the last set point written """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return
+
+
+    def stats(self):
+        """ Returns a dictionary with the number of set point writes, their
+            mean and largest lateness in ms, the time held waiting to be in
+            tolerance and how late the last segment ended in ms """
+        late = [e.actual - e.planned for e in self.log if e.kind == "write"]
+        ends = [e for e in self.log if e.kind == "end"]
+        return({"writes":       len(late),
+                "mean_late_ms": sum(late) / len(late) * 1e3 if late else 0.0,
+                "max_late_ms":  max(late) * 1e3 if late else 0.0,
+                "held_s":       self.held,
+                "end_late_ms":  (ends[-1].actual - ends[-1].planned) * 1e3
+                                if ends else None})
+
+
+    def write_log(self, path):
+        """ Writes the log to a CSV file, times in seconds since the start
+            with the start time in seconds since the epoch on the first
+            line """
+        with open(path, "w", newline = "") as log_file:
+            writer = csv.writer(log_file)
+            writer.writerow(["started", self.started])
+            writer.writerow(ProfileEvent._fields)
+            writer.writerows(self.log)
+        return
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+
+# Tests of acquisition.Acquirer #
+"""
+
+import time
+from acquisition import Acquirer
+
+
+def test_samples_at_fixed_rate(device):
+    acquirer = Acquirer(device, rate = 20.0, capacity = 100)
+    samples = acquirer.subscribe()
+    acquirer.start()
+    time.sleep(0.5)
+    acquirer.stop()
+    stats = acquirer.stats()
+    assert stats["errors"] == 0
+    assert 5 <= stats["samples"] <= 12
+    assert len(samples) == stats["samples"] == len(acquirer.buffer)
+    times = acquirer.buffer.view()["time"]
+    assert (times[1:] - times[:-1]).min() > 0.02
+    timestamp, snapshot = samples.popleft()
+    assert timestamp == times[0]
+    assert snapshot.set_temp == 25.0
+
+
+def test_errors_are_counted(simulator, device):
+    simulator.faults.drop_rate = 1.0
+    device.timeout = 0.05
+    acquirer = Acquirer(device, rate = 10.0)
+    acquirer.start()
+    time.sleep(0.3)
+    acquirer.stop()
+    assert acquirer.errors > 0
+    assert acquirer.samples == 0
+    assert "TimeoutError" in acquirer.stats()["last_error"]
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+
+# Tests of async_interface.AsyncArroyo #
+"""
+
+import asyncio
+import pytest
+from async_interface import AsyncArroyo, gather_fleet, open_fleet
+from simulator import PtySimulator
+
+
+def test_fleet_reads_concurrently(simulator):
+    async def run():
+        with PtySimulator(seed = 2) as other:
+            devices = await open_fleet([simulator.port, other.port])
+            try:
+                temps = await gather_fleet(devices, "read_temp")
+                snapshot = await devices[0].read_snapshot()
+            finally:
+                for device in devices:
+                    await device.close()
+        return(temps, snapshot)
+    temps, snapshot = asyncio.run(run())
+    assert len(temps) == 2
+    assert snapshot.set_temp == 25.0
+
+
+def test_reply_timeout(simulator):
+    async def run():
+        device = await AsyncArroyo(simulator.port).open()
+        try:
+            simulator.faults.drop_rate = 1.0
+            with pytest.raises(TimeoutError):
+                await device.write_command("TEC:T?", timeout = 0.1)
+        finally:
+            await device.close()
+    asyncio.run(run())
+
+
+def test_autotune_waits_for_result(simulator):
+    async def run():
+        device = await AsyncArroyo(simulator.port).open()
+        try:
+            return(await device.autotune(25.0, wait = True, timeout = 10.0))
+        finally:
+            await device.close()
+    assert asyncio.run(run()).value == 3
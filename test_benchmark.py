@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+
+# Tests of benchmark #
+"""
+
+import sys
+import pytest
+from benchmark import compare, run, save
+from simulator import Faults
+
+
+@pytest.mark.skipif(sys.platform.startswith("win"),
+                    reason = "PtySimulator needs a pseudo-terminal")
+def test_run_and_compare(tmp_path):
+    lines = []
+    results = run(count = 5, devices = 2, faults = Faults(baudrate = None),
+                  report = lines.append)
+    assert len(lines) == len(results)
+    assert results["poll_fleet"]["devices"] == 2
+    # One exchange per snapshot, against one per reading unbatched
+    assert results["poll_snapshot"]["bytes_out_per_call"] < \
+        results["poll_unbatched"]["bytes_out_per_call"]
+    path = str(tmp_path / "results.json")
+    save(results, path, {"count": 5})
+    assert compare(results, path) == []
+    slower = {name: dict(result, p50_ms = 2 * result["p50_ms"])
+              for name, result in results.items()}
+    assert len(compare(slower, path)) == len(results)
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+
+# Tests of data_logger.ChunkLogger #
+"""
+
+import os
+import time
+import numpy as np
+from data_logger import (CHUNK_HEADER, ChunkLogger, export_csv, iter_chunks,
+                         read_log)
+from telemetry import SAMPLE_DTYPE
+
+
+def samples(count, start = 1.7e9):
+    data = np.zeros(count, dtype = SAMPLE_DTYPE)
+    data["time"] = start + np.arange(count)
+    for i, name in enumerate(SAMPLE_DTYPE.names[1:]):
+        data[name] = np.sin(np.arange(count) + i)
+    return(data)
+
+
+def test_round_trip_in_chunks(tmp_path):
+    data = samples(250)
+    with ChunkLogger(str(tmp_path), chunk_rows = 100,
+                     flush_interval = None) as logger:
+        for row in data[:120]:
+            logger.append(*row)
+        logger.extend(data[120:])
+    assert [len(chunk) for chunk in iter_chunks(logger.paths[0])] == \
+        [100, 100, 50]
+    assert np.array_equal(read_log(logger.paths), data)
+    csv_path = str(tmp_path / "log.csv")
+    assert export_csv(logger.paths, csv_path) == 250
+    with open(csv_path) as csv_file:
+        assert len(csv_file.readlines()) == 251
+
+
+def test_truncated_final_chunk_is_skipped(tmp_path):
+    with ChunkLogger(str(tmp_path), chunk_rows = 100,
+                     flush_interval = None) as logger:
+        logger.extend(samples(200))
+    path = logger.paths[0]
+    size = os.path.getsize(path)
+    with open(path, "r+b") as log_file:
+        log_file.truncate(size - 10)
+    assert len(read_log(path)) == 100
+
+
+def test_corrupt_final_chunk_is_skipped(tmp_path):
+    with ChunkLogger(str(tmp_path), chunk_rows = 100,
+                     flush_interval = None) as logger:
+        logger.extend(samples(200))
+    path = logger.paths[0]
+    payload = 100 * SAMPLE_DTYPE.itemsize
+    with open(path, "r+b") as log_file:
+        log_file.seek(os.path.getsize(path) - payload // 2)
+        log_file.write(b"\xff" * 8)
+    assert np.array_equal(read_log(path), samples(100))
+
+
+def test_rotation_by_size(tmp_path):
+    chunk = CHUNK_HEADER.size + 10 * SAMPLE_DTYPE.itemsize
+    with ChunkLogger(str(tmp_path), chunk_rows = 10, flush_interval = None,
+                     max_bytes = 2 * chunk) as logger:
+        logger.extend(samples(100))
+    assert len(logger.paths) > 1
+    assert len(read_log(logger.paths)) == 100
+
+
+def test_timed_flush_without_new_samples(tmp_path):
+    logger = ChunkLogger(str(tmp_path), chunk_rows = 100,
+                         flush_interval = 0.1)
+    try:
+        logger.append(*samples(1)[0])
+        deadline = time.monotonic() + 5.0
+        while not logger.paths and time.monotonic() < deadline:
+            time.sleep(0.02)
+        assert len(read_log(logger.paths)) == 1
+    finally:
+        logger.close()
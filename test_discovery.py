@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+
+# Tests of discovery #
+"""
+
+import threading
+from discovery import DeviceCache, firmware_major, matches, parse_identity
+
+
+def test_parse_identity_styles():
+    identity = parse_identity("Arroyo 585-05-12 TECPak v3.1 SN 12345\r\n")
+    assert identity["model"] == "585-05-12"
+    assert identity["firmware"] == "3.1"
+    assert identity["serial_number"] == "12345"
+    identity = parse_identity("Arroyo,5310,67890,2.4")
+    assert identity["model"] == "5310"
+    assert identity["serial_number"] == "67890"
+    assert firmware_major(identity["firmware"]) == 2
+    assert firmware_major(None) is None
+    assert matches(identity, serial_number = 67890, model = "5310")
+    assert not matches(identity, model = "586")
+
+
+def test_cache_updates_from_many_threads(tmp_path):
+    path = str(tmp_path / "devices.json")
+    def update(port):
+        cache = DeviceCache(path)
+        for i in range(20):
+            cache.update({"port": port, "serial_number": port,
+                          "count": i})
+    threads = [threading.Thread(target = update, args = ("COM" + str(i),))
+               for i in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    cache = DeviceCache(path)
+    assert len(cache.records) == 6
+    assert cache.find(serial_number = "COM3")["count"] == 19
+    assert [p.name for p in tmp_path.iterdir() if p.suffix == ".tmp"] == []
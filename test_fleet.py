@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+
+# Tests of fleet.ArroyoFleet #
+"""
+
+from fleet import ArroyoFleet
+from simulator import PtySimulator
+
+
+def test_fleet_polls_every_device(simulator):
+    with PtySimulator(seed = 2, serial_number = "100002") as other:
+        ports = [simulator.port, other.port, "/dev/arroyo-missing"]
+        fleet = ArroyoFleet(ports, cache = None)
+        try:
+            assert len(fleet) == 2
+            assert list(fleet.failed) == ["/dev/arroyo-missing"]
+            results = fleet.configure([("set_temp", (23.0,))])
+            assert set(results) == {simulator.port, other.port}
+            samples = list(fleet.stream(0.05, count = 3))
+            assert len(samples) == 3
+            for timestamp, snapshots in samples:
+                assert [s.set_temp for s in snapshots.values()] == \
+                    [23.0, 23.0]
+            serials = fleet.call("query_many", ["*IDN?"])
+            assert "SN 100002" in serials[other.port][0]
+        finally:
+            fleet.close()
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+
+# Tests of instrumentation.Instrumentation #
+"""
+
+import json
+import pytest
+from instrumentation import Instrumentation, LatencyHistogram, command_key
+from serial_interface import arroyo
+
+
+def test_command_key_drops_values():
+    assert command_key("TEC:T 25.0; tec:set:t?") == "TEC:T;TEC:SET:T?"
+
+
+def test_histogram_percentiles():
+    histogram = LatencyHistogram()
+    for duration in [0.001] * 90 + [0.1] * 10:
+        histogram.add(duration)
+    summary = histogram.summary()
+    assert summary["count"] == 100
+    assert summary["total_s"] == pytest.approx(1.09)
+    assert summary["p50_ms"] <= 1.0 + 1e-9
+    assert summary["p99_ms"] > 50.0
+
+
+def test_exchanges_and_failures_are_counted(simulator, tmp_path):
+    metrics = Instrumentation(labels = {"unit": "test"})
+    seen = []
+    metrics.add_post_hook(lambda command, response, elapsed, error:
+                          seen.append(command))
+    device = arroyo(simulator.port, cache = None, instrumentation = metrics)
+    try:
+        device.read_snapshot()
+        simulator.faults.drop_rate = 1.0
+        for _ in range(2):
+            with pytest.raises(TimeoutError):
+                device.write_command("TEC:T?", timeout = 0.05)
+    finally:
+        device.close()
+    counters = metrics.snapshot()["counters"]
+    assert counters["timeouts"] == 2
+    assert counters["retries"] == 1
+    assert metrics.snapshot()["commands"]["TEC:T?"]["failures"] == 2
+    assert "TEC:T?" in seen
+    path = str(tmp_path / "metrics" / "arroyo.json")
+    metrics.export_json(path)
+    with open(path) as metrics_file:
+        assert json.load(metrics_file)["labels"] == {"unit": "test"}
+    text = metrics.export_prometheus()
+    assert 'unit="test"' in text
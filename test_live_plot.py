@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+
+# Tests of the decimation of live_plot #
+"""
+
+import numpy as np
+from live_plot import MinMaxDecimator, decimate_minmax
+
+
+def test_decimate_minmax_keeps_extremes():
+    x = np.arange(10000, dtype = float)
+    y = np.sin(x / 100.0)
+    y[1234] = 5.0
+    y[8765] = -5.0
+    out_x, out_y = decimate_minmax(x, y, 100)
+    assert len(out_x) == len(out_y) == 200
+    assert out_y.max() == 5.0 and out_y.min() == -5.0
+    assert np.all(np.diff(out_x) >= 0)
+    small_x, small_y = decimate_minmax(x[:150], y[:150], 100)
+    assert np.array_equal(small_y, y[:150])
+
+
+def test_min_max_decimator_matches_brute_force():
+    generator = np.random.default_rng(4)
+    times = np.sort(generator.uniform(0, 500, size = 5000))
+    values = generator.normal(size = 5000)
+    decimator = MinMaxDecimator(window = 100.0, bins = 50)
+    for first in range(0, len(times), 97):
+        decimator.add(times[first:first + 97], values[first:first + 97])
+    x, y = decimator.data()
+    newest = int(times[-1] // 2.0)
+    for index in range(newest - 49, newest + 1):
+        inside = (times >= index * 2.0) & (times < (index + 1) * 2.0)
+        found = np.flatnonzero(x == (index + 0.5) * 2.0)
+        if not inside.any():
+            assert not len(found)
+            continue
+        assert y[found[0]] == values[inside].min()
+        assert y[found[1]] == values[inside].max()
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+
+# Tests of log_reader #
+"""
+
+from datetime import datetime
+import numpy as np
+from data_logger import ChunkLogger
+from log_reader import ChunkLogReader, CsvLogReader, iter_logs
+from telemetry import SAMPLE_DTYPE
+
+
+def test_chunk_reader_seeks_time_range(tmp_path):
+    data = np.zeros(1000, dtype = SAMPLE_DTYPE)
+    data["time"] = 1.7e9 + np.arange(1000)
+    data["temperature"] = np.arange(1000)
+    with ChunkLogger(str(tmp_path), chunk_rows = 64,
+                     flush_interval = None) as logger:
+        logger.extend(data)
+    reader = ChunkLogReader(logger.paths[0])
+    try:
+        assert len(reader) == 1000
+        assert reader.time_range() == (1.7e9, 1.7e9 + 999)
+        rows = np.concatenate(list(reader.iter_chunks(1.7e9 + 100,
+                                                      1.7e9 + 300)))
+        assert np.array_equal(rows, data[100:300])
+    finally:
+        reader.close()
+    rows = np.concatenate(list(iter_logs(logger.paths, 1.7e9 + 990)))
+    assert np.array_equal(rows, data[990:])
+
+
+def test_csv_reader_skips_malformed_rows(tmp_path):
+    path = tmp_path / "log.csv"
+    start = datetime(2026, 1, 1).timestamp()
+    with open(str(path), "w") as csv_file:
+        csv_file.write("Timestamp,Target,Temperature,Current,Voltage," +
+                       "Power\n")
+        for i in range(500):
+            if i in (100, 200):
+                csv_file.write("garbage,1,2,3,4,5\n")
+            elif i == 300:
+                csv_file.write(str(datetime.fromtimestamp(start + i)) +
+                               ",1,x,3,4,5\n")
+            else:
+                csv_file.write(str(datetime.fromtimestamp(start + i)) +
+                               "," + str(i) + ",2,3,4,5\n")
+    reader = CsvLogReader(str(path), chunk_rows = 64)
+    try:
+        rows = np.concatenate(list(reader.iter_chunks()))
+        assert len(rows) == 497
+        assert reader.time_range() == (start, start + 499)
+        rows = np.concatenate(list(reader.iter_chunks(start + 250,
+                                                      start + 350)))
+        assert len(rows) == 99
+        assert rows["target"][0] == 250
+    finally:
+        reader.close()
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+
+# Tests of monitor.ConditionMonitor #
+Uses a stub device whose detail read can be made to time out.
+"""
+
+from monitor import ConditionMonitor, DETAILS
+from serial_interface import COND_OUTPUT_ON, COND_T_HIGH
+
+
+
+class StubDevice(object):
+    """ Device with a settable condition register and failing reads """
+
+
+    def __init__(self, condition = 0):
+        self.condition = condition
+        self.failures = 0
+
+
+    def read_condition(self):
+        return(self.condition)
+
+
+    def query_many(self, queries):
+        if self.failures:
+            self.failures -= 1
+            raise TimeoutError("No complete reply")
+        return([0.0] * len(DETAILS))
+
+
+def test_change_survives_failed_detail_read():
+    device = StubDevice(COND_OUTPUT_ON)
+    monitor = ConditionMonitor(device)
+    raised = []
+    monitor.on("output_off", lambda event, state: raised.append(event))
+    monitor.on("temperature_high", lambda event, state: raised.append(event))
+    monitor.poll()
+    device.condition = COND_T_HIGH
+    device.failures = 1
+    try:
+        monitor.poll()
+    except TimeoutError:
+        pass
+    assert raised == []
+    assert monitor.poll() == ["temperature_high", "output_off"]
+    assert raised == ["temperature_high", "output_off"]
+    assert monitor.events == 2
+    assert monitor.state["condition"] == COND_T_HIGH
+
+
+def test_failed_first_detail_read():
+    device = StubDevice(COND_OUTPUT_ON)
+    monitor = ConditionMonitor(device, refresh = 5.0)
+    device.failures = 1
+    try:
+        monitor.poll()
+    except TimeoutError:
+        pass
+    assert monitor.condition is None
+    assert monitor.poll() == []
+    assert monitor.refreshes == 1
+    assert monitor.condition == COND_OUTPUT_ON
+    assert monitor.poll() == []
+
+
+def test_refresh_without_earlier_detail_read():
+    device = StubDevice(COND_OUTPUT_ON)
+    monitor = ConditionMonitor(device, refresh = 0.0)
+    monitor.condition = COND_OUTPUT_ON
+    assert monitor.poll() == []
+    assert monitor.refreshes == 1
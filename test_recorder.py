@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+
+# Tests of recorder #
+A session with the simulator is recorded, then replayed without it.
+"""
+
+import pytest
+from recorder import Recorder, Replayer, read_trace
+from serial_interface import arroyo
+
+
+def test_record_and_replay(simulator, tmp_path):
+    path = str(tmp_path / "session.atrace")
+    device = arroyo(simulator.port, cache = None,
+                    transport = Recorder(path))
+    snapshot = device.read_snapshot()
+    pid = device.read_PID()
+    device.close()
+    header, events = read_trace(path)
+    assert header["port"] == simulator.port
+    assert events
+    lines = simulator.lines
+    device = arroyo(simulator.port, cache = None,
+                    transport = Replayer(path, speed = None, strict = True))
+    try:
+        assert device.read_snapshot() == snapshot
+        assert device.read_PID() == pid
+        assert not device.ser.mismatches
+    finally:
+        device.close()
+    assert simulator.lines == lines
+
+
+def test_strict_replay_rejects_other_commands(simulator, tmp_path):
+    path = str(tmp_path / "session.atrace")
+    device = arroyo(simulator.port, cache = None,
+                    transport = Recorder(path))
+    device.read_temp()
+    device.close()
+    device = arroyo(simulator.port, cache = None,
+                    transport = Replayer(path, speed = None, strict = True))
+    try:
+        with pytest.raises(ValueError):
+            device.read_PID()
+    finally:
+        device.close()
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+
+# Tests of rollup.Rollup #
+Summaries are checked against NumPy over the raw samples of each bucket.
+"""
+
+import numpy as np
+from data_logger import iter_chunks, read_log
+from rollup import COLUMNS, Rollup, combine
+from telemetry import SAMPLE_DTYPE
+
+
+def samples(count, rate = 2.0, start = 1.7e9):
+    generator = np.random.default_rng(1)
+    data = np.zeros(count, dtype = SAMPLE_DTYPE)
+    data["time"] = start + np.arange(count) / rate
+    for name in COLUMNS:
+        data[name] = 1e4 + generator.normal(size = count)
+    return(data)
+
+
+def test_combine_matches_numpy():
+    generator = np.random.default_rng(2)
+    values = generator.normal(1e6, 1.0, size = 60)
+    groups = np.repeat([3, 4, 7], [10, 30, 20])
+    # Partial summaries of blocks of 5 samples
+    blocks = values.reshape(-1, 5)
+    index = groups[::5]
+    count = np.full(len(blocks), 5.0)
+    mean = blocks.mean(axis = 1)[:, None]
+    m2 = ((blocks - mean)**2).sum(axis = 1)[:, None]
+    low = blocks.min(axis = 1)[:, None]
+    high = blocks.max(axis = 1)[:, None]
+    index, count, mean, m2, low, high = combine(index, count, mean, m2,
+                                                low, high)
+    assert list(index) == [3, 4, 7]
+    for i, group in enumerate([3, 4, 7]):
+        raw = values[groups == group]
+        assert count[i] == len(raw)
+        assert abs(mean[i, 0] - raw.mean()) < 1e-9
+        assert abs(m2[i, 0] - ((raw - raw.mean())**2).sum()) < 1e-6
+        assert low[i, 0] == raw.min() and high[i, 0] == raw.max()
+
+
+def test_tiers_match_numpy():
+    data = samples(2 * 3600)
+    rollup = Rollup(tiers = ((1, 4000), (60, 100), (600, 10)))
+    for first in range(0, len(data), 37):
+        rollup.add_array(data[first:first + 37])
+    for width in (1, 60, 600):
+        rows = rollup.tier(width).buckets.view()
+        assert len(rows)
+        for row in rows[[0, len(rows) // 2, -1]]:
+            raw = data[(data["time"] >= row["time"]) &
+                       (data["time"] < row["time"] + width)]
+            assert row["count"] == len(raw)
+            for name in COLUMNS:
+                assert abs(row[name + "_mean"] - raw[name].mean()) < 1e-9
+                assert abs(row[name + "_std"] - raw[name].std()) < 1e-9
+                assert row[name + "_min"] == raw[name].min()
+                assert row[name + "_max"] == raw[name].max()
+
+
+def test_query_picks_tier_by_resolution():
+    rollup = Rollup(tiers = ((1, 4000), (60, 100)))
+    # Starts on a bucket boundary of both tiers
+    data = samples(3600, rate = 1.0, start = 1699999200.0)
+    rollup.add_array(data)
+    start = data["time"][0]
+    width, rows = rollup.query(start, start + 1800, resolution = 300)
+    assert width == 60
+    assert len(rows) == 30
+    width, rows = rollup.query(start, start + 100, resolution = 1)
+    assert width == 1
+    assert len(rows) == 100
+
+
+def test_logs_closed_buckets_in_chunks(tmp_path):
+    rollup = Rollup(tiers = ((1, 100), (60, 10)), directory = str(tmp_path))
+    data = samples(1300, rate = 1.0)
+    for row in data:
+        rollup.add_array(row[None])
+    # The ring buffer keeps only its capacity, the log keeps every bucket
+    assert len(rollup.tier(1).buckets) == 100
+    rollup.close()
+    logged = rollup.tier(1).logger.paths
+    assert [len(c) for p in logged for c in iter_chunks(p)] == [600, 600, 99]
+    assert len(read_log(logged)) == 1299
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+
+# Tests of scheduler.CommandScheduler #
+"""
+
+import queue
+import threading
+import time
+import pytest
+from scheduler import (CONFIG, CONTROL, SAFETY, TELEMETRY, CommandScheduler,
+                       classify)
+
+
+class SlowDevice(object):
+    """ Device taking delay seconds per line, recording the order """
+
+
+    def __init__(self, delay = 0.05):
+        self.delay = delay
+        self.timeout = 1.0
+        self.lines = []
+
+
+    def write_command(self, command, timeout = None):
+        time.sleep(self.delay)
+        self.lines.append(command)
+        return("25.0" if "?" in command else "")
+
+
+def test_classify():
+    assert classify("TEC:OUT 0") == SAFETY
+    assert classify("TEC:T 25;TEC:OUT 0") == SAFETY
+    assert classify("TEC:T?;TEC:ITE?") == TELEMETRY
+    assert classify("TEC:T 25") == CONTROL
+    assert classify("TEC:PID?") == CONFIG
+
+
+def test_safety_overtakes_queued_telemetry():
+    device = SlowDevice()
+    with CommandScheduler(device) as scheduler:
+        threads = [threading.Thread(target = device.write_command,
+                                    args = ("TEC:T?;TEC:ITE?" +
+                                            ";TEC:V?" * i,))
+                   for i in range(5)]
+        for thread in threads:
+            thread.start()
+            time.sleep(0.005)
+        device.write_command("TEC:OUT 0")
+        for thread in threads:
+            thread.join()
+    # Only the line already being sent goes before the safety command
+    assert device.lines.index("TEC:OUT 0") <= 1
+    assert scheduler.max_wait[SAFETY] <= scheduler.safety_bound() + 0.05
+    assert device.write_command != scheduler.write_command
+
+
+def test_full_queue_evicts_lower_priority():
+    device = SlowDevice(delay = 0.2)
+    scheduler = CommandScheduler(device, depth = 1)
+    errors = []
+    def send(command):
+        try:
+            device.write_command(command)
+        except queue.Full as error:
+            errors.append(error)
+    try:
+        busy = threading.Thread(target = send, args = ("TEC:PID?",))
+        busy.start()
+        time.sleep(0.05)
+        queued = threading.Thread(target = send, args = ("TEC:T?",))
+        queued.start()
+        time.sleep(0.05)
+        send("TEC:T 25")
+        for thread in (busy, queued):
+            thread.join()
+    finally:
+        scheduler.close()
+    assert len(errors) == 1
+    assert scheduler.stats["evicted"] == 1
+    assert "TEC:T?" not in device.lines
+
+
+def test_closed_scheduler_refuses_lines():
+    device = SlowDevice(delay = 0)
+    scheduler = CommandScheduler(device)
+    write_command = scheduler.write_command
+    scheduler.close()
+    with pytest.raises(ValueError):
+        write_command("TEC:T?")
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+
+# Tests of serial_interface.arroyo #
+Runs against a simulated controller on a pseudo-terminal, see conftest.py.
+"""
+
+import json
+import pytest
+from discovery import DeviceCache, UnsupportedCommand
+from serial_interface import Snapshot, arroyo
+from simulator import PtySimulator
+
+
+def test_read_snapshot_is_one_exchange(simulator, device):
+    lines = simulator.lines
+    snapshot = device.read_snapshot()
+    assert simulator.lines == lines + 1
+    assert isinstance(snapshot, Snapshot)
+    assert snapshot.set_temp == 25.0
+    assert snapshot.power == pytest.approx(snapshot.current *
+                                           snapshot.voltage)
+
+
+def test_query_many_parses_each_reply(simulator, device):
+    lines = simulator.lines
+    mode, tolerance, pid = device.query_many(["TEC:MODE?", "TEC:TOL?",
+                                              "TEC:PID?"])
+    assert simulator.lines == lines + 1
+    assert mode == "T"
+    assert tolerance == (0.1, 10.0)
+    assert pid == (10.0, 0.1, 0.0)
+
+
+def test_missing_reply_times_out(simulator, device):
+    simulator.faults.drop_rate = 1.0
+    with pytest.raises(TimeoutError):
+        device.write_command("TEC:T?", timeout = 0.1)
+
+
+def test_unsupported_command_is_refused():
+    with PtySimulator(firmware = "2.4") as simulator:
+        device = arroyo(simulator.port, cache = None)
+        try:
+            lines = simulator.lines
+            with pytest.raises(UnsupportedCommand):
+                device.set_voltage_limit(5.0)
+            assert simulator.lines == lines
+        finally:
+            device.close()
+
+
+def test_discovery_cache_finds_serial_number(simulator, tmp_path):
+    path = str(tmp_path / "devices.json")
+    arroyo(simulator.port, cache = path).close()
+    record = DeviceCache(path).get(simulator.port)
+    assert record["serial_number"] == "100001"
+    device = arroyo(serial_number = "100001", cache = path)
+    try:
+        assert device.port == simulator.port
+    finally:
+        device.close()
+
+
+def test_shadow_cache_serves_reads_until_front_panel_change(simulator):
+    device = arroyo(simulator.port, cache = None, shadow = True,
+                    shadow_interval = 60.0)
+    try:
+        lines = simulator.lines
+        assert device.read_PID() == (10.0, 0.1, 0.0)
+        assert simulator.lines == lines
+        simulator.device.front_panel("TEC:PID 32, 0.031, 0")
+        # The snapshot reads the event status register as well
+        device.read_snapshot()
+        assert device.read_PID() == (32.0, 0.031, 0.0)
+    finally:
+        device.close()
+
+
+def test_apply_config_is_idempotent(simulator, device, tmp_path):
+    config = {"mode": "T", "current_limit": 3.5, "tolerance": [0.5, 1],
+              "PID": [32, 0.031, 0], "temp": 23.0}
+    path = str(tmp_path / "config.json")
+    with open(path, "w") as config_file:
+        json.dump(config, config_file)
+    first = device.apply_config(path)
+    assert set(first.changed) == {"current_limit", "tolerance", "PID",
+                                  "temp"}
+    assert not first.failed
+    lines = simulator.lines
+    second = device.apply_config(config)
+    assert second.changed == {}
+    assert sorted(second.unchanged) == sorted(config)
+    assert simulator.lines == lines + 1
+
+
+def test_apply_config_rejects_unknown_settings(device):
+    with pytest.raises(ValueError):
+        device.apply_config({"colour": "blue"})
+
+
+def test_autotune_waits_for_result(device):
+    with pytest.raises(ValueError):
+        device.autotune(25.0, background = True)
+    result = device.autotune(25.0, wait = True, timeout = 10.0)
+    assert result.value == 3
+    # A second run waits for its own result, not the first one's
+    assert device.autotune(25.0, wait = True, timeout = 10.0).elapsed >= 0.4
+
+
+def test_wait_until_stable(simulator, device):
+    ambient = simulator.device.plant.temperature
+    device.set_tolerance(0.5, 0.1)
+    device.set_temp(round(ambient, 2))
+    device.set_output(1)
+    result = device.wait_until_stable(timeout = 10.0)
+    assert abs(result.value - ambient) <= 0.5
+    future = device.wait_until_stable(timeout = 10.0, background = True)
+    assert abs(future.result().value - ambient) <= 0.5
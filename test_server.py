@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+
+# Tests of server.ArroyoServer #
+"""
+
+import threading
+import time
+from serial_interface import arroyo
+from server import ERROR_REPLY, ArroyoServer
+
+
+class SlowDevice(object):
+    """ Device whose queries take delay seconds, failing when failing """
+
+
+    def __init__(self, delay = 0.1):
+        self.delay = delay
+        self.failing = False
+        self.lines = []
+        self.port = "slow"
+
+
+    def write_command(self, line, timeout = None):
+        self.lines.append(line)
+        time.sleep(self.delay)
+        if self.failing:
+            raise OSError("Device disconnected")
+        return("25.0" if "?" in line else "")
+
+
+    def close(self):
+        pass
+
+
+def test_clients_share_the_controller(simulator):
+    with ArroyoServer(arroyo(simulator.port, cache = None), port = 0,
+                      ttl = 0.5) as server:
+        first = arroyo(server.address, cache = None)
+        second = arroyo(server.address, cache = None)
+        try:
+            assert first.read_mode() == second.read_mode() == "T"
+            assert server.stats["cache_hits"] >= 1
+            first.set_temp(23.0)
+            assert second.read_set_temp() == 23.0
+        finally:
+            first.close()
+            second.close()
+
+
+def test_identical_queries_are_coalesced():
+    device = SlowDevice()
+    with ArroyoServer(device, port = 0, ttl = 0) as server:
+        replies = []
+        threads = [threading.Thread(target = lambda:
+                                    replies.append(server.request("TEC:T?")))
+                   for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    assert replies == ["25.0"] * 5
+    assert len(device.lines) < 5
+    assert server.stats["coalesced"] == 5 - len(device.lines)
+
+
+def test_lost_controller_answers_every_waiting_client():
+    device = SlowDevice()
+    device.failing = True
+    with ArroyoServer(device, port = 0, ttl = 1.0) as server:
+        replies = []
+        threads = [threading.Thread(target = lambda:
+                                    replies.append(server.request("TEC:T?")))
+                   for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5.0)
+        assert replies == [ERROR_REPLY] * 3
+        # An error reply is never kept
+        device.failing = False
+        assert server.request("TEC:T?") == "25.0"
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+
+# Tests of simulator #
+"""
+
+import pytest
+from simulator import (ESR_COMMAND_ERROR, ESR_POWER_ON, Faults,
+                       SimulatedArroyo)
+from serial_interface import COND_OUTPUT_ON, COND_T_HIGH
+
+
+class Clock(object):
+    """ Clock advanced by hand """
+
+
+    def __init__(self):
+        self.now = 0.0
+
+
+    def __call__(self):
+        return(self.now)
+
+
+def test_plant_follows_set_point():
+    clock = Clock()
+    device = SimulatedArroyo(noise = 0.0, clock = clock)
+    ambient = float(device.handle("TEC:T?"))
+    device.handle("TEC:T 30.0;TEC:OUT 1")
+    for _ in range(3000):
+        clock.now += 0.1
+        device.handle("TEC:COND?")
+    assert float(device.handle("TEC:T?")) == pytest.approx(30.0, abs = 0.05)
+    assert float(device.handle("TEC:T?")) != ambient
+    assert int(device.handle("TEC:COND?")) & COND_OUTPUT_ON
+
+
+def test_temperature_limit_switches_output_off():
+    clock = Clock()
+    device = SimulatedArroyo(noise = 0.0, clock = clock)
+    device.handle("TEC:LIM:THI 24.0;TEC:T 30.0;TEC:OUT 1")
+    for _ in range(3000):
+        clock.now += 0.1
+        if int(device.handle("TEC:COND?")) & COND_T_HIGH:
+            break
+    assert device.handle("TEC:OUT?") == "0"
+
+
+def test_chained_queries_and_errors():
+    device = SimulatedArroyo()
+    assert device.handle("TEC:MODE?;TEC:TOL?") == "T;0.1,10.0"
+    assert int(device.handle("*ESR?")) == ESR_POWER_ON
+    assert device.handle("TEC:NOPE?") is None
+    assert int(device.handle("*ESR?")) == ESR_COMMAND_ERROR
+    assert int(device.handle("*ESR?")) == 0
+
+
+def test_faults_drop_and_delay():
+    faults = Faults(latency = 0.01, drop_rate = 1.0, baudrate = None,
+                    seed = 1)
+    delay, data = faults.apply("TEC:T?", "25.0")
+    assert delay == pytest.approx(0.01)
+    assert data is None
+    assert faults.dropped == 1
+    faults = Faults(baudrate = 10000)
+    delay, data = faults.apply("TEC:T?", "25.0")
+    assert data == b"25.0\r\n"
+    assert delay == pytest.approx((6 + 2 + 6) * 10.0 / 10000)
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+
+# Tests of stability #
+The incremental results are checked against a brute force computation over
+the samples in the window, after the window has slid.
+"""
+
+import numpy as np
+from stability import AllanDeviation, RollingStats, Stability, WelchPSD
+
+
+def values(count):
+    generator = np.random.default_rng(3)
+    return(25.0 + np.cumsum(generator.normal(0, 1e-3, size = count)) +
+           generator.normal(0, 1e-2, size = count))
+
+
+def allan(window, factor):
+    """ Overlapping Allan deviation by averaging every pair of adjacent
+        factor sample blocks """
+    averages = np.convolve(window, np.ones(factor) / factor, mode = "valid")
+    differences = averages[factor:] - averages[:-factor]
+    return(np.sqrt((differences**2).mean() / 2))
+
+
+def test_allan_deviation_matches_brute_force():
+    data = values(1500)
+    deviation = AllanDeviation(rate = 2.0, window = 400)
+    for first in range(0, len(data), 23):
+        deviation.add(np.arange(first, min(first + 23, len(data))),
+                      data[first:first + 23])
+    taus, adev = deviation.deviation()
+    assert list(taus) == list(deviation.factors / 2.0)
+    for factor, value in zip(deviation.factors, adev):
+        assert abs(value - allan(data[-400:], factor)) < 1e-12
+
+
+def test_rolling_stats_match_numpy():
+    data = values(1000)
+    stats = RollingStats(window = 300, block = 16)
+    for first in range(0, len(data), 7):
+        stats.add(np.arange(first, min(first + 7, len(data))),
+                  data[first:first + 7])
+    result = stats.stats()
+    window = data[-300:]
+    assert result["count"] == 300
+    assert abs(result["mean"] - window.mean()) < 1e-12
+    assert abs(result["std"] - window.std()) < 1e-9
+    assert result["min"] == window.min() and result["max"] == window.max()
+
+
+def test_welch_psd_matches_brute_force():
+    data = values(3000)
+    psd = WelchPSD(rate = 1.0, window = 1024, nperseg = 256)
+    for first in range(0, len(data), 100):
+        psd.add(np.arange(first, min(first + 100, len(data))),
+                data[first:first + 100])
+    frequencies, density = psd.density()
+    starts = np.arange(0, len(data) - 256 + 1, 128)[-psd.spectra.capacity:]
+    taper = np.hanning(256)
+    segments = np.array([data[s:s + 256] - data[s:s + 256].mean()
+                         for s in starts])
+    power = np.abs(np.fft.rfft(segments * taper, axis = 1))**2 * 2.0 / \
+        (taper**2).sum()
+    power[:, 0] /= 2
+    power[:, -1] /= 2
+    assert np.allclose(density, power.mean(axis = 0), rtol = 1e-9,
+                       atol = 0)
+
+
+def test_stability_report():
+    stability = Stability(rate = 1.0, window = 600, nperseg = 128)
+    stability.add_values(np.arange(1000), values(1000))
+    report = stability.report()
+    assert report["count"] == 600
+    assert not np.isnan(report["adev"]).any()
+    assert len(report["freqs"]) == 65
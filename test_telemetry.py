@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+
+# Tests of telemetry.TelemetryBuffer and shared_telemetry #
+"""
+
+import numpy as np
+import pytest
+from shared_telemetry import SharedTelemetryBuffer, SharedTelemetryReader
+from telemetry import SAMPLE_DTYPE, TelemetryBuffer
+
+
+def samples(count, start = 0):
+    data = np.zeros(count, dtype = SAMPLE_DTYPE)
+    data["time"] = start + np.arange(count)
+    data["temperature"] = 20.0 + np.arange(count)
+    return(data)
+
+
+def test_buffer_keeps_latest_samples_in_order():
+    buffer = TelemetryBuffer(10)
+    with pytest.raises(IndexError):
+        buffer.latest()
+    for row in samples(7):
+        buffer.append(*row)
+    buffer.extend(samples(8, start = 7))
+    assert len(buffer) == 10
+    assert buffer.count == 15
+    assert list(buffer.view()["time"]) == list(range(5, 15))
+    assert list(buffer.view(3)["time"]) == [12, 13, 14]
+    assert list(buffer.window(8, 11)["time"]) == [8, 9, 10]
+    assert buffer.latest()["time"] == 14
+    assert not buffer.view().flags.writeable
+
+
+def test_extend_longer_than_capacity():
+    buffer = TelemetryBuffer(4)
+    buffer.extend(samples(11))
+    assert list(buffer.view()["time"]) == [7, 8, 9, 10]
+
+
+def test_shared_buffer_reader_polls_new_samples():
+    name = "arroyo_test_" + str(np.random.default_rng().integers(1e9))
+    with SharedTelemetryBuffer(8, name = name) as buffer:
+        with SharedTelemetryReader(name) as reader:
+            buffer.extend(samples(3))
+            assert list(reader.poll()["time"]) == [0, 1, 2]
+            assert len(reader.poll()) == 0
+            buffer.extend(samples(12, start = 3))
+            polled = reader.poll(copy = True)
+            # Only the latest capacity samples are still held
+            assert list(polled["time"]) == list(range(8, 15))
+            assert reader.missed == 5
+            assert list(reader.view()["time"]) == list(range(7, 15))
+            with pytest.raises(TypeError):
+                reader.clear()
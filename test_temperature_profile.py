@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+
+# Tests of temperature_profile.TemperatureProfile #
+Uses a stub device whose temperature follows the set point a few reads late.
+"""
+
+import pytest
+from serial_interface import COND_OUT_OF_TOLERANCE
+from temperature_profile import TemperatureProfile, ramp, soak, step
+
+
+
+class StubDevice(object):
+    """ Device whose temperature reaches the set point after lag reads of
+        TEC:T?, with a condition register given separately """
+
+
+    def __init__(self, temp = 20.0, lag = 3, condition = 0):
+        self.temp = temp
+        self.set_point = temp
+        self.lag = lag
+        self.condition = condition
+        self.reads = 0
+
+
+    def read_mode(self):
+        return("T")
+
+
+    def read_tolerance(self):
+        return(0.1, 1.0)
+
+
+    def write_command(self, command):
+        header, value = command.split()
+        assert header == "TEC:T"
+        self.set_point = float(value)
+        self.reads = 0
+        return("")
+
+
+    def query_many(self, queries):
+        replies = []
+        for query in queries:
+            if query == "TEC:SET:T?":
+                replies.append(self.set_point)
+            elif query == "TEC:COND?":
+                replies.append(self.condition)
+            elif query == "TEC:T?":
+                self.reads += 1
+                if self.reads > self.lag:
+                    self.temp = self.set_point
+                replies.append(self.temp)
+        return(replies)
+
+
+def test_soak_waits_for_temperature_after_condition_clears():
+    # The out of tolerance bit is already clear when the set point changes
+    device = StubDevice(lag = 3, condition = 0)
+    profile = TemperatureProfile(device, [step(30.0), soak(0.0)],
+                                 gate_interval = 0.01)
+    log = profile.run()
+    settled = [e for e in log if e.kind == "settled"]
+    assert len(settled) == 1
+    assert device.reads == 4
+    assert device.temp == 30.0
+
+
+def test_soak_waits_for_condition_bit():
+    device = StubDevice(lag = 0, condition = COND_OUT_OF_TOLERANCE)
+    profile = TemperatureProfile(device, [step(30.0), soak(0.0)],
+                                 gate_interval = 0.01, settle_timeout = 0.05)
+    with pytest.raises(TimeoutError):
+        profile.run()
+
+
+def test_ramp_rejects_bad_rate_and_duration():
+    with pytest.raises(ValueError):
+        ramp(30.0, rate = 0)
+    with pytest.raises(ValueError):
+        ramp(30.0, duration = -1.0)
+    with pytest.raises(ValueError):
+        ramp(30.0)
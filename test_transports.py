@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+
+# Tests of transports #
+"""
+
+import pytest
+from serial_interface import arroyo
+from simulator import SocketSimulator
+from transports import BAUD_RATES, AutoBaud, SocketTransport, open_transport
+
+
+def test_socket_transport_with_arroyo():
+    with SocketSimulator(seed = 1) as simulator:
+        device = arroyo(simulator.port, cache = None)
+        try:
+            assert isinstance(device.ser, SocketTransport)
+            assert device.identity["serial_number"] == "100001"
+            assert device.query_many(["TEC:MODE?", "TEC:SET:T?"]) == \
+                ["T", 25.0]
+            assert device.ser.fileno() >= 0
+        finally:
+            device.close()
+
+
+def test_socket_transport_reads_in_blocks():
+    with SocketSimulator() as simulator:
+        transport = open_transport(simulator.port, 1.0)
+        try:
+            transport.write(b"TEC:MODE?;TEC:TOL?\r\n")
+            assert transport.read_until(b"\r\n") == b"T;0.1,10.0\r\n"
+            transport.timeout = 0.1
+            assert transport.read_until(b"\r\n") == b""
+            assert transport.in_waiting == 0
+        finally:
+            transport.close()
+
+
+def test_auto_baud_remembers_rate(simulator):
+    transport = AutoBaud(probe_timeout = 0.5)
+    ser = transport(simulator.port, 1.0)
+    ser.close()
+    assert transport.found[simulator.port] == BAUD_RATES[0]
+    device = arroyo(simulator.port, cache = None, transport = transport)
+    try:
+        assert device.read_mode() == "T"
+    finally:
+        device.close()
+
+
+def test_auto_baud_without_reply(simulator):
+    simulator.faults.drop_rate = 1.0
+    with pytest.raises(IOError):
+        AutoBaud(baudrates = (9600,), probe_timeout = 0.1)(simulator.port,
+                                                            1.0)
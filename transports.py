@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+
+# Transports for Arroyo TEC Controllers #
+A transport opens the link to a controller: a function of (port, timeout)
+returning an open object with the serial.Serial methods the interfaces use
+(write, read, read_until, in_waiting, reset_input_buffer, timeout, is_open
+and close). serial_interface.arroyo and async_interface.AsyncArroyo take one
+as transport, open_transport by default, which opens:
+* "tcp://host:port" as a raw TCP socket (SocketTransport), for network
+    attached units, serial to Ethernet bridges in raw mode and
+    simulator.SocketSimulator
+* any other pyserial URL, e.g. "rfc2217://host:port" or "socket://...",
+    with serial.serial_for_url
+* a COM port or device path as a serial port at 38400 baud
+AutoBaud opens serial ports at the fastest baud rate the controller answers.
+
+Example:
+    TECpak586 = arroyo("tcp://192.168.1.20:10001")
+    TECpak586 = arroyo("COM3", transport = AutoBaud())
+"""
+
+import select
+import serial
+import socket
+from time import monotonic
+from urllib.parse import urlsplit
+
+
+# Baud rates tried by AutoBaud, fastest first. 38400 is the factory setting.
+BAUD_RATES = (115200, 57600, 38400, 19200, 9600)
+
+
+def open_serial(port, timeout, baudrate = 38400):
+    """ Opens a serial port, or pyserial URL, with the controller's settings,
+        8N1, reads timing out after timeout seconds """
+    ser = serial.serial_for_url(port,
+                                baudrate = baudrate,
+                                parity =   serial.PARITY_NONE,
+                                stopbits = serial.STOPBITS_ONE,
+                                bytesize = serial.EIGHTBITS,
+                                timeout =  timeout,
+                                write_timeout = 0)
+    return(ser)
+
+
+def open_transport(port, timeout):
+    """ Opens port as a TCP socket, pyserial URL or serial port, see the
+        module description """
+    if str(port).lower().startswith("tcp://"):
+        address = urlsplit(port)
+        return(SocketTransport(address.hostname, address.port, timeout))
+    return(open_serial(port, timeout))
+
+
+
+class SocketTransport(object):
+    """ serial.Serial like object on a raw TCP connection
+        Replies are received in blocks and split at the terminator here,
+        rather than one byte per call as pyserial's socket:// read_until
+        does, and Nagle's algorithm is turned off so short commands go out
+        at once. """
+
+
+    def __init__(self, host, port, timeout = 1.0, connect_timeout = 5.0):
+        """ Connects to host:port, reads time out after timeout seconds, or
+            never when None, and return at once when 0 """
+        self.port = str(host) + ":" + str(port)
+        self.timeout = timeout
+        self._socket = socket.create_connection((host, port),
+                                                connect_timeout)
+        self._socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._socket.setblocking(False)
+        self._buffer = b""
+        self.is_open = True
+
+
+    def _receive(self, wait):
+        """ Adds what arrives within wait seconds (None blocks) to the
+            buffer, returning whether anything arrived """
+        readable, _, _ = select.select([self._socket], [], [], wait)
+        if not readable:
+            return(False)
+        data = self._socket.recv(65536)
+        if not data:
+            raise ConnectionError("Connection to " + self.port +
+                                  " closed by the remote end")
+        self._buffer += data
+        return(True)
+
+
+    def _remaining(self, deadline):
+        """ Seconds left before deadline, None for no deadline """
+        return(None if deadline is None else max(deadline - monotonic(), 0))
+
+
+    @property
+    def in_waiting(self):
+        while self._receive(0):
+            pass
+        return(len(self._buffer))
+
+
+    def reset_input_buffer(self):
+        """ Drops received bytes not read yet """
+        while self._receive(0):
+            pass
+        self._buffer = b""
+        return
+
+
+    def fileno(self):
+        return(self._socket.fileno())
+
+
+    def write(self, data):
+        self._socket.sendall(data)
+        return(len(data))
+
+
+    def read(self, size = 1):
+        """ Returns size bytes, or fewer if the timeout passes first """
+        deadline = None if self.timeout is None else \
+            monotonic() + self.timeout
+        while len(self._buffer) < size:
+            if not self._receive(self._remaining(deadline)) and \
+                    deadline is not None and monotonic() >= deadline:
+                break
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return(data)
+
+
+    def read_until(self, expected = b"\n", size = None):
+        """ Returns bytes up to and including expected, or what arrived
+            before the timeout """
+        deadline = None if self.timeout is None else \
+            monotonic() + self.timeout
+        start = 0
+        while True:
+            found = self._buffer.find(expected, start)
+            if found >= 0:
+                end = found + len(expected)
+                break
+            if size is not None and len(self._buffer) >= size:
+                end = size
+                break
+            start = max(len(self._buffer) - len(expected) + 1, 0)
+            if not self._receive(self._remaining(deadline)) and \
+                    deadline is not None and monotonic() >= deadline:
+                end = len(self._buffer)
+                break
+        if size is not None:
+            end = min(end, size)
+        data, self._buffer = self._buffer[:end], self._buffer[end:]
+        return(data)
+
+
+    def close(self):
+        if self.is_open:
+            self._socket.close()
+            self.is_open = False
+        return
+
+
+
+class AutoBaud(object):
+    """ Transport opening serial ports at the fastest baud rate at which the
+        controller answers *IDN?. The rate found for each port is tried
+        first the next time it is opened. Other ports, URLs and tcp://
+        addresses are opened as by open_transport. """
+
+
+    def __init__(self, baudrates = BAUD_RATES, probe_timeout = 0.2):
+        """ baudrates are tried in order, each waiting probe_timeout
+            seconds for a reply """
+        self.baudrates = tuple(baudrates)
+        self.probe_timeout = probe_timeout
+        self.found = {}
+
+
+    def __call__(self, port, timeout):
+        if "://" in str(port):
+            return(open_transport(port, timeout))
+        rates = list(self.baudrates)
+        if port in self.found:
+            rates.remove(self.found[port])
+            rates.insert(0, self.found[port])
+        for baudrate in rates:
+            ser = open_serial(port, self.probe_timeout, baudrate)
+            try:
+                ser.reset_input_buffer()
+                ser.write(b"*IDN?\r\n")
+                reply = ser.read_until(b"\r\n")
+            except serial.SerialException:
+                reply = b""
+            if reply.startswith(b"Arroyo") and reply.endswith(b"\r\n"):
+                self.found[port] = baudrate
+                ser.timeout = timeout
+                return(ser)
+            ser.close()
+        raise IOError("No reply from " + str(port) + " at any of " +
+                      str(rates) + " baud")